@@ -0,0 +1,330 @@
+"""类型收敛分析：批量读取所有实验的 CSV 记录和结果 JSON，用位集计算 Jaccard、收敛曲线和类型漂移
+
+每个类型在全局词表中占一位，一篇文档的类型集合编码为一个整数位集，
+交集/并集是一次按位运算、计数是一次 popcount，比逐对构造 set 快一个数量级以上。
+
+用法: python analytics.py [实验根目录 ...] [--window 10] [--threshold 0.9]
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from config import logger, JACCARD_THRESHOLD, CONVERGENCE_ROUNDS, setup_logging
+from excel_utils import COLUMNS
+
+ENTITY = 'entity'
+RELATION = 'relation'
+KINDS = (ENTITY, RELATION)
+
+_popcount = getattr(int, 'bit_count', None) or (lambda bits: bin(bits).count('1'))
+
+
+class TypeVocabulary:
+    """类型名到位序号的映射，所有实验共享同一个词表以便互相比较"""
+
+    def __init__(self):
+        self._index = {}
+        self.names = []
+
+    def encode(self, types):
+        """把类型集合编码为整数位集
+
+        Args:
+            types (iterable): 类型名
+
+        Returns:
+            int: 位集
+        """
+        bits = 0
+        for name in types:
+            position = self._index.get(name)
+            if position is None:
+                position = self._index[name] = len(self.names)
+                self.names.append(name)
+            bits |= 1 << position
+        return bits
+
+    def decode(self, bits):
+        """把位集还原为类型名列表"""
+        names = []
+        position = 0
+        while bits:
+            if bits & 1:
+                names.append(self.names[position])
+            bits >>= 1
+            position += 1
+        return names
+
+
+def jaccard_bits(a, b):
+    """两个位集的 Jaccard 系数，语义与 utils.calculate_jaccard 相同（两个空集为 1.0）"""
+    union = a | b
+    if not union:
+        return 1.0
+    return _popcount(a & b) / _popcount(union)
+
+
+class ExperimentRun:
+    """一次实验运行：按处理顺序排列的文档及其类型位集"""
+
+    def __init__(self, name, source):
+        """
+        Args:
+            name (str): 运行名称（相对实验根目录的路径）
+            source (str): 数据来源文件或目录
+        """
+        self.name = name
+        self.source = source
+        self.filenames = []
+        self.bits = {ENTITY: [], RELATION: []}
+
+    def add(self, filename, entity_bits, relation_bits):
+        self.filenames.append(filename)
+        self.bits[ENTITY].append(entity_bits)
+        self.bits[RELATION].append(relation_bits)
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def vocabulary(self, kind):
+        """整个运行累计出现过的类型位集"""
+        bits = 0
+        for doc_bits in self.bits[kind]:
+            bits |= doc_bits
+        return bits
+
+
+def _read_types(path):
+    """读取类型文件，每行一个类型；路径为空或文件不存在时返回空列表"""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _split_types(value):
+    return [t for t in (value or '').split('、') if t]
+
+
+def load_csv_run(csv_file, vocab, name=None):
+    """读取 CSVRecorder 生成的 extraction_results_*.csv
+
+    Args:
+        csv_file (str): CSV 文件路径
+        vocab (TypeVocabulary): 共享词表
+        name (str, optional): 运行名称. Defaults to None.
+
+    Returns:
+        ExperimentRun: 运行记录
+    """
+    run = ExperimentRun(name or csv_file, csv_file)
+    with open(csv_file, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            run.add(row.get(COLUMNS[0]), vocab.encode(_split_types(row.get(COLUMNS[2]))),
+                    vocab.encode(_split_types(row.get(COLUMNS[4]))))
+    return run
+
+
+def load_result_run(result_dir, vocab, name=None):
+    """读取一个目录下的 *_result.json，按文件名顺序排列
+
+    结果文件不记录处理顺序：process_directory 启用调度（SCHEDULE_CONFIG）时按 scheduler.schedule 的顺序处理，
+    此时文件名顺序不是实际的处理顺序，需要按处理顺序分析时使用 CSV 记录（load_csv_run）。
+
+    Args:
+        result_dir (str): 结果目录
+        vocab (TypeVocabulary): 共享词表
+        name (str, optional): 运行名称. Defaults to None.
+
+    Returns:
+        ExperimentRun: 运行记录
+    """
+    run = ExperimentRun(name or result_dir, result_dir)
+    for result_file in sorted(glob.glob(os.path.join(result_dir, '*_result.json'))):
+        try:
+            with open(result_file, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue
+        if not isinstance(result, dict):
+            continue
+        entity_types = {e.get('type') for e in result.get('entities', []) if isinstance(e, dict) and e.get('type')}
+        relation_types = {r.get('predicate') for r in result.get('relationships', [])
+                          if isinstance(r, dict) and r.get('predicate')}
+        run.add(os.path.basename(result_file)[:-len('_result.json')] + '.txt',
+                vocab.encode(entity_types), vocab.encode(relation_types))
+    return run
+
+
+def discover_runs(roots, vocab):
+    """扫描实验根目录下所有的 extraction_results_*.csv 和包含 *_result.json 的目录
+
+    Args:
+        roots (list): 实验根目录列表（如 experments、excel_outputs）
+        vocab (TypeVocabulary): 共享词表
+
+    Returns:
+        list: ExperimentRun 列表，按名称排序
+    """
+    runs = []
+    for root in roots:
+        base = os.path.dirname(os.path.abspath(root))
+        for csv_file in glob.glob(os.path.join(root, '**', 'extraction_results_*.csv'), recursive=True):
+            runs.append(load_csv_run(csv_file, vocab, os.path.relpath(csv_file, base)))
+        result_dirs = {os.path.dirname(p) for p in glob.glob(os.path.join(root, '**', '*_result.json'),
+                                                               recursive=True)}
+        for result_dir in result_dirs:
+            runs.append(load_result_run(result_dir, vocab, os.path.relpath(result_dir, base)))
+    runs = [run for run in runs if len(run)]
+    runs.sort(key=lambda run: run.name)
+    return runs
+
+
+def convergence_curve(run, kind, window=CONVERGENCE_ROUNDS, threshold=JACCARD_THRESHOLD, seed=0):
+    """计算收敛曲线：每篇文档的类型集合与此前累计词表的 Jaccard 系数
+
+    与 update_type_files 的计算方式一致：累计词表从运行开始时类型文件中的类型（seed）开始，
+    并给出第一次连续 window 篇都达到 threshold 的位置。历史运行开始时的类型文件未知时 seed 为 0，
+    即从空词表开始，收敛位置会比实际运行晚。
+
+    Args:
+        run (ExperimentRun): 运行记录
+        kind (str): 'entity' 或 'relation'
+        window (int, optional): 连续收敛轮数. Defaults to CONVERGENCE_ROUNDS.
+        threshold (float, optional): Jaccard 阈值. Defaults to JACCARD_THRESHOLD.
+        seed (int, optional): 运行开始时类型文件中的类型位集. Defaults to 0.
+
+    Returns:
+        tuple: (Jaccard 系数列表, 首次收敛的文档序号（从 1 开始），未收敛时为 None)
+    """
+    seen = seed
+    curve = []
+    streak = 0
+    converged_at = None
+    for doc_bits in run.bits[kind]:
+        value = jaccard_bits(doc_bits, seen)
+        curve.append(value)
+        seen |= doc_bits
+        streak = streak + 1 if value >= threshold else 0
+        if converged_at is None and streak >= window:
+            converged_at = len(curve)
+    return curve, converged_at
+
+
+def type_drift(run, kind, window=CONVERGENCE_ROUNDS):
+    """类型漂移：每 window 篇文档新引入的类型数
+
+    Args:
+        run (ExperimentRun): 运行记录
+        kind (str): 'entity' 或 'relation'
+        window (int, optional): 窗口大小. Defaults to CONVERGENCE_ROUNDS.
+
+    Returns:
+        list: 每个窗口新增的类型数
+    """
+    seen = 0
+    drift = []
+    doc_bits_list = run.bits[kind]
+    for start in range(0, len(doc_bits_list), window):
+        window_bits = 0
+        for doc_bits in doc_bits_list[start:start + window]:
+            window_bits |= doc_bits
+        drift.append(_popcount(window_bits & ~seen))
+        seen |= window_bits
+    return drift
+
+
+def pairwise_jaccard(runs, kind):
+    """各运行最终词表两两之间的 Jaccard 矩阵
+
+    Args:
+        runs (list): ExperimentRun 列表
+        kind (str): 'entity' 或 'relation'
+
+    Returns:
+        list: n×n 的嵌套列表
+    """
+    vocabularies = [run.vocabulary(kind) for run in runs]
+    matrix = [[1.0] * len(runs) for _ in runs]
+    for i, a in enumerate(vocabularies):
+        for j in range(i + 1, len(vocabularies)):
+            matrix[i][j] = matrix[j][i] = jaccard_bits(a, vocabularies[j])
+    return matrix
+
+
+def document_agreement(run_a, run_b, kind):
+    """两个运行在相同文件上的平均 Jaccard（模型之间逐文档的类型一致程度）
+
+    Returns:
+        tuple: (共同文件数, 平均 Jaccard 系数)，没有共同文件时为 (0, None)
+    """
+    bits_b = dict(zip(run_b.filenames, run_b.bits[kind]))
+    values = [jaccard_bits(bits, bits_b[filename])
+              for filename, bits in zip(run_a.filenames, run_a.bits[kind]) if filename in bits_b]
+    if not values:
+        return 0, None
+    return len(values), sum(values) / len(values)
+
+
+def summarize(runs, vocab, window=CONVERGENCE_ROUNDS, threshold=JACCARD_THRESHOLD, seeds=None):
+    """每个运行的文档数、词表大小、收敛位置和最近窗口的平均 Jaccard
+
+    Args:
+        seeds (dict, optional): 种类 -> 运行开始时类型文件中的类型位集，None 表示从空词表开始. Defaults to None.
+
+    Returns:
+        list: 每个运行一个字典
+    """
+    rows = []
+    for run in runs:
+        row = {'run': run.name, 'documents': len(run)}
+        for kind in KINDS:
+            curve, converged_at = convergence_curve(run, kind, window, threshold, (seeds or {}).get(kind, 0))
+            tail = curve[-window:]
+            row[f'{kind}_types'] = _popcount(run.vocabulary(kind))
+            row[f'{kind}_converged_at'] = converged_at
+            row[f'{kind}_recent_jaccard'] = sum(tail) / len(tail) if tail else None
+            row[f'{kind}_drift'] = type_drift(run, kind, window)
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="实验类型收敛分析")
+    parser.add_argument('roots', nargs='*', default=['experments', 'excel_outputs'], help="实验根目录")
+    parser.add_argument('--window', type=int, default=CONVERGENCE_ROUNDS, help="连续收敛轮数/漂移窗口")
+    parser.add_argument('--threshold', type=float, default=JACCARD_THRESHOLD, help="收敛的 Jaccard 阈值")
+    parser.add_argument('--kind', choices=KINDS, default=ENTITY, help="两两比较的类型种类")
+    parser.add_argument('--entity-file', help="运行开始时的实体类型文件，不指定时收敛曲线从空词表开始")
+    parser.add_argument('--relation-file', help="运行开始时的关系类型文件，不指定时收敛曲线从空词表开始")
+    args = parser.parse_args()
+    setup_logging()
+
+    start = time.perf_counter()
+    vocab = TypeVocabulary()
+    runs = discover_runs([root for root in args.roots if os.path.isdir(root)], vocab)
+    loaded = time.perf_counter()
+    seeds = {kind: vocab.encode(_read_types(path)) for kind, path in ((ENTITY, args.entity_file),
+                                                                      (RELATION, args.relation_file))}
+    rows = summarize(runs, vocab, args.window, args.threshold, seeds)
+    matrix = pairwise_jaccard(runs, args.kind)
+    computed = time.perf_counter()
+
+    for row in rows:
+        print(f"{row['run']}: {row['documents']} 篇, "
+              f"实体类型 {row['entity_types']} 个 收敛于 {row['entity_converged_at']} 漂移 {row['entity_drift']}, "
+              f"关系类型 {row['relation_types']} 个 收敛于 {row['relation_converged_at']} 漂移 {row['relation_drift']}")
+    print(f"\n最终{'实体' if args.kind == ENTITY else '关系'}类型词表两两 Jaccard（最相似的 10 对）:")
+    pairs = sorted(((matrix[i][j], runs[i].name, runs[j].name)
+                    for i in range(len(runs)) for j in range(i + 1, len(runs))), reverse=True)
+    for value, a, b in pairs[:10]:
+        print(f"  {value:.3f}  {a}  <->  {b}")
+    print(f"\n{len(runs)} 个运行, 全局词表 {len(vocab.names)} 个类型; "
+          f"读取 {(loaded - start) * 1000:.1f} ms, 计算 {(computed - loaded) * 1000:.1f} ms")
+    logger.info(f"收敛分析完成: {len(runs)} 个运行")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,18 @@
 
-import json
-import re
-from openai import OpenAI
-from config import logger, API_CONFIG, CURRENT_API, OPENAI_API_KEY, OPENAI_API_BASE
+from config import logger, API_CONFIG, CURRENT_API, OPENAI_API_KEY, OPENAI_API_BASE, STREAMING, RETRY_CONFIG
+from concurrency import get_rate_limiter
+from llm_client import get_client, metrics
+from response_cache import get_response_cache, make_cache_key
+from llm_router import get_router
+from retry import complete_chat
+from json_repair import repair_json
+from usage_tracker import usage_tracker
+
+# 请求参数，同时参与响应缓存键的计算
+MODEL_NAME = "GLM-4"
+SYSTEM_PROMPT = "你是一个专业的实体关系抽取助手。"
+TEMPERATURE = 0.3
+MAX_TOKENS = 4096
 
 
 
@@ -13,87 +23,118 @@ def configure_api():
             logger.error("未设置OPENAI_API_KEY环境变量")
             return None
 
-        # 使用新版本 SDK 的配置方式，移除 model 参数
-        client = OpenAI(
-            api_key=OPENAI_API_KEY,
-            base_url=OPENAI_API_BASE
-        )
-        return client
+        # 复用长连接客户端，避免每次请求都重新握手
+        return get_client(OPENAI_API_KEY, OPENAI_API_BASE)
     else:
         raise ValueError(f"不支持的API类型: {CURRENT_API}")
 
 
 def fix_json_format(text):
     """修复和验证JSON格式
-    
+
     Args:
         text (str): 需要修复的文本
-        
+
     Returns:
-        str: 修复后的JSON字符串
+        str: 修复后的JSON字符串，无法修复时返回 None
     """
-    try:
-        # 尝试直接解析
-        json.loads(text)
-        return text
-    except json.JSONDecodeError:
-        # 如果解析失败，尝试修复
-        try:
-            # 1. 提取JSON部分
-            json_match = re.search(r'\{[\s\S]*\}', text)
-            if json_match:
-                json_str = json_match.group(0)
-            else:
-                return None
-
-            # 2. 修复常见的格式问题
-            # 修复单引号
-            json_str = json_str.replace("'", '"')
-            
-            # 修复缺少引号的键
-            json_str = re.sub(r'([{,])\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*:', r'\1"\2":', json_str)
-            
-            # 修复多余的逗号
-            json_str = re.sub(r',\s*}', '}', json_str)
-            json_str = re.sub(r',\s*]', ']', json_str)
-            
-            # 3. 验证修复后的JSON
-            json.loads(json_str)
-            return json_str
-        except Exception as e:
-            logger.error(f"JSON格式修复失败: {str(e)}")
-            return None
+    fixed_json, repairs = repair_json(text)
+    if fixed_json is None:
+        usage_tracker.record_repair('failed')
+        logger.error(f"JSON格式修复失败，已尝试: {repairs}")
+    elif repairs:
+        usage_tracker.record_repair('repaired')
+        logger.info(f"JSON格式已修复: {repairs}")
+    else:
+        usage_tracker.record_repair('clean')
+    return fixed_json
+
+
+def build_messages(prompt):
+    """构建对话消息：prompt.py 生成的 Prompt 自带静态 system 消息，普通字符串使用 SYSTEM_PROMPT
+
+    Args:
+        prompt (str): 用户 prompt
+
+    Returns:
+        list: 对话消息列表
+    """
+    return [
+        {"role": "system", "content": getattr(prompt, 'system', SYSTEM_PROMPT)},
+        {"role": "user", "content": str(prompt)}
+    ]
+
+
+def _complete(messages):
+    """通过单一 API 配置发送请求"""
+    client = configure_api()
+    if not client:
+        return None
+
+    if CURRENT_API == 'openai':
+        # 按端点限速，多个工作线程共享同一个限速器；可重试的错误按指数退避重试
+        return complete_chat(client, MODEL_NAME, messages, TEMPERATURE, MAX_TOKENS,
+                             limiter=get_rate_limiter(OPENAI_API_BASE), streaming=STREAMING)
+    else:
+        raise ValueError(f"不支持的API类型: {CURRENT_API}")
+
 
 def call_openai_api(prompt):
-    """调用 API"""
+    """调用 API
+
+    Args:
+        prompt (str): 用户 prompt
+
+    Returns:
+        str: 修复后的 JSON 字符串，失败时返回 None
+    """
+    # 记录本次调用的 token 用量、耗时和 JSON 修复结果，阶段和文件由调用方的 usage_context 标注
+    usage_tracker.begin_call()
     try:
-        client = configure_api()
-        if not client:
-            return None
+        messages = build_messages(prompt)
+        metrics.record_prompt_prefix(getattr(prompt, 'prefix_hash', None))
 
-        if CURRENT_API == 'openai':
-            # 使用新的API格式调用
-            response = client.chat.completions.create(
-                model="GLM-4",
-                messages=[
-                    {"role": "system", "content": "你是一个专业的实体关系抽取助手。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=4096,
-                stream=False
-            )
-            response_text = response.choices[0].message.content.strip()
-        else:
-            raise ValueError(f"不支持的API类型: {CURRENT_API}")
-        
-        # 修复和验证JSON格式
-        fixed_json = fix_json_format(response_text)
-        if fixed_json:
-            return fixed_json
-        else:
-            logger.error("API返回结果无法转换为有效的JSON格式")
-            return None
+        # 配置了多个后端时由路由器分发，缓存需按每个后端的模型查询
+        router = get_router()
+        models = router.models() if router else [MODEL_NAME]
+
+        cache = get_response_cache()
+        # 返回内容无法修复为合法 JSON 时单独重试，不占用网络错误的重试次数
+        attempts = 1 + max(0, RETRY_CONFIG['invalid_json_retries'])
+        for attempt in range(attempts):
+            # 先查询响应缓存，相同的模型、消息和采样参数不重复请求；重试时跳过缓存
+            response_text, model = None, None
+            if cache and attempt == 0:
+                response_text = cache.get_any([make_cache_key(m, messages, TEMPERATURE, MAX_TOKENS) for m in models])
+                if response_text is not None:
+                    usage_tracker.record_cache_hit()
+                if response_text is None and cache.read_only:
+                    logger.error("回放模式下缓存未命中，跳过网络请求")
+                    return None
+
+            if response_text is None:
+                if router:
+                    response_text, model = router.complete(messages, TEMPERATURE, MAX_TOKENS)
+                else:
+                    response_text, model = _complete(messages), MODEL_NAME
+
+            # 修复和验证JSON格式
+            fixed_json = fix_json_format(response_text) if response_text else None
+            if fixed_json:
+                # 只缓存能修复为合法 JSON 的响应
+                if cache and model:
+                    cache.put(make_cache_key(model, messages, TEMPERATURE, MAX_TOKENS), response_text)
+                return fixed_json
+            if cache and cache.read_only:
+                break
+            if attempt + 1 < attempts:
+                metrics.record_retry('invalid_json')
+                logger.warning(f"API返回结果无法转换为有效的JSON格式，第 {attempt + 1} 次重新请求")
+
+        logger.error("API返回结果无法转换为有效的JSON格式")
+        return None
     except Exception as e:
         logger.error(f"API 调用失败: {str(e)}")
-        return None 
\ No newline at end of file
+        return None
+    finally:
+        usage_tracker.end_call() 
\ No newline at end of file
@@ -0,0 +1,306 @@
+import argparse
+import json
+import os
+from config import logger, setup_logging
+from api import MODEL_NAME, TEMPERATURE, MAX_TOKENS, build_messages, configure_api, fix_json_format
+from prompt import Prompt, build_extraction_prompt, build_strict_extraction_prompt, build_validation_prompt
+from file_operations import update_type_files, flush_type_files, save_results, save_conversation_log
+from conversation_log import close_conversation_logs
+from type_normalizer import get_type_normalizer, merge_validation
+
+EMPTY_RESULT = '{"entities": [], "relationships": []}'
+
+
+def make_custom_id(stage, filename):
+    """生成批处理请求的 custom_id，格式为 <阶段>::<文件名>"""
+    return f"{stage}::{filename}"
+
+
+def parse_custom_id(custom_id):
+    """解析 custom_id，返回 (阶段, 文件名)"""
+    stage, filename = custom_id.split('::', 1)
+    return stage, filename
+
+
+def _request_line(stage, filename, prompt):
+    return {
+        'custom_id': make_custom_id(stage, filename),
+        'method': 'POST',
+        'url': '/v1/chat/completions',
+        'body': {
+            'model': MODEL_NAME,
+            'messages': build_messages(prompt),
+            'temperature': TEMPERATURE,
+            'max_tokens': MAX_TOKENS,
+        },
+    }
+
+
+def _write_jsonl(records, output_file):
+    directory = os.path.dirname(output_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def _read_jsonl(input_file):
+    with open(input_file, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def render_extraction_requests(input_dir, entity_file, relation_file, output_file, strict=False):
+    """把语料中每个文件的抽取 Prompt 渲染为 OpenAI 批处理格式的 JSONL
+
+    Args:
+        input_dir (str): 输入目录路径
+        entity_file (str): 实体类型文件路径
+        relation_file (str): 关系类型文件路径
+        output_file (str): 输出 JSONL 文件路径
+        strict (bool, optional): 是否使用严格模式的 prompt. Defaults to False.
+
+    Returns:
+        int: 渲染的请求数
+    """
+    records = []
+    for filename in sorted(f for f in os.listdir(input_dir) if f.endswith('.txt')):
+        with open(os.path.join(input_dir, filename), 'r', encoding='utf-8') as f:
+            text = f.read().strip()
+        if strict:
+            prompt = build_strict_extraction_prompt(text, entity_file, relation_file)
+        else:
+            prompt = build_extraction_prompt(text, entity_file, relation_file)
+        if prompt:
+            records.append(_request_line('extraction', filename, prompt))
+    _write_jsonl(records, output_file)
+    logger.info(f"已渲染 {len(records)} 个抽取请求: {output_file}")
+    return len(records)
+
+
+def render_validation_requests(input_dir, extracted, entity_file, relation_file, output_file):
+    """根据已导入的抽取结果渲染验证请求
+
+    与在线流程一致，先用本地类型归一引擎归一类型，只为存在歧义类型的文档渲染验证请求。
+
+    Args:
+        input_dir (str): 输入目录路径
+        extracted (dict): 文件名 -> 抽取结果字典（load_batch_results 的返回值）
+        entity_file (str): 实体类型文件路径
+        relation_file (str): 关系类型文件路径
+        output_file (str): 输出 JSONL 文件路径
+
+    Returns:
+        int: 渲染的请求数
+    """
+    records = []
+    normalizer = get_type_normalizer(entity_file, relation_file)
+    for filename in sorted(extracted):
+        extracted_json = extracted[filename]
+        if normalizer:
+            normalization = normalizer.normalize(extracted_json)
+            if not any(normalization['ambiguous'].values()):
+                continue
+            extracted_json = normalization['json']
+        with open(os.path.join(input_dir, filename), 'r', encoding='utf-8') as f:
+            text = f.read().strip()
+        prompt = build_validation_prompt(text, extracted_json, entity_file, relation_file)
+        if prompt:
+            records.append(_request_line('validation', filename, prompt))
+    _write_jsonl(records, output_file)
+    logger.info(f"已渲染 {len(records)} 个验证请求: {output_file}")
+    return len(records)
+
+
+def load_batch_results(result_file, stage=None):
+    """读取批处理结果 JSONL 并修复 JSON
+
+    Args:
+        result_file (str): 批处理结果 JSONL 路径
+        stage (str, optional): 只返回该阶段的结果. Defaults to None.
+
+    Returns:
+        dict: 文件名 -> 解析后的结果字典；失败的请求会记录日志并被跳过
+    """
+    results = {}
+    for record in _read_jsonl(result_file):
+        record_stage, filename = parse_custom_id(record['custom_id'])
+        if stage and record_stage != stage:
+            continue
+        response = record.get('response') or {}
+        if record.get('error') or response.get('status_code', 200) != 200:
+            logger.error(f"{filename} 的{record_stage}请求失败: {record.get('error') or response.get('status_code')}")
+            continue
+        try:
+            content = response['body']['choices'][0]['message']['content'].strip()
+        except (KeyError, IndexError, TypeError):
+            logger.error(f"{filename} 的{record_stage}结果格式无效")
+            continue
+        fixed_json = fix_json_format(content)
+        if not fixed_json:
+            logger.error(f"{filename} 的{record_stage}结果无法转换为有效的JSON格式")
+            continue
+        results[filename] = json.loads(fixed_json)
+    return results
+
+
+def _merge_validated(extracted, validated, requested, entity_file, relation_file):
+    """把验证阶段的结果合并回抽取结果，与在线流程的 _validate_document 一致
+
+    验证响应是类型映射而不是完整的抽取结果：有类型归一引擎时由 apply_validation 合并并记录别名，
+    否则直接按映射改写抽取结果。没有渲染验证请求的文档（类型均可本地归一）使用归一后的抽取结果。
+
+    Args:
+        extracted (dict): 文件名 -> 抽取结果
+        validated (dict): 文件名 -> 验证结果
+        requested (set): 已渲染的验证请求的 custom_id
+        entity_file (str): 实体类型文件路径
+        relation_file (str): 关系类型文件路径
+
+    Returns:
+        dict: 文件名 -> 最终的抽取结果；验证请求失败的文件不在其中
+    """
+    normalizer = get_type_normalizer(entity_file, relation_file)
+    merged = {}
+    for filename in sorted(extracted):
+        extracted_json = extracted[filename]
+        normalization = normalizer.normalize(extracted_json) if normalizer else None
+        if filename in validated:
+            if normalization:
+                merged[filename] = normalizer.apply_validation(normalization, validated[filename])
+            else:
+                merged[filename] = merge_validation(extracted_json, validated[filename])
+        elif make_custom_id('validation', filename) in requested:
+            logger.error(f"{filename} 没有有效的验证结果，不保存结果")
+        else:
+            merged[filename] = normalization['json'] if normalization else extracted_json
+    return merged
+
+
+def ingest_batch_results(requests_file, result_file, input_dir, entity_file, relation_file, output_dir, timestamp,
+                         stage='extraction', finalize=True, extraction_file=None):
+    """把批处理结果写回与在线流程相同的输出：对话日志、类型文件和结果文件
+
+    Args:
+        requests_file (str): 渲染出的请求 JSONL，用于还原对话日志中的 prompt
+        result_file (str): 批处理结果 JSONL
+        input_dir (str): 输入目录路径
+        entity_file (str): 实体类型文件路径
+        relation_file (str): 关系类型文件路径
+        output_dir (str): 输出目录路径
+        timestamp (str): 输出目录使用的时间戳
+        stage (str, optional): 'extraction' 或 'validation'. Defaults to 'extraction'.
+        finalize (bool, optional): 是否更新类型文件并保存结果；两阶段流程中抽取阶段应设为 False.
+            Defaults to True.
+        extraction_file (str, optional): 抽取阶段的批处理结果 JSONL，导入验证阶段时必须提供. Defaults to None.
+
+    Returns:
+        dict: 文件名 -> 最终的抽取结果（验证阶段为合并验证结果后的抽取结果）
+    """
+    if stage == 'validation' and not extraction_file:
+        raise ValueError("导入验证结果需要抽取阶段的结果文件")
+
+    prompts = {}
+    for record in _read_jsonl(requests_file):
+        messages = record['body']['messages']
+        # 还原为带 system 消息的 Prompt，对话日志与在线流程保持一致
+        prompts[record['custom_id']] = Prompt(messages[0]['content'], "", messages[-1]['content'])
+
+    results = load_batch_results(result_file, stage)
+    os.makedirs(output_dir, exist_ok=True)
+
+    for filename in sorted(results):
+        prompt = prompts.get(make_custom_id(stage, filename), '')
+        save_conversation_log(prompt, json.dumps(results[filename], ensure_ascii=False), output_dir, timestamp,
+                              filename, stage)
+    if stage == 'validation':
+        results = _merge_validated(load_batch_results(extraction_file, 'extraction'), results, set(prompts),
+                                   entity_file, relation_file)
+
+    if finalize:
+        # 按文件名顺序写入，保证类型文件的合并顺序与在线流程一致
+        for filename in sorted(results):
+            result = results[filename]
+            entity_jaccard, relation_jaccard = update_type_files(result, entity_file, relation_file)
+            if entity_jaccard is None or relation_jaccard is None:
+                continue
+            save_results(result, os.path.join(input_dir, filename), output_dir, timestamp)
+        flush_type_files(entity_file, relation_file)
+    close_conversation_logs()
+    logger.info(f"已导入 {len(results)} 条{stage}结果")
+    return results
+
+
+def stub_responder(body):
+    """离线占位处理器：不发起网络请求，返回空的抽取结果"""
+    return EMPTY_RESULT
+
+
+def api_responder(body):
+    """通过共享客户端逐个发送请求，可对接本地 vLLM/Ollama 的 OpenAI 兼容端点"""
+    response = configure_api().chat.completions.create(**body)
+    return response.choices[0].message.content
+
+
+def run_local_batch(requests_file, result_file, responder=stub_responder):
+    """在本地执行批处理请求，输出与 OpenAI 批处理结果相同格式的 JSONL
+
+    Args:
+        requests_file (str): 请求 JSONL
+        result_file (str): 输出结果 JSONL
+        responder (callable, optional): 接收请求 body、返回响应文本的函数. Defaults to stub_responder.
+
+    Returns:
+        int: 成功的请求数
+    """
+    records = []
+    succeeded = 0
+    for request in _read_jsonl(requests_file):
+        record = {'id': f"local-{len(records)}", 'custom_id': request['custom_id'], 'response': None, 'error': None}
+        try:
+            content = responder(request['body'])
+            record['response'] = {
+                'status_code': 200,
+                'body': {'model': request['body']['model'],
+                         'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}}]},
+            }
+            succeeded += 1
+        except Exception as e:
+            record['error'] = {'message': str(e)}
+        records.append(record)
+    _write_jsonl(records, result_file)
+    logger.info(f"本地批处理完成: {succeeded}/{len(records)} 成功")
+    return succeeded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批处理 API 离线流水线")
+    parser.add_argument('action', choices=['render', 'render-validation', 'run-local', 'ingest'])
+    parser.add_argument('--input-dir', default='data')
+    parser.add_argument('--entity-file', default='entity_types.txt')
+    parser.add_argument('--relation-file', default='relation_types.txt')
+    parser.add_argument('--output-dir', default='output_results')
+    parser.add_argument('--requests', default='batch_requests.jsonl')
+    parser.add_argument('--results', default='batch_results.jsonl')
+    parser.add_argument('--extraction-results', help='render-validation 和导入验证阶段使用的抽取结果 JSONL')
+    parser.add_argument('--stage', default='extraction', choices=['extraction', 'validation'])
+    parser.add_argument('--timestamp', default='batch')
+    parser.add_argument('--strict', action='store_true')
+    parser.add_argument('--no-finalize', action='store_true', help='只保存对话日志，不更新类型文件和结果')
+    parser.add_argument('--use-api', action='store_true', help='run-local 时通过配置的端点发送请求')
+    args = parser.parse_args()
+    setup_logging()
+
+    if args.action == 'render':
+        render_extraction_requests(args.input_dir, args.entity_file, args.relation_file, args.requests, args.strict)
+    elif args.action == 'render-validation':
+        render_validation_requests(args.input_dir, load_batch_results(args.extraction_results, 'extraction'),
+                                   args.entity_file, args.relation_file, args.requests)
+    elif args.action == 'run-local':
+        run_local_batch(args.requests, args.results, api_responder if args.use_api else stub_responder)
+    else:
+        if args.stage == 'validation' and not args.extraction_results:
+            parser.error("--stage validation 需要 --extraction-results")
+        ingest_batch_results(args.requests, args.results, args.input_dir, args.entity_file, args.relation_file,
+                             args.output_dir, args.timestamp, args.stage, finalize=not args.no_finalize,
+                             extraction_file=args.extraction_results)
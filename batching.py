@@ -0,0 +1,88 @@
+import json
+import os
+import re
+from config import logger
+
+_CJK_PATTERN = re.compile(r'[\u3000-\u9fff\uf900-\uffef]')
+
+
+def estimate_tokens(text):
+    """粗略估计文本的 token 数：中文字符约 1 个 token，其他字符约 4 个一个 token
+
+    Args:
+        text (str): 文本
+
+    Returns:
+        int: 估计的 token 数
+    """
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def plan_batches(input_dir, filenames, token_budget, max_docs=8, max_doc_tokens=None):
+    """按 token 预算把连续的短文档分组，保持输入顺序
+
+    单个文档超过预算或超过 max_doc_tokens（需要分块抽取）时单独成组；token_budget 为 0 或 None 时每个文档单独成组。
+
+    Args:
+        input_dir (str): 输入目录路径
+        filenames (list): 文件名列表
+        token_budget (int): 每批文档正文的 token 预算
+        max_docs (int, optional): 每批最多文档数. Defaults to 8.
+        max_doc_tokens (int, optional): 可以参与批量的单个文档 token 上限. Defaults to None.
+
+    Returns:
+        list: 每批一个文件名列表
+    """
+    if not token_budget:
+        return [[filename] for filename in filenames]
+
+    batches = []
+    current, current_tokens = [], 0
+    for filename in filenames:
+        with open(os.path.join(input_dir, filename), 'r', encoding='utf-8') as f:
+            tokens = estimate_tokens(f.read().strip())
+        if max_doc_tokens and tokens > max_doc_tokens:
+            if current:
+                batches.append(current)
+                current, current_tokens = [], 0
+            batches.append([filename])
+            continue
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_docs):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(filename)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+
+    logger.info(f"{len(filenames)} 个文件分为 {len(batches)} 批")
+    return batches
+
+
+def split_batch_response(response_text, doc_ids):
+    """将批量抽取的响应拆分为每个文档的结果
+
+    Args:
+        response_text (str): 以文档编号为键的 JSON 字符串
+        doc_ids (list): 本批文档编号
+
+    Returns:
+        dict: 文档编号 -> 抽取结果字典；响应中缺失或格式不对的文档不出现在结果中
+    """
+    try:
+        response_json = json.loads(response_text)
+    except (TypeError, json.JSONDecodeError) as e:
+        logger.error(f"批量抽取结果 JSON 格式错误: {str(e)}")
+        return {}
+    if not isinstance(response_json, dict):
+        return {}
+
+    results = {}
+    for doc_id in doc_ids:
+        doc_result = response_json.get(doc_id)
+        if isinstance(doc_result, dict) and isinstance(doc_result.get('entities'), list):
+            results[doc_id] = doc_result
+        else:
+            logger.error(f"批量抽取结果缺少文档 {doc_id}，将单独重新抽取")
+    return results
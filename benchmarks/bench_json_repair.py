@@ -0,0 +1,100 @@
+"""JSON 修复基准：对比旧的 fix_json_format 与单次扫描的 repair_json
+
+语料来自仓库中所有 conversation_logs_* 的 response 和 raw_responses_* 文本，
+并为每条合法响应生成几种模型常见的损坏形式（代码块、前后说明文字、单引号、
+多余逗号、截断、撇号等），统计两种实现的成功率与耗时。
+
+用法: python benchmarks/bench_json_repair.py [仓库根目录]
+"""
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from json_repair import repair_json  # noqa: E402
+from conversation_log import read_conversations  # noqa: E402
+
+
+def legacy_fix_json_format(text):
+    """旧实现（正则 + 全局替换），仅用于对比"""
+    try:
+        json.loads(text)
+        return text
+    except json.JSONDecodeError:
+        try:
+            json_match = re.search(r'\{[\s\S]*\}', text)
+            if json_match:
+                json_str = json_match.group(0)
+            else:
+                return None
+            json_str = json_str.replace("'", '"')
+            json_str = re.sub(r'([{,])\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*:', r'\1"\2":', json_str)
+            json_str = re.sub(r',\s*}', '}', json_str)
+            json_str = re.sub(r',\s*]', ']', json_str)
+            json.loads(json_str)
+            return json_str
+        except Exception:
+            return None
+
+
+def load_corpus(root):
+    responses = []
+    for log_dir in glob.glob(os.path.join(root, '**', 'conversation_logs_*'), recursive=True):
+        for conversation in read_conversations(log_dir):
+            if isinstance(conversation.get('response'), str):
+                responses.append(conversation['response'])
+    for raw_file in glob.glob(os.path.join(root, '**', 'raw_responses_*', '*.txt'), recursive=True):
+        with open(raw_file, 'r', encoding='utf-8', errors='ignore') as f:
+            responses.append(f.read())
+    return responses
+
+
+def damage(response):
+    """生成模型输出中常见的损坏形式"""
+    pretty = json.dumps(json.loads(response), ensure_ascii=False, indent=2)
+    variants = [
+        f"```json\n{pretty}\n```",
+        f"以下是抽取结果：\n{pretty}\n希望对你有帮助。",
+        re.sub(r'(\}|\]|"[^"\n]*")\n(\s*[\]\}])', r'\1,\n\2', pretty),
+        pretty.replace('"', "'"),
+        pretty[:int(len(pretty) * 0.8)],
+        pretty.replace('"type": "', '"type": "\'', 1) + "\n```",
+    ]
+    return variants
+
+
+def run(fix, corpus):
+    successes = 0
+    start = time.perf_counter()
+    for text in corpus:
+        result = fix(text)
+        if isinstance(result, tuple):
+            result = result[0]
+        if result is not None:
+            successes += 1
+    return successes, time.perf_counter() - start
+
+
+def main():
+    root = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    originals = load_corpus(root)
+    damaged = []
+    for response in originals:
+        try:
+            damaged.extend(damage(response))
+        except json.JSONDecodeError:
+            damaged.append(response)
+
+    for name, corpus in (('原始响应', originals), ('损坏变体', damaged)):
+        print(f"{name}: {len(corpus)} 条")
+        for label, fix in (('legacy fix_json_format', legacy_fix_json_format), ('repair_json', repair_json)):
+            successes, elapsed = run(fix, corpus)
+            rate = successes / len(corpus) if corpus else 0.0
+            print(f"  {label:<24} 成功 {successes}/{len(corpus)} ({rate:.1%})  耗时 {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
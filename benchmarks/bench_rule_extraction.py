@@ -0,0 +1,77 @@
+"""规则预抽取基准：统计语料中可由规则解析的栏目比例、耗时和发送给 LLM 的 token 减少量
+
+指定参考结果目录（如某次融合结果）时，再统计规则抽取的实体有多少也出现在参考结果中。
+
+用法: python benchmarks/bench_rule_extraction.py [语料目录 ...] [--reference experments/gemini_deepseek_chatglm_Jinglian]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rule_extractor import pre_extract, plant_name  # noqa: E402
+from batching import estimate_tokens  # noqa: E402
+from fusion import normalize_key, RESULT_SUFFIX  # noqa: E402
+
+
+def load_corpus(dirs):
+    corpus = []
+    for corpus_dir in dirs:
+        for path in sorted(glob.glob(os.path.join(corpus_dir, '*.txt'))):
+            with open(path, 'r', encoding='utf-8') as f:
+                corpus.append((path, f.read().strip()))
+    return corpus
+
+
+def agreement(corpus, results, reference_dir):
+    """规则抽取的实体中，出现在参考结果同一文档中的比例（按实体类型）"""
+    agreed, total = Counter(), Counter()
+    for (path, _), (result, _) in zip(corpus, results):
+        name = os.path.splitext(os.path.basename(path))[0]
+        reference_file = os.path.join(reference_dir, f'{name}{RESULT_SUFFIX}')
+        if result is None or not os.path.exists(reference_file):
+            continue
+        with open(reference_file, 'r', encoding='utf-8') as f:
+            reference = json.load(f)
+        entities = {normalize_key(item['entity']) for item in reference.get('entities', [])
+                    if isinstance(item, dict) and item.get('entity')}
+        for item in result['entities']:
+            total[item['type']] += 1
+            agreed[item['type']] += normalize_key(item['entity']) in entities
+    return agreed, total
+
+
+def main():
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    parser = argparse.ArgumentParser(description="规则预抽取基准")
+    parser.add_argument('dirs', nargs='*', default=[os.path.join(root, 'input_texts'), os.path.join(root, 'data')],
+                        help="语料目录")
+    parser.add_argument('--reference', help="参考结果目录（*_result.json）")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.dirs)
+    start = time.perf_counter()
+    results = [pre_extract(text, plant_name(path)) for path, text in corpus]
+    elapsed = time.perf_counter() - start
+
+    before = sum(estimate_tokens(text) for _, text in corpus)
+    after = sum(estimate_tokens(remainder) for _, remainder in results)
+    taxonomy = sum('【科属归类】' in text and '【科属归类】' not in remainder
+                   for (_, text), (_, remainder) in zip(corpus, results))
+    parts = sum('【药用部位】' in text and '【药用部位】' not in remainder
+                for (_, text), (_, remainder) in zip(corpus, results))
+    print(f"{len(corpus)} 篇文档, 耗时 {elapsed * 1000:.1f} ms")
+    print(f"解析【科属归类】 {taxonomy} 篇, 【药用部位】 {parts} 篇")
+    print(f"发送给 LLM 的正文 {before} -> {after} tokens（减少 {1 - after / max(before, 1):.1%}）")
+    if args.reference:
+        agreed, total = agreement(corpus, results, args.reference)
+        for entity_type, count in total.items():
+            print(f"  {entity_type}: {agreed[entity_type]}/{count} 与参考结果一致")
+
+
+if __name__ == "__main__":
+    main()
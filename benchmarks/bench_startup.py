@@ -0,0 +1,75 @@
+"""启动基准：在全新的子进程中测量 import main 和 main.py --help 的耗时
+
+同时检查导入是否有副作用（创建 logs/、excel_outputs/ 目录）以及是否提前加载了
+openai、httpx 等重量级依赖。指定 --max-ms 时，中位耗时超过阈值或检查失败则以非零状态退出，
+可以放在 CI 中防止启动时间回退。
+
+用法: python benchmarks/bench_startup.py [--runs 10] [--max-ms 300]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# 只应在真正发起请求或处理数据时加载的模块
+HEAVY_MODULES = ('openai', 'httpx', 'sympy', 'pandas', 'numpy')
+
+# 导入时不应创建的目录
+SIDE_EFFECT_DIRS = ('logs', 'excel_outputs')
+
+
+def time_command(args, runs):
+    """在新的解释器中重复执行命令，返回每次的耗时（毫秒）"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def loaded_heavy_modules():
+    """返回 import main 之后已经加载的重量级模块"""
+    code = f"import sys, main; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True, capture_output=True, text=True)
+    return output.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动时间基准")
+    parser.add_argument('--runs', type=int, default=10, help="每项测量的重复次数")
+    parser.add_argument('--max-ms', type=float, help="import main 的中位耗时上限（毫秒），超过时返回非零状态")
+    args = parser.parse_args()
+
+    existing = {name for name in SIDE_EFFECT_DIRS if os.path.exists(os.path.join(ROOT, name))}
+    baseline = statistics.median(time_command(['-c', 'pass'], args.runs))
+    import_ms = statistics.median(time_command(['-c', 'import main'], args.runs))
+    help_ms = statistics.median(time_command(['main.py', '--help'], args.runs))
+    print(f"空解释器           {baseline:8.1f} ms")
+    print(f"import main        {import_ms:8.1f} ms（不含解释器 {import_ms - baseline:.1f} ms）")
+    print(f"main.py --help     {help_ms:8.1f} ms")
+
+    ok = True
+    heavy = loaded_heavy_modules()
+    if heavy:
+        print(f"导入时加载了重量级模块: {', '.join(heavy)}")
+        ok = False
+    created = [name for name in SIDE_EFFECT_DIRS
+               if name not in existing and os.path.exists(os.path.join(ROOT, name))]
+    if created:
+        print(f"导入时创建了目录: {', '.join(created)}")
+        ok = False
+    if existing:
+        print(f"运行前已存在，未检查: {', '.join(sorted(existing))}")
+    if args.max_ms is not None and import_ms > args.max_ms:
+        print(f"import main 中位耗时 {import_ms:.1f} ms 超过上限 {args.max_ms:.1f} ms")
+        ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
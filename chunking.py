@@ -0,0 +1,86 @@
+"""长文档分块：按语料中的【...】栏目标记切分，单个栏目过长时再按句子边界切分
+
+每块都带上文档开头的植物名（第一个【...】之前的文本），按句子切开的栏目在后续块中重复栏目标记，
+模型在每一块中都能看到主语和所属栏目。各块的抽取结果由 fusion.fuse_results 按归一化键去重合并。
+"""
+import re
+from batching import estimate_tokens
+
+# 栏目标记，如【科属归类】【药用部位】；零宽匹配，切分后标记留在栏目开头
+_SECTION_PATTERN = re.compile(r'(?=【[^】\n]{1,20}】)')
+_HEADING_PATTERN = re.compile(r'【[^】\n]{1,20}】')
+# 句子边界，切分后标点留在句末
+_SENTENCE_PATTERN = re.compile(r'(?<=[。！？；!?;\n])')
+
+
+def split_sections(text):
+    """把文档拆成 (标题, 栏目列表)
+
+    Args:
+        text (str): 文档正文
+
+    Returns:
+        tuple: (第一个栏目标记之前的标题, 以栏目标记开头的栏目列表)；没有栏目标记时标题为空，整篇作为一个栏目
+    """
+    parts = _SECTION_PATTERN.split(text)
+    if len(parts) == 1:
+        return '', [text]
+    return parts[0], [part for part in parts[1:] if part]
+
+
+def _pack(pieces, budget, prefix=''):
+    """把连续的片段按 token 预算合并成块，每块加上前缀"""
+    chunks = []
+    current, current_tokens = [], 0
+    for piece in pieces:
+        tokens = estimate_tokens(piece)
+        if current and current_tokens + tokens > budget:
+            chunks.append(prefix + ''.join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        chunks.append(prefix + ''.join(current))
+    return chunks
+
+
+def _split_long_section(section, budget):
+    """按句子边界切分超过预算的栏目，每一段都以栏目标记开头；单句超过预算时按字符截断"""
+    match = _HEADING_PATTERN.match(section)
+    heading = match.group(0) if match else ''
+    body = section[len(heading):]
+    body_budget = max(budget - estimate_tokens(heading), 1)
+
+    sentences = []
+    for sentence in _SENTENCE_PATTERN.split(body):
+        # 中文约 1 个字符 1 个 token，按字符数截断不会超出预算
+        while estimate_tokens(sentence) > body_budget:
+            sentences.append(sentence[:body_budget])
+            sentence = sentence[body_budget:]
+        if sentence:
+            sentences.append(sentence)
+    return _pack(sentences, body_budget, heading)
+
+
+def split_document(text, max_tokens):
+    """把超过 token 上限的文档切分成多块，未超过时原样返回一块
+
+    Args:
+        text (str): 文档正文
+        max_tokens (int): 每块的 token 上限，None 或 0 表示不分块
+
+    Returns:
+        list: 块文本列表，按原文顺序排列
+    """
+    if not max_tokens or estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    header, sections = split_sections(text)
+    budget = max(max_tokens - estimate_tokens(header), 1)
+    pieces = []
+    for section in sections:
+        if estimate_tokens(section) <= budget:
+            pieces.append(section)
+        else:
+            pieces.extend(_split_long_section(section, budget))
+    return _pack(pieces, budget, header)
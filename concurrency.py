@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from config import logger, RATE_LIMITS
+
+
+class _TokenBucket:
+    """容量为每分钟配额、按配额匀速补充的令牌桶"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """令牌足够时返回 0，否则返回还需等待的秒数"""
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+
+class RateLimiter:
+    """按端点限制请求数和 token 数（令牌桶，线程安全）
+
+    令牌桶按配额匀速补充，允许在配额内突发；收到 429 时可调用 pause 让所有线程一起暂停。
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        """
+        Args:
+            requests_per_minute (int, optional): 每分钟允许的最大请求数，None 或 0 表示不限制
+            tokens_per_minute (int, optional): 每分钟允许的最大 token 数，None 或 0 表示不限制
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = _TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = _TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=0):
+        """阻塞直到允许发出下一个请求
+
+        Args:
+            tokens (int, optional): 本次请求预计消耗的 token 数. Defaults to 0.
+
+        Returns:
+            float: 因限速等待的秒数
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._paused_until - now
+                for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+                    if bucket:
+                        bucket.refill(now)
+                        wait = max(wait, bucket.wait_time(amount))
+                if wait <= 0:
+                    if self._requests:
+                        self._requests.level -= 1
+                    if self._tokens:
+                        self._tokens.level -= min(tokens, self._tokens.capacity)
+                    return waited
+            time.sleep(max(wait, 0.01))
+            waited += max(wait, 0.01)
+
+    def adjust(self, tokens):
+        """按实际用量修正 token 桶：正数退还多预留的 token，负数补扣
+
+        Args:
+            tokens (int): 预留量与实际用量之差
+        """
+        if not self._tokens or not tokens:
+            return
+        with self._lock:
+            self._tokens.refill(time.monotonic())
+            self._tokens.level = min(self._tokens.capacity, self._tokens.level + tokens)
+
+    def pause(self, seconds):
+        """服务端要求限速（429）时，让共享该端点的所有请求暂停
+
+        Args:
+            seconds (float): 暂停秒数
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(endpoint):
+    """获取某个 API 端点共享的限速器
+
+    Args:
+        endpoint (str): API 端点（base_url）
+
+    Returns:
+        RateLimiter: 该端点的限速器
+    """
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(endpoint)
+        if limiter is None:
+            limits = RATE_LIMITS.get(endpoint, RATE_LIMITS.get('default')) or {}
+            if isinstance(limits, int):
+                # 兼容旧配置：只写每分钟请求数
+                limits = {'requests_per_minute': limits}
+            limiter = RateLimiter(**limits)
+            _rate_limiters[endpoint] = limiter
+        return limiter
+
+
+# ordered_map 中表示输入已取完的哨兵，输入元素本身可以是 None
+_END = object()
+
+
+def ordered_map(func, items, max_workers=1):
+    """并发执行 func，并按输入顺序逐个产出结果
+
+    同时在途的任务数不超过 max_workers，因此正在进行的 LLM 请求数有上界；
+    结果按输入顺序产出，保证结果文件、对话日志和 CSV 行的顺序是确定的。
+    注意 max_workers > 1 时任务的执行时刻取决于前面任务的完成时间：prompt 中的类型列表
+    取自构建时的类型词表，而词表在主线程保存每个结果时更新，因此运行结果不能逐字复现。
+
+    Args:
+        func (callable): 对单个元素执行的函数
+        items (iterable): 输入元素
+        max_workers (int, optional): 最大并发数. Defaults to 1.
+
+    Yields:
+        tuple: (item, result)，若 func 抛出异常则 result 为 None
+    """
+    items = list(items)
+    if max_workers is None or max_workers <= 1:
+        for item in items:
+            yield item, _safe_call(func, item)
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        iterator = iter(items)
+        for item in iterator:
+            pending.append((item, executor.submit(_safe_call, func, item)))
+            if len(pending) >= max_workers:
+                break
+        while pending:
+            item, future = pending.popleft()
+            result = future.result()
+            next_item = next(iterator, _END)
+            if next_item is not _END:
+                pending.append((next_item, executor.submit(_safe_call, func, next_item)))
+            yield item, result
+
+
+def _safe_call(func, item):
+    try:
+        return func(item)
+    except Exception as e:
+        logger.error(f"并发任务 {item} 出错: {str(e)}")
+        return None
@@ -2,29 +2,33 @@ import logging
 from collections import deque
 import os
 
-# 创建logs目录
-logs_dir = os.path.join(os.path.dirname(__file__), 'logs')
-os.makedirs(logs_dir, exist_ok=True)
-
-# 设置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(logs_dir, 'app.log'), encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+# 日志目录；导入配置时不创建目录和日志文件，由命令行入口调用 setup_logging 完成
+LOG_DIR = os.path.join(os.path.dirname(__file__), 'logs')
+
 logger = logging.getLogger(__name__)
 
-# Excel 文件的默认输出目录（你可以根据实际路径调整）
-EXCEL_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), 'excel_outputs')
 
-# 如果目录不存在，则自动创建
-os.makedirs(EXCEL_OUTPUT_DIR, exist_ok=True)
+def setup_logging(log_file=None):
+    """配置日志输出到控制台和日志文件，只在命令行入口调用
 
+    Args:
+        log_file (str, optional): 日志文件路径. Defaults to logs/app.log.
+    """
+    log_file = log_file or os.path.join(LOG_DIR, 'app.log')
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_file, encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
 
 
+# Excel 文件的默认输出目录（你可以根据实际路径调整），写入时才创建
+EXCEL_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), 'excel_outputs')
+
 # Jaccard 系数收敛参数
 JACCARD_THRESHOLD = 0.9  # Jaccard 系数阈值
 CONVERGENCE_ROUNDS = 10  # 连续收敛轮数
@@ -42,7 +46,117 @@ API_CONFIG = {
     }
 }
 CURRENT_API = 'openai'
-# 便捷访问当前 API 的关键信息
-OPENAI_API_KEY = API_CONFIG['openai']['api_key']
-OPENAI_API_BASE = API_CONFIG['openai']['base_url']
+
+# 并发与限速配置
+MAX_WORKERS = 4  # 同时在途的 LLM 请求数上限
+# 每个 API 端点（base_url）的配额，'default' 用于未单独配置的端点
+# requests_per_minute / tokens_per_minute 为 None 表示不限制（令牌桶，按配额匀速放行）
+RATE_LIMITS = {
+    'default': {'requests_per_minute': None, 'tokens_per_minute': None},
+    'http://localhost:11434/v1': {'requests_per_minute': None, 'tokens_per_minute': None},
+}
+# 失败重试配置：429、超时、连接错误和 5xx 按指数退避加随机抖动重试，优先遵循 Retry-After
+RETRY_CONFIG = {
+    'max_attempts': 5,  # 单次请求最多尝试次数（含第一次）
+    'base_delay': 1.0,  # 退避基数（秒）
+    'max_delay': 60.0,  # 单次等待上限（秒）
+    'invalid_json_retries': 2,  # 返回内容无法修复为合法 JSON 时重新请求的次数
+}
+# 流式输出：边接收边解析 JSON，顶层对象闭合后立即停止，输出无法构成合法 JSON 时提前终止
+STREAMING = False
+
+# 多后端路由配置，留空时使用上面的单一 API 配置
+# 每个后端: kind（后端类型，默认 'openai' 兼容接口）、model、base_url、api_key、
+# max_concurrency（该后端在途请求上限）、timeout（单次请求超时秒数）
+# 例如:
+# BACKENDS = {
+#     'glm4': {'model': 'GLM-4', 'base_url': 'https://open.bigmodel.cn/api/paas/v4', 'api_key': '...',
+#              'max_concurrency': 8, 'timeout': 120},
+#     'ollama': {'model': 'gemma2:7b', 'base_url': 'http://localhost:11434/v1', 'max_concurrency': 2,
+#                'timeout': 300},
+# }
+BACKENDS = {}
+ROUTING_STRATEGY = 'queue'  # 'queue' 按在途请求占比选择后端，'latency' 按 p50 延迟选择后端
+
+# HTTP 连接池配置，所有线程共享同一个长连接客户端
+CLIENT_CONFIG = {
+    'max_connections': 20,  # 连接池最大连接数
+    'max_keepalive_connections': 10,  # 保持空闲的长连接数
+    'keepalive_expiry': 30.0,  # 空闲长连接保留秒数
+    'connect_timeout': 10.0,  # 建立连接超时（秒）
+    'read_timeout': 300.0,  # 读取响应超时（秒）
+}
+
+# 本地类型归一配置：按字符 n-gram 相似度把抽取出的类型归并到已有词表，只有歧义类型才调用 LLM 验证
+NORMALIZATION_CONFIG = {
+    'enabled': True,
+    'merge_threshold': 0.7,  # 与最近的已有类型相似度不低于该值时自动合并
+    'margin': 0.15,  # 自动合并时最近邻需领先次近邻的相似度
+    'new_type_threshold': 0.4,  # 与所有已有类型相似度都低于该值时作为新类型保留
+}
+
+# LLM 响应缓存配置
+# mode: 'readwrite' 读写缓存；'replay' 只读回放，未命中时不发起网络请求；'off' 关闭缓存
+# 缓存只包含启用缓存后的运行；回放需从与被缓存运行相同的类型文件和实体词表开始，prompt 才能完全一致
+CACHE_CONFIG = {
+    'mode': 'readwrite',
+    'path': os.path.join(os.path.dirname(__file__), 'cache', 'llm_cache.sqlite'),
+    'max_bytes': 512 * 1024 * 1024,  # 缓存响应总大小上限，超出后按最近最少使用淘汰
+}
+
+# 知识图谱存储配置：抽取结果追加写入输出目录下的 SQLite 文件（实体、类型、谓词字典编码）
+# 默认只写 SQLite；json_results 为 True 时另外逐个植物写 *_result.json（旧格式），也可以事后用 kg_store.py export 导出
+KG_STORE_CONFIG = {
+    'enabled': True,
+    'filename': 'knowledge_graph.sqlite',
+    'json_results': False,
+}
+
+# 对话日志配置
+# format: 'jsonl.gz' 由后台线程批量写入压缩分段并对模板去重；'json' 为旧格式，每次调用一个缩进 JSON 文件
+CONVERSATION_LOG_CONFIG = {
+    'format': 'jsonl.gz',
+    'max_segment_bytes': 32 * 1024 * 1024,  # 单个分段的大小上限，超出后写入新分段
+    'batch_size': 64,  # 后台线程每次写盘的最大记录数
+}
+
+# 长文档分块：估计 token 数超过 max_tokens 的文档按【...】栏目切分成多块并行抽取，再去重合并为一个结果，
+# 避免输出超过 MAX_TOKENS 被截断。同一文档的块并行数与 MAX_WORKERS 相乘为在途请求数的上限，仍受 RATE_LIMITS 约束
+CHUNK_CONFIG = {
+    'max_tokens': 800,  # 每块正文的 token 上限，None 或 0 表示不分块
+    'max_workers': 2,  # 同一文档的块并行抽取数，与其他文档共享 --workers 个在途请求名额
+}
+
+# 规则预抽取：格式固定的【科属归类】【药用部位】栏目由正则直接解析出科、属、药用部位和药材，
+# 解析成功的栏目不再发送给 LLM，规则结果与 LLM 结果合并
+RULE_EXTRACTION_CONFIG = {
+    'enabled': True,
+}
+
+# 实体词表：历史抽取结果中的 (实体, 类型) 编译为 Aho-Corasick 自动机，在调用 LLM 前标注文本
+# mode: 'hint' 把匹配到的已知实体作为提示放进 prompt；'accept' 另外把匹配到的实体直接并入结果；'off' 关闭
+# 每次运行保存的结果会增量加入词表；用 python lexicon.py build experments 从已有结果初始化
+LEXICON_CONFIG = {
+    'mode': 'hint',
+    'path': os.path.join(os.path.dirname(__file__), 'cache', 'lexicon.json'),
+    'min_count': 2,  # 至少在多少个结果文件中出现过才参与匹配
+    'min_length': 2,  # 参与匹配的最短实体长度，单字实体（如“根”）误匹配太多
+    'max_hints': 50,  # 每篇文档放进 prompt 的已知实体数上限
+}
+
+# 收敛感知调度：按栏目标记和词表标注的类型估计每篇文档的新类型，先处理能带来新类型的文档，
+# 再处理与已见类型相似的文档，使 Jaccard 收敛条件更早满足；auto_strict 为 True 时，收敛后新开始的文档改用严格模式抽取
+# 用 python scheduler.py simulate <结果目录> 回放历史结果，比较不同顺序收敛前的验证调用数
+SCHEDULE_CONFIG = {
+    'enabled': True,
+    'auto_strict': True,
+}
+
+# 模型价格（每百万 token），用于用量报告中的费用统计；未配置的模型只统计 token 数
+# 例如 'GLM-4': {'prompt': 5.0, 'completion': 5.0}
+TOKEN_PRICES = {}
+
+# 便捷访问当前 API 的关键信息（未在配置中填写时回退到环境变量）
+OPENAI_API_KEY = API_CONFIG['openai'].get('api_key') or os.environ.get('OPENAI_API_KEY')
+OPENAI_API_BASE = API_CONFIG['openai'].get('base_url') or os.environ.get('OPENAI_API_BASE')
 
@@ -0,0 +1,310 @@
+"""紧凑的对话日志：后台线程批量追加到 gzip 压缩的 JSONL 分段文件
+
+每个 conversation_logs_<时间戳> 目录包含：
+- templates.jsonl：去重后的 system 消息和 prompt 模板（静态指令 + 类型列表），按哈希各存一次；
+- conversations_0001.jsonl.gz, ...：每次调用一行，只保存模板哈希、文档部分和响应，超过大小上限时换新分段。
+read_conversations 会还原出与旧版 *_conversation.json 相同的字段，旧目录也可以直接读取。
+
+用法: python conversation_log.py convert experments/*/output_results/conversation_logs_* [--remove]
+      python conversation_log.py show 日志目录 [--file 一叶萩] [--stage extraction]
+"""
+import argparse
+import atexit
+import glob
+import gzip
+import hashlib
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+from config import logger, CONVERSATION_LOG_CONFIG, setup_logging
+
+TEMPLATE_FILE = 'templates.jsonl'
+SEGMENT_PATTERN = 'conversations_{:04d}.jsonl.gz'
+
+# 用户消息中文档部分的起始标记，之前的内容（指令和类型列表）作为模板去重
+_DOCUMENT_MARKERS = ('输入文本', '当前抽取结果：')
+
+_FIELDS = ('timestamp', 'input_file', 'stage', 'system', 'prompt', 'response')
+
+
+def split_prompt(prompt):
+    """把用户消息拆成 (模板, 文档部分)，找不到文档标记时模板为空"""
+    positions = [position for position in (prompt.find(marker) for marker in _DOCUMENT_MARKERS) if position >= 0]
+    if not positions:
+        return '', prompt
+    position = min(positions)
+    return prompt[:position], prompt[position:]
+
+
+def _hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+class ConversationLog:
+    """一个对话日志目录的写入端，write 只把记录放入队列，由后台线程批量写盘"""
+
+    def __init__(self, log_dir, max_segment_bytes=None, batch_size=None):
+        """
+        Args:
+            log_dir (str): 日志目录
+            max_segment_bytes (int, optional): 单个分段的大小上限. Defaults to CONVERSATION_LOG_CONFIG.
+            batch_size (int, optional): 每次写盘的最大记录数. Defaults to CONVERSATION_LOG_CONFIG.
+        """
+        self.log_dir = log_dir
+        self.max_segment_bytes = max_segment_bytes or CONVERSATION_LOG_CONFIG['max_segment_bytes']
+        self.batch_size = batch_size or CONVERSATION_LOG_CONFIG['batch_size']
+        os.makedirs(log_dir, exist_ok=True)
+        self._templates = set(_read_templates(log_dir))
+        segments = _segments(log_dir)
+        self._segment = len(segments) or 1
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"conversation-log-{os.path.basename(log_dir)}",
+                                        daemon=True)
+        self._thread.start()
+
+    def write(self, prompt, response, filename, stage, system=None):
+        """记录一次对话
+
+        Args:
+            prompt (str): 用户消息
+            response (str): 模型响应
+            filename (str): 输入文件名
+            stage (str): 处理阶段（extraction / validation）
+            system (str, optional): system 消息. Defaults to None.
+        """
+        self.append({
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "input_file": filename,
+            "stage": stage,
+            "system": system,
+            "prompt": str(prompt) if prompt is not None else None,
+            "response": response,
+        })
+
+    def append(self, conversation):
+        """记录一条完整的对话（字段与旧版 *_conversation.json 相同）"""
+        self._queue.put({field: conversation.get(field) for field in _FIELDS})
+
+    def close(self):
+        """写完队列中的所有记录并停止后台线程"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [conversation for conversation in batch if conversation is not None]
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    logger.error(f"写入对话日志 {self.log_dir} 失败: {str(e)}")
+
+    def _compact(self, conversation, new_templates):
+        """把模板替换为哈希，新模板放入 new_templates"""
+        record = dict(conversation)
+        template, document = split_prompt(conversation['prompt'] or '')
+        for field, text in (('system', conversation['system']), ('template', template)):
+            if not text:
+                record[field] = None
+                continue
+            digest = _hash(text)
+            if digest not in self._templates:
+                self._templates.add(digest)
+                new_templates.append({'hash': digest, 'text': text})
+            record[field] = digest
+        record['prompt'] = document
+        return record
+
+    def _write_batch(self, batch):
+        new_templates = []
+        lines = [json.dumps(self._compact(conversation, new_templates), ensure_ascii=False) + '\n'
+                 for conversation in batch]
+        # 先写模板再写记录，记录引用的模板总是已经落盘
+        if new_templates:
+            with open(os.path.join(self.log_dir, TEMPLATE_FILE), 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(template, ensure_ascii=False) + '\n' for template in new_templates)
+        segment_file = os.path.join(self.log_dir, SEGMENT_PATTERN.format(self._segment))
+        if os.path.exists(segment_file) and os.path.getsize(segment_file) >= self.max_segment_bytes:
+            self._segment += 1
+            segment_file = os.path.join(self.log_dir, SEGMENT_PATTERN.format(self._segment))
+        # 每批写成一个独立的 gzip 成员，追加写入，读取时 gzip 会依次解压所有成员
+        with gzip.open(segment_file, 'at', encoding='utf-8') as f:
+            f.writelines(lines)
+
+
+def _segments(log_dir):
+    return sorted(glob.glob(os.path.join(log_dir, 'conversations_*.jsonl.gz')))
+
+
+def _read_templates(log_dir):
+    templates = {}
+    template_file = os.path.join(log_dir, TEMPLATE_FILE)
+    if os.path.exists(template_file):
+        with open(template_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    template = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                templates[template['hash']] = template['text']
+    return templates
+
+
+def read_conversations(log_dir):
+    """按写入顺序读取一个对话日志目录中的所有对话
+
+    目录中有压缩分段时只读分段，否则读取旧的逐文件 JSON（转换时未删除的旧文件不会重复读出）。
+
+    Args:
+        log_dir (str): conversation_logs_* 目录
+
+    Yields:
+        dict: 与旧版 *_conversation.json 相同的字段（timestamp、input_file、stage、system、prompt、response）
+    """
+    templates = _read_templates(log_dir)
+    segments = _segments(log_dir)
+    for segment_file in segments:
+        try:
+            with gzip.open(segment_file, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 崩溃时可能留下不完整的最后一行
+                        continue
+                    template = templates.get(record.pop('template', None), '')
+                    record['system'] = templates.get(record.get('system'))
+                    record['prompt'] = template + (record.get('prompt') or '')
+                    yield record
+        except (OSError, EOFError) as e:
+            logger.error(f"读取对话日志 {segment_file} 失败: {str(e)}")
+    if segments:
+        return
+    for log_file in sorted(glob.glob(os.path.join(log_dir, '*_conversation.json'))):
+        try:
+            with open(log_file, 'r', encoding='utf-8') as f:
+                yield json.load(f)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            logger.error(f"读取对话日志 {log_file} 失败: {str(e)}")
+
+
+def find_conversation(log_dir, filename, stage=None):
+    """查找某个输入文件的对话，返回最后一条匹配的记录，没有时返回 None
+
+    Args:
+        log_dir (str): conversation_logs_* 目录
+        filename (str): 输入文件名，可以不带扩展名
+        stage (str, optional): 处理阶段. Defaults to None.
+    """
+    found = None
+    for conversation in read_conversations(log_dir):
+        input_file = conversation.get('input_file') or ''
+        if filename in (input_file, os.path.splitext(input_file)[0]) and stage in (None, conversation.get('stage')):
+            found = conversation
+    return found
+
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def get_conversation_log(log_dir):
+    """获取日志目录共享的写入端
+
+    Args:
+        log_dir (str): 日志目录
+
+    Returns:
+        ConversationLog: 共享的写入端
+    """
+    key = os.path.abspath(log_dir)
+    with _logs_lock:
+        log = _logs.get(key)
+        if log is None:
+            log = _logs[key] = ConversationLog(log_dir)
+        return log
+
+
+def close_conversation_logs():
+    """等待所有写入端把队列写完，在一次运行结束时调用"""
+    with _logs_lock:
+        logs = list(_logs.values())
+        _logs.clear()
+    for log in logs:
+        log.close()
+
+
+atexit.register(close_conversation_logs)
+
+
+def convert_log_dir(log_dir, remove=False):
+    """把旧的逐文件 JSON 对话日志转换为压缩格式
+
+    Args:
+        log_dir (str): conversation_logs_* 目录
+        remove (bool, optional): 转换后删除旧文件. Defaults to False.
+
+    Returns:
+        int: 转换的记录数
+    """
+    if _segments(log_dir):
+        logger.info(f"{log_dir} 已经是压缩格式，跳过")
+        return 0
+    log_files = sorted(glob.glob(os.path.join(log_dir, '*_conversation.json')))
+    log = ConversationLog(log_dir)
+    converted = []
+    for log_file in log_files:
+        try:
+            with open(log_file, 'r', encoding='utf-8') as f:
+                conversation = json.load(f)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            logger.error(f"读取对话日志 {log_file} 失败: {str(e)}")
+            continue
+        log.append(conversation)
+        converted.append(log_file)
+    log.close()
+    if remove:
+        for log_file in converted:
+            os.remove(log_file)
+    logger.info(f"{log_dir}: 转换 {len(converted)} 条对话日志")
+    return len(converted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对话日志工具")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    convert_parser = subparsers.add_parser('convert', help="把旧的逐文件 JSON 日志转换为压缩格式")
+    convert_parser.add_argument('dirs', nargs='+', help="conversation_logs_* 目录")
+    convert_parser.add_argument('--remove', action='store_true', help="转换后删除旧文件")
+    show_parser = subparsers.add_parser('show', help="还原并打印对话")
+    show_parser.add_argument('dir', help="conversation_logs_* 目录")
+    show_parser.add_argument('--file', help="只显示某个输入文件")
+    show_parser.add_argument('--stage', help="只显示某个阶段")
+    args = parser.parse_args()
+    setup_logging()
+
+    if args.command == 'convert':
+        total = sum(convert_log_dir(log_dir, args.remove) for log_dir in args.dirs if os.path.isdir(log_dir))
+        print(f"转换 {total} 条对话日志")
+    elif args.file:
+        print(json.dumps(find_conversation(args.dir, args.file, args.stage), ensure_ascii=False, indent=2))
+    else:
+        for conversation in read_conversations(args.dir):
+            if args.stage in (None, conversation.get('stage')):
+                print(json.dumps(conversation, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""抽取结果评测：以人工标注的 *_result.json 为金标准，计算各实验运行的实体/关系 P、R、F1
+
+每篇文档的实体和三元组先转换为可哈希的键放入集合，TP 是一次集合交集，不做逐对比较。
+两种匹配方式：
+- exact：实体为 (实体, 类型)，关系为 (head, predicate, tail)，仅去掉首尾空白；
+- fuzzy：文本经全角转半角、去空白和标点、统一大小写后比较，实体只比较实体名、不要求类型一致。
+只统计运行中实际产出的金标准文档，覆盖率单独列出。文档在多个进程间并行评测。
+
+用法: python evaluation.py --gold 金标准目录 [实验根目录 ...] [--output evaluation.csv]
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from config import logger, MAX_WORKERS, setup_logging
+from fusion import normalize_key, RESULT_SUFFIX
+from type_normalizer import clean_type_name
+
+EXACT = 'exact'
+FUZZY = 'fuzzy'
+MATCHES = (EXACT, FUZZY)
+ENTITY = 'entity'
+RELATION = 'relation'
+KINDS = (ENTITY, RELATION)
+
+# 每个工作进程持有一份金标准键集合，避免随每个任务重复传输
+_gold = {}
+
+
+def _fuzzy(text):
+    return clean_type_name(normalize_key(text))
+
+
+def _exact(text):
+    return str(text).strip()
+
+
+def result_keys(result):
+    """把一篇文档的抽取结果转换为四组键集合
+
+    Args:
+        result (dict): 抽取结果，包含 entities / relationships
+
+    Returns:
+        dict: {(匹配方式, 类型种类): 键集合}
+    """
+    keys = {(match, kind): set() for match in MATCHES for kind in KINDS}
+    for item in result.get('entities', []):
+        if isinstance(item, dict) and item.get('entity'):
+            keys[(EXACT, ENTITY)].add((_exact(item['entity']), _exact(item.get('type') or '')))
+            keys[(FUZZY, ENTITY)].add(_fuzzy(item['entity']))
+    for item in result.get('relationships', []):
+        if isinstance(item, dict) and item.get('head') and item.get('predicate') and item.get('tail'):
+            keys[(EXACT, RELATION)].add((_exact(item['head']), _exact(item['predicate']), _exact(item['tail'])))
+            keys[(FUZZY, RELATION)].add((_fuzzy(item['head']), _fuzzy(item['predicate']), _fuzzy(item['tail'])))
+    return keys
+
+
+def _load_keys(result_file):
+    try:
+        with open(result_file, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+    except (OSError, json.JSONDecodeError, UnicodeDecodeError) as e:
+        logger.error(f"读取结果文件 {result_file} 失败: {str(e)}")
+        return None
+    return result_keys(result) if isinstance(result, dict) else None
+
+
+def load_gold(gold_dir):
+    """读取金标准目录下的所有 *_result.json
+
+    Args:
+        gold_dir (str): 金标准目录
+
+    Returns:
+        dict: 文件名 -> result_keys 的返回值
+    """
+    gold = {}
+    for gold_file in sorted(glob.glob(os.path.join(gold_dir, f'*{RESULT_SUFFIX}'))):
+        keys = _load_keys(gold_file)
+        if keys is not None:
+            gold[os.path.basename(gold_file)] = keys
+    return gold
+
+
+def _init_worker(gold):
+    global _gold
+    _gold = gold
+
+
+def _score_file(task):
+    """评测一篇文档，返回 (运行名称, {(匹配方式, 类型种类): (TP, 预测数, 金标准数)})"""
+    run_name, result_file = task
+    predicted = _load_keys(result_file)
+    if predicted is None:
+        return run_name, None
+    gold = _gold[os.path.basename(result_file)]
+    return run_name, {key: (len(predicted[key] & gold[key]), len(predicted[key]), len(gold[key])) for key in gold}
+
+
+def prf(tp, predicted, gold):
+    """由计数计算 (precision, recall, F1)，分母为 0 时对应指标为 0"""
+    precision = tp / predicted if predicted else 0.0
+    recall = tp / gold if gold else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+def discover_result_dirs(roots, gold_dir):
+    """扫描实验根目录下所有包含 *_result.json 的目录（不含金标准目录本身）
+
+    Returns:
+        list: (运行名称, 目录) 元组列表，按名称排序
+    """
+    gold_dir = os.path.abspath(gold_dir)
+    runs = {}
+    for root in roots:
+        base = os.path.dirname(os.path.abspath(root))
+        for path in glob.glob(os.path.join(root, '**', f'*{RESULT_SUFFIX}'), recursive=True):
+            result_dir = os.path.abspath(os.path.dirname(path))
+            if result_dir != gold_dir:
+                runs.setdefault(result_dir, os.path.relpath(result_dir, base))
+    return sorted((name, result_dir) for result_dir, name in runs.items())
+
+
+def evaluate(gold_dir, roots, max_workers=MAX_WORKERS):
+    """评测实验根目录下的所有运行
+
+    Args:
+        gold_dir (str): 金标准目录
+        roots (list): 实验根目录列表
+        max_workers (int, optional): 并行进程数. Defaults to MAX_WORKERS.
+
+    Returns:
+        list: 每个运行一个字典，包含覆盖的文档数和各项 P/R/F1（微平均）
+    """
+    gold = load_gold(gold_dir)
+    if not gold:
+        logger.error(f"金标准目录 {gold_dir} 中没有 *{RESULT_SUFFIX}")
+        return []
+    runs = discover_result_dirs(roots, gold_dir)
+    tasks = [(name, os.path.join(result_dir, filename)) for name, result_dir in runs
+             for filename in gold if os.path.exists(os.path.join(result_dir, filename))]
+
+    totals = {name: {'documents': 0, 'counts': {}} for name, _ in runs}
+    if max_workers is None or max_workers <= 1:
+        _init_worker(gold)
+        outcomes = map(_score_file, tasks)
+        _accumulate(totals, outcomes)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(gold,)) as executor:
+            _accumulate(totals, executor.map(_score_file, tasks, chunksize=32))
+
+    rows = []
+    for name, total in totals.items():
+        if not total['documents']:
+            continue
+        row = {'run': name, 'documents': total['documents'], 'coverage': total['documents'] / len(gold)}
+        for (match, kind), (tp, predicted, gold_count) in sorted(total['counts'].items()):
+            precision, recall, f1 = prf(tp, predicted, gold_count)
+            row[f'{kind}_{match}_p'] = precision
+            row[f'{kind}_{match}_r'] = recall
+            row[f'{kind}_{match}_f1'] = f1
+        rows.append(row)
+    return rows
+
+
+def _accumulate(totals, outcomes):
+    for run_name, counts in outcomes:
+        if counts is None:
+            continue
+        total = totals[run_name]
+        total['documents'] += 1
+        for key, (tp, predicted, gold_count) in counts.items():
+            old = total['counts'].get(key, (0, 0, 0))
+            total['counts'][key] = (old[0] + tp, old[1] + predicted, old[2] + gold_count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抽取结果评测")
+    parser.add_argument('--gold', required=True, help="金标准目录（人工标注的 *_result.json）")
+    parser.add_argument('roots', nargs='*', default=['experments'], help="实验根目录")
+    parser.add_argument('--output', help="把评测结果另存为 CSV")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="并行进程数")
+    args = parser.parse_args()
+    setup_logging()
+
+    start = time.perf_counter()
+    rows = evaluate(args.gold, [root for root in args.roots if os.path.isdir(root)], args.workers)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'运行':<60} {'文档':>5}  {'实体F1(exact/fuzzy)':>20}  {'关系F1(exact/fuzzy)':>20}")
+    for row in sorted(rows, key=lambda row: -row['entity_exact_f1']):
+        print(f"{row['run']:<60} {row['documents']:>5}  "
+              f"{row['entity_exact_f1']:>9.3f}/{row['entity_fuzzy_f1']:<10.3f}  "
+              f"{row['relation_exact_f1']:>9.3f}/{row['relation_fuzzy_f1']:<10.3f}")
+    if args.output and rows:
+        with open(args.output, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    print(f"\n{len(rows)} 个运行, 耗时 {elapsed:.2f} 秒")
+    logger.info(f"评测完成: {len(rows)} 个运行, 耗时 {elapsed:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
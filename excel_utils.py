@@ -1,27 +1,55 @@
-import pandas as pd
+import csv
 from datetime import datetime
 import os
 from config import EXCEL_OUTPUT_DIR, logger
 
+COLUMNS = [
+    '文件名',
+    '时间戳',
+    '实体类型',
+    '实体类型Jaccard系数',
+    '关系类型',
+    '关系类型Jaccard系数'
+]
+
+
 class CSVRecorder:
-    def __init__(self):
-        """初始化CSV记录器"""
+    def __init__(self, csv_file=None, flush_every=20, resume=False):
+        """初始化CSV记录器
+
+        每条记录直接追加写入 CSV 文件，每 flush_every 行刷新一次缓冲区，
+        因此内存占用与行数无关，进程中途崩溃也只会丢失最后一批未刷新的记录。
+
+        Args:
+            csv_file (str, optional): CSV 文件路径，默认在 EXCEL_OUTPUT_DIR 下按时间戳命名
+            flush_every (int, optional): 每写入多少行刷新一次. Defaults to 20.
+            resume (bool, optional): csv_file 已存在时是否继续追加并读回已有记录. Defaults to False.
+        """
         self.timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        self.csv_file = os.path.join(EXCEL_OUTPUT_DIR, f'extraction_results_{self.timestamp}.csv')
-        
-        # 创建DataFrame
-        self.df = pd.DataFrame(columns=[
-            '文件名', 
-            '时间戳', 
-            '实体类型', 
-            '实体类型Jaccard系数',
-            '关系类型',
-            '关系类型Jaccard系数'
-        ])
-        
+        self.csv_file = csv_file or os.path.join(EXCEL_OUTPUT_DIR, f'extraction_results_{self.timestamp}.csv')
+        self.flush_every = flush_every
+        self.rows_written = 0
+        self._unflushed = 0
+        self._file = None
+        self._writer = None
+        self.resume = resume
+
+    def _open(self):
+        directory = os.path.dirname(self.csv_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.resume and os.path.exists(self.csv_file) and os.path.getsize(self.csv_file) > 0:
+            self.rows_written = len(self.read_rows())
+            self._file = open(self.csv_file, 'a', encoding='utf-8-sig', newline='')
+            self._writer = csv.writer(self._file)
+        else:
+            self._file = open(self.csv_file, 'w', encoding='utf-8-sig', newline='')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(COLUMNS)
+
     def record_types(self, filename, entity_types, entity_jaccard, relation_types, relation_jaccard):
         """记录实体类型、关系类型和Jaccard系数
-        
+
         Args:
             filename (str): 处理的文件名
             entity_types (set): 实体类型集合
@@ -29,29 +57,46 @@ class CSVRecorder:
             relation_types (set): 关系类型集合
             relation_jaccard (float): 关系类型Jaccard系数
         """
+        if self._writer is None:
+            self._open()
+
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
+
         # 将集合转换为字符串
         entity_types_str = '、'.join(sorted(entity_types))
         relation_types_str = '、'.join(sorted(relation_types))
-        
-        # 添加新记录
-        new_record = pd.DataFrame([{
-            '文件名': filename,
-            '时间戳': timestamp,
-            '实体类型': entity_types_str,
-            '实体类型Jaccard系数': entity_jaccard,
-            '关系类型': relation_types_str,
-            '关系类型Jaccard系数': relation_jaccard
-        }])
-        
-        self.df = pd.concat([self.df, new_record], ignore_index=True)
-            
+
+        # 追加新记录
+        self._writer.writerow([filename, timestamp, entity_types_str, entity_jaccard,
+                               relation_types_str, relation_jaccard])
+        self.rows_written += 1
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self._file.flush()
+            self._unflushed = 0
+
+    def read_rows(self):
+        """读回 CSV 文件中已有的记录
+
+        Returns:
+            list: 每行一个字典，键为列名
+        """
+        if self._file is not None:
+            self._file.flush()
+        if not os.path.exists(self.csv_file):
+            return []
+        with open(self.csv_file, 'r', encoding='utf-8-sig', newline='') as f:
+            return list(csv.DictReader(f))
+
     def save(self):
-        """保存CSV文件"""
+        """刷新并关闭CSV文件"""
         try:
-            # 保存CSV文件
-            self.df.to_csv(self.csv_file, index=False, encoding='utf-8-sig')
-            logger.info(f"CSV记录已保存至: {self.csv_file}")
+            if self._writer is None:
+                self._open()
+            self._file.flush()
+            self._file.close()
+            self._file = None
+            self._writer = None
+            logger.info(f"CSV记录已保存至: {self.csv_file}（共 {self.rows_written} 条）")
         except Exception as e:
-            logger.error(f"保存CSV文件失败: {str(e)}") 
\ No newline at end of file
+            logger.error(f"保存CSV文件失败: {str(e)}")
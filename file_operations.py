@@ -1,23 +1,25 @@
 import os
 import json
 from datetime import datetime
-from config import logger, entity_jaccard_history, relation_jaccard_history
-from utils import calculate_jaccard
+from config import logger, entity_jaccard_history, relation_jaccard_history, KG_STORE_CONFIG, \
+    CONVERSATION_LOG_CONFIG
+from utils import calculate_jaccard, save_convergence_state
+from type_registry import get_type_registry
+from kg_store import get_kg_store
+from conversation_log import get_conversation_log
 
-def update_type_files(validated_json, entity_file, relation_file):
-    """从验证结果中提取实体类型和关系类型，更新类型文件并计算 Jaccard 系数"""
-    try:
-        # 读取现有类型
-        existing_entity_types = set()
-        existing_relation_types = set()
+# 每对类型文件自上次保存收敛状态以来处理的文档数
+_unsaved_documents = {}
 
-        if os.path.exists(entity_file):
-            with open(entity_file, 'r', encoding='utf-8') as f:
-                existing_entity_types = set(line.strip() for line in f if line.strip())
 
-        if os.path.exists(relation_file):
-            with open(relation_file, 'r', encoding='utf-8') as f:
-                existing_relation_types = set(line.strip() for line in f if line.strip())
+def update_type_files(validated_json, entity_file, relation_file):
+    """从验证结果中提取实体类型和关系类型，更新类型词表并计算 Jaccard 系数
+
+    类型保存在共享的 TypeRegistry 中，类型文件由词表定期快照写回，而不是每个文档重写一次；
+    Jaccard 历史同样每 snapshot_every 个文档保存一次，运行结束时由 flush_type_files 写回。
+    """
+    try:
+        registry = get_type_registry(entity_file, relation_file)
 
         # 提取当前抽取的类型
         current_entity_types = {entity["type"] for entity in validated_json.get("entities", [])}
@@ -27,6 +29,9 @@ def update_type_files(validated_json, entity_file, relation_file):
         logger.info(f"当前抽取的实体类型: {current_entity_types}")
         logger.info(f"当前抽取的关系类型: {current_relation_types}")
 
+        # 合并类型，并取得合并前的类型集合
+        existing_entity_types, existing_relation_types = registry.add(current_entity_types, current_relation_types)
+
         # 计算 Jaccard 系数
         entity_jaccard = calculate_jaccard(current_entity_types, existing_entity_types)
         relation_jaccard = calculate_jaccard(current_relation_types, existing_relation_types)
@@ -36,49 +41,65 @@ def update_type_files(validated_json, entity_file, relation_file):
         # 更新 Jaccard 历史
         entity_jaccard_history.append(entity_jaccard)
         relation_jaccard_history.append(relation_jaccard)
-
-        # 合并类型
-        updated_entity_types = existing_entity_types | current_entity_types
-        updated_relation_types = existing_relation_types | current_relation_types
-
-        # 更新实体类型文件
-        with open(entity_file, 'w', encoding='utf-8') as f:
-            for entity_type in sorted(updated_entity_types):
-                f.write(f"{entity_type}\n")
-        logger.info(f"更新实体类型文件: {entity_file}")
-
-        # 更新关系类型文件
-        with open(relation_file, 'w', encoding='utf-8') as f:
-            for relation_type in sorted(updated_relation_types):
-                f.write(f"{relation_type}\n")
-        logger.info(f"更新关系类型文件: {relation_file}")
+        unsaved = _unsaved_documents.get(entity_file, 0) + 1
+        if unsaved >= registry.snapshot_every:
+            save_convergence_state(entity_file)
+            unsaved = 0
+        _unsaved_documents[entity_file] = unsaved
 
         return entity_jaccard, relation_jaccard
     except Exception as e:
         logger.error(f"更新类型文件失败: {str(e)}")
         return None, None
 
-def save_results(result, input_file, output_dir, timestamp):
-    """保存处理结果到专用文件夹"""
+def flush_type_files(entity_file, relation_file):
+    """把类型词表快照和 Jaccard 历史写回磁盘，在运行结束时调用"""
+    get_type_registry(entity_file, relation_file).snapshot()
     try:
-        result_dir = os.path.join(output_dir, f"results_{timestamp}")
-        os.makedirs(result_dir, exist_ok=True)
+        save_convergence_state(entity_file)
+        _unsaved_documents[entity_file] = 0
+    except OSError as e:
+        logger.error(f"保存收敛状态失败: {str(e)}")
 
+def save_results(result, input_file, output_dir, timestamp):
+    """保存处理结果：追加到输出目录的知识图谱存储，并（默认）写入专用文件夹中的 JSON 文件"""
+    try:
         base_name = os.path.splitext(os.path.basename(input_file))[0]
-        output_file = os.path.join(result_dir, f"{base_name}_result.json")
-
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
-        logger.info(f"结果保存至: {output_file}")
-        return output_file
+        saved = None
+
+        store = get_kg_store(output_dir)
+        if store is not None:
+            store.add_result(f"results_{timestamp}", base_name, result)
+            saved = store.path
+
+        if store is None or KG_STORE_CONFIG['json_results']:
+            result_dir = os.path.join(output_dir, f"results_{timestamp}")
+            os.makedirs(result_dir, exist_ok=True)
+            output_file = os.path.join(result_dir, f"{base_name}_result.json")
+
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            saved = output_file
+        logger.info(f"结果保存至: {saved}")
+        return saved
     except Exception as e:
         logger.error(f"保存结果失败: {str(e)}")
         return None
 
 def save_conversation_log(prompt, response, output_dir, timestamp, filename, stage):
-    """保存每次对话的 Prompt 和 Response"""
+    """保存每次对话的 Prompt 和 Response
+
+    默认交给后台线程写入压缩的对话日志（见 conversation_log.py），调用方不等待磁盘 I/O；
+    CONVERSATION_LOG_CONFIG['format'] 为 'json' 时按旧格式每次写一个文件。
+    """
     try:
         log_dir = os.path.join(output_dir, f"conversation_logs_{timestamp}")
+        system = getattr(prompt, 'system', None)  # 静态指令（system 消息）
+
+        if CONVERSATION_LOG_CONFIG['format'] != 'json':
+            get_conversation_log(log_dir).write(prompt, response, filename, stage, system)
+            return
+
         os.makedirs(log_dir, exist_ok=True)
 
         base_name = os.path.splitext(os.path.basename(filename))[0]
@@ -88,6 +109,7 @@ def save_conversation_log(prompt, response, output_dir, timestamp, filename, sta
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "input_file": filename,
             "stage": stage,  # 区分抽取和验证
+            "system": system,
             "prompt": prompt,
             "response": response
         }
@@ -96,4 +118,4 @@ def save_conversation_log(prompt, response, output_dir, timestamp, filename, sta
             json.dump(conversation, f, ensure_ascii=False, indent=2)
         logger.info(f"对话日志保存至: {log_file}")
     except Exception as e:
-        logger.error(f"保存对话日志失败: {str(e)}") 
\ No newline at end of file
+        logger.error(f"保存对话日志失败: {str(e)}")
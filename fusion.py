@@ -0,0 +1,211 @@
+"""多模型结果融合（精炼，Jinglian）
+
+逐个植物读取各模型的 *_result.json，用归一化后的键把实体和 (head, predicate, tail) 三元组
+索引到哈希表中，按多数投票或加权投票合并，输出融合后的结果集。每个进程一次只持有一个植物的
+各模型结果，内存占用与植物数无关；不同植物之间并行处理。
+
+用法: python fusion.py --inputs experments/gemini1 experments/deepseek1 experments/chatglm1 \\
+          --output experments/gemini_deepseek_chatglm_Jinglian [--weights 1 1 0.5] [--strategy majority]
+"""
+import argparse
+import glob
+import json
+import os
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from config import logger, MAX_WORKERS, setup_logging
+
+RESULT_SUFFIX = '_result.json'
+
+# 融合策略：保留得票权重占比满足条件的实体/三元组
+MAJORITY = 'majority'  # 超过一半
+WEIGHTED = 'weighted'  # 不低于 min_support
+UNION = 'union'  # 任一模型给出即保留
+STRATEGIES = (MAJORITY, WEIGHTED, UNION)
+
+
+def normalize_key(text):
+    """归一化实体/关系文本作为索引键：全角转半角、去掉空白、统一大小写"""
+    return ''.join(unicodedata.normalize('NFKC', str(text)).split()).lower()
+
+
+def _load_result(result_file):
+    """读取一个模型的结果文件，该模型没有处理这个植物时返回 None"""
+    if not os.path.exists(result_file):
+        return None
+    try:
+        with open(result_file, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+    except (OSError, json.JSONDecodeError, UnicodeDecodeError) as e:
+        logger.error(f"读取结果文件 {result_file} 失败: {str(e)}")
+        return None
+    return result if isinstance(result, dict) else None
+
+
+def _accepted(support, total, strategy, min_support):
+    if strategy == UNION:
+        return support > 0
+    if strategy == MAJORITY:
+        return support * 2 > total
+    return support >= min_support * total
+
+
+def normalize_schema(result):
+    """把旧版严格模式的 "relations" / "relation" 键转换为 "relationships" / "predicate"
+
+    旧版严格模式 prompt 要求输出这种格式，响应缓存和历史结果中仍然存在；其他格式原样返回。
+    """
+    if not isinstance(result, dict) or 'relations' not in result:
+        return result
+    result = dict(result)
+    relations = result.pop('relations') or []
+    if not result.get('relationships'):
+        result['relationships'] = [
+            dict(item, predicate=item.get('predicate') or item.get('relation')) if isinstance(item, dict) else item
+            for item in relations]
+    return result
+
+
+def fuse_results(results, weights=None, strategy=MAJORITY, min_support=0.5):
+    """融合同一植物的多个模型结果
+
+    实体按归一化后的实体名索引，类型取得票权重最高者（平票时取排在前面的模型）；
+    三元组按归一化后的 (head, predicate, tail) 索引。每个模型对同一个键只计一票。
+
+    Args:
+        results (list): 各模型的结果字典，缺失的模型为 None
+        weights (list, optional): 各模型的权重，默认均为 1
+        strategy (str, optional): 'majority'、'weighted' 或 'union'. Defaults to 'majority'.
+        min_support (float, optional): weighted 策略下保留所需的最低得票权重占比. Defaults to 0.5.
+
+    Returns:
+        tuple: (融合结果字典, 参与投票的模型数)
+    """
+    weights = weights or [1.0] * len(results)
+    entities = {}  # 键 -> {'entity': 首次出现的写法, 'types': {类型: 权重}, 'support': 权重}
+    triples = {}  # 键 -> {'item': 首次出现的三元组, 'support': 权重}
+    total = 0.0
+    voters = 0
+    for result, weight in zip(results, weights):
+        if result is None:
+            continue
+        result = normalize_schema(result)
+        total += weight
+        voters += 1
+
+        voted = set()
+        for item in result.get('entities', []):
+            if not isinstance(item, dict) or not item.get('entity'):
+                continue
+            key = normalize_key(item['entity'])
+            entry = entities.setdefault(key, {'entity': item['entity'], 'types': {}, 'support': 0.0})
+            if key not in voted:
+                voted.add(key)
+                entry['support'] += weight
+                if item.get('type'):
+                    entry['types'][item['type']] = entry['types'].get(item['type'], 0.0) + weight
+
+        voted = set()
+        for item in result.get('relationships', []):
+            if not isinstance(item, dict) or not (item.get('head') and item.get('predicate') and item.get('tail')):
+                continue
+            key = (normalize_key(item['head']), normalize_key(item['predicate']), normalize_key(item['tail']))
+            if key in voted:
+                continue
+            voted.add(key)
+            entry = triples.setdefault(key, {'item': item, 'support': 0.0})
+            entry['support'] += weight
+
+    fused = {'entities': [], 'relationships': []}
+    for entry in entities.values():
+        if not _accepted(entry['support'], total, strategy, min_support):
+            continue
+        # dict 保持插入顺序，max 在平票时返回最先出现的类型
+        entity_type = max(entry['types'], key=entry['types'].get) if entry['types'] else None
+        fused['entities'].append({'entity': entry['entity'], 'type': entity_type})
+    for entry in triples.values():
+        if _accepted(entry['support'], total, strategy, min_support):
+            item = entry['item']
+            fused['relationships'].append({'head': item['head'], 'predicate': item['predicate'], 'tail': item['tail']})
+    return fused, voters
+
+
+def _fuse_plant(task):
+    """融合一个植物并写出结果，在工作进程中运行"""
+    result_name, input_dirs, weights, output_dir, strategy, min_support = task
+    results = [_load_result(os.path.join(input_dir, result_name)) for input_dir in input_dirs]
+    fused, voters = fuse_results(results, weights, strategy, min_support)
+    if not voters:
+        return result_name, 0, 0, 0
+    with open(os.path.join(output_dir, result_name), 'w', encoding='utf-8') as f:
+        json.dump(fused, f, ensure_ascii=False, indent=2)
+    return result_name, voters, len(fused['entities']), len(fused['relationships'])
+
+
+def fuse_directories(input_dirs, output_dir, weights=None, strategy=MAJORITY, min_support=0.5,
+                     max_workers=MAX_WORKERS):
+    """融合多个模型结果目录中的所有植物
+
+    Args:
+        input_dirs (list): 各模型的结果目录（包含 <植物>_result.json）
+        output_dir (str): 融合结果输出目录
+        weights (list, optional): 各模型的权重，默认均为 1
+        strategy (str, optional): 'majority'、'weighted' 或 'union'. Defaults to 'majority'.
+        min_support (float, optional): weighted 策略下保留所需的最低得票权重占比. Defaults to 0.5.
+        max_workers (int, optional): 并行进程数. Defaults to MAX_WORKERS.
+
+    Returns:
+        dict: 植物数、实体总数和三元组总数
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"不支持的融合策略: {strategy}")
+    if weights is not None and len(weights) != len(input_dirs):
+        raise ValueError("weights 的数量必须与 input_dirs 相同")
+    os.makedirs(output_dir, exist_ok=True)
+
+    # 只收集文件名，各模型的结果在处理对应植物时才读取
+    result_names = sorted({os.path.basename(path) for input_dir in input_dirs
+                           for path in glob.glob(os.path.join(input_dir, f'*{RESULT_SUFFIX}'))})
+    tasks = ((name, input_dirs, weights, output_dir, strategy, min_support) for name in result_names)
+
+    summary = {'plants': 0, 'entities': 0, 'relationships': 0}
+    if max_workers is None or max_workers <= 1:
+        outcomes = map(_fuse_plant, tasks)
+        for outcome in outcomes:
+            _accumulate(summary, outcome)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for outcome in executor.map(_fuse_plant, tasks, chunksize=8):
+                _accumulate(summary, outcome)
+    logger.info(f"融合完成: {summary}，输出目录 {output_dir}")
+    return summary
+
+
+def _accumulate(summary, outcome):
+    _, voters, entity_count, relation_count = outcome
+    if voters:
+        summary['plants'] += 1
+        summary['entities'] += entity_count
+        summary['relationships'] += relation_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多模型结果融合")
+    parser.add_argument('--inputs', nargs='+', required=True, help="各模型的结果目录")
+    parser.add_argument('--output', required=True, help="融合结果输出目录")
+    parser.add_argument('--weights', nargs='+', type=float, help="各模型的权重，与 --inputs 一一对应")
+    parser.add_argument('--strategy', choices=STRATEGIES, default=MAJORITY, help="融合策略")
+    parser.add_argument('--min-support', type=float, default=0.5, help="weighted 策略的最低得票权重占比")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="并行进程数")
+    args = parser.parse_args()
+    setup_logging()
+
+    start = time.perf_counter()
+    summary = fuse_directories(args.inputs, args.output, args.weights, args.strategy, args.min_support,
+                               args.workers)
+    print(f"{summary}，耗时 {time.perf_counter() - start:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
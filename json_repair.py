@@ -0,0 +1,397 @@
+import json
+import re
+
+_NUMBER_PATTERN = re.compile(r'-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?$')
+_LITERALS = {'true': 'true', 'false': 'false', 'null': 'null', 'True': 'true', 'False': 'false', 'None': 'null'}
+_VALID_ESCAPES = set('"\\/bfnrtu')
+_WHITESPACE = set(' \t\r\n')
+_CONTROL_ESCAPES = {'\n': '\\n', '\r': '\\r', '\t': '\\t'}
+
+# 词法单元：一次正则匹配吞掉整段空白、规范的双引号字符串或裸词，避免逐字符循环
+_WS_PATTERN = re.compile(r'\s+')
+_CLEAN_STRING_PATTERN = re.compile(r'"(?:[^"\\\x00-\x1f]|\\["\\/bfnrtu])*"')
+_BARE_PATTERN = re.compile(r'[^{}\[\],:"\'\n]+')
+
+# 词法修复：一次 finditer 扫描，合法片段整段匹配（C 速度），只在不规范的 token 处做替换。
+# 覆盖单引号字符串、多余逗号、未加引号的键和 Python 字面量；结构性损坏交给 _Repairer
+_LEXICAL_PATTERN = re.compile(
+    r'(?P<clean>(?:"[^"\\\x00-\x1f]*(?:\\["\\/bfnrtu][^"\\\x00-\x1f]*)*"|[\s{}\[\]:]+'
+    r'|,(?!\s*[}\]])|-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null)+)'
+    r'|(?P<comma>,\s*(?=[}\]]))'
+    r"|'(?P<single>[^'\\\n]*(?:\\.[^'\\\n]*)*)'"
+    r'|(?P<literal>\b(?:True|False|None)\b)'
+    r'|(?P<key>[A-Za-z_]\w*)(?=\s*:)'
+    r'|(?P<other>.)',
+    re.S
+)
+_STRING_PATTERN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+# 换行前的多余逗号：合法的 JSON 字符串不能包含原始换行，因此替换后能通过校验就说明匹配都在字符串之外。
+# 替换内容是常量，re.sub 全程在 C 中完成，不需要逐个匹配的回调
+_TRAILING_BRACE_PATTERN = re.compile(r',[ \t\r]*\n\s*}')
+_TRAILING_BRACKET_PATTERN = re.compile(r',[ \t\r]*\n\s*\]')
+_NON_BRACKET_PATTERN = re.compile(r'[^{}\[\]]+')
+_decoder = json.JSONDecoder()
+_PYTHON_LITERALS = {'True': 'true', 'False': 'false', 'None': 'null'}
+
+# 容器状态：对象 key -> colon -> value -> comma；数组 value -> comma
+_KEY, _COLON, _VALUE, _COMMA = 'key', 'colon', 'value', 'comma'
+
+
+class _Repairer:
+    """单次线性扫描的 JSON 修复器，输出紧凑的 token 序列"""
+
+    def __init__(self, text):
+        self.text = text
+        self.n = len(text)
+        self.tokens = []
+        self.stack = []  # 每个元素为 [容器类型, 状态]
+        self.repairs = []
+        self.safe_cut = None  # (token 数, 栈快照)：截断时回退到的最后一个完整位置
+
+    def note(self, repair):
+        if repair not in self.repairs:
+            self.repairs.append(repair)
+
+    def mark_safe(self):
+        # 只在数组元素之间或根对象的成员之间记录截断点，避免截断后留下缺字段的实体/关系对象
+        if self.stack[-1][0] == '[' or len(self.stack) == 1:
+            self.safe_cut = (len(self.tokens), [entry[0] for entry in self.stack])
+
+    def run(self):
+        text = self.text
+        i = text.find('{')
+        if i < 0:
+            return None
+        if text[:i].strip():
+            self.note('strip_fence' if '```' in text[:i] else 'strip_prefix')
+
+        ws_match = _WS_PATTERN.match
+        string_match = _CLEAN_STRING_PATTERN.match
+        while i < self.n:
+            c = text[i]
+            if c in _WHITESPACE:
+                i = ws_match(text, i).end()
+            elif c == '"':
+                m = string_match(text, i)
+                if m:
+                    self.emit_key_or_value(m.group())
+                    i = m.end()
+                else:
+                    i = self.read_string(i, c)
+            elif c == "'":
+                i = self.read_string(i, c)
+            elif c == '{' or c == '[':
+                self.before_value()
+                self.tokens.append(c)
+                self.stack.append([c, _KEY if c == '{' else _VALUE])
+                self.mark_safe()
+                i += 1
+            elif c == '}' or c == ']':
+                self.close(c)
+                i += 1
+                if not self.stack:
+                    if text[i:].strip():
+                        self.note('strip_suffix')
+                    return self.finish()
+            elif c == ',':
+                self.comma()
+                i += 1
+            elif c == ':':
+                top = self.stack[-1]
+                if top[0] == '{' and top[1] == _COLON:
+                    self.tokens.append(':')
+                    top[1] = _VALUE
+                else:
+                    self.note('drop_garbage')
+                i += 1
+            elif c == '/' and text.startswith('//', i):
+                self.note('strip_comment')
+                end = text.find('\n', i)
+                i = self.n if end < 0 else end
+            else:
+                i = self.read_bare(i)
+
+        # 输入结束时仍有未闭合的结构：回退到最后一个完整值并补全括号
+        self.note('truncated')
+        if self.safe_cut is None:
+            return None
+        cut, stack = self.safe_cut
+        del self.tokens[cut:]
+        if self.tokens and self.tokens[-1] == ',':
+            self.tokens.pop()
+        for container in reversed(stack):
+            self.tokens.append('}' if container == '{' else ']')
+        return ''.join(self.tokens)
+
+    def finish(self):
+        return ''.join(self.tokens)
+
+    def before_value(self):
+        """在写入一个值之前，根据容器状态补上缺失的逗号或冒号"""
+        if not self.stack:
+            return
+        top = self.stack[-1]
+        if top[1] == _COMMA:
+            self.note('missing_comma')
+            self.tokens.append(',')
+            top[1] = _KEY if top[0] == '{' else _VALUE
+        if top[0] == '{':
+            if top[1] == _KEY:
+                # 对象中本应是键的位置出现了值，无法修复，交给最终校验
+                return
+            if top[1] == _COLON:
+                self.note('missing_colon')
+                self.tokens.append(':')
+                top[1] = _VALUE
+
+    def after_value(self):
+        if self.stack:
+            self.stack[-1][1] = _COMMA
+            self.mark_safe()
+
+    def emit_key_or_value(self, token):
+        """写入字符串或裸词：对象键位置作为键，否则作为值"""
+        top = self.stack[-1]
+        if top[0] == '{' and top[1] in (_KEY, _COMMA):
+            if top[1] == _COMMA:
+                self.note('missing_comma')
+                self.tokens.append(',')
+            self.tokens.append(token)
+            top[1] = _COLON
+            return
+        self.before_value()
+        self.tokens.append(token)
+        self.after_value()
+
+    def close(self, c):
+        expected = '{' if c == '}' else '['
+        # 括号不匹配时先闭合内层未闭合的容器
+        while self.stack and self.stack[-1][0] != expected:
+            self.note('balance_brackets')
+            self.close_top()
+        if self.stack:
+            self.close_top()
+
+    def close_top(self):
+        """闭合栈顶容器，先去掉悬空的键和多余的逗号"""
+        container, state = self.stack[-1]
+        if container == '{' and state in (_COLON, _VALUE) and self.tokens[-1] != '{':
+            # 键后面缺少值，去掉这个键（以及冒号）
+            self.note('drop_dangling_key')
+            if state == _VALUE:
+                self.tokens.pop()
+            self.tokens.pop()
+        if self.tokens[-1] == ',':
+            self.note('trailing_comma')
+            self.tokens.pop()
+        self.stack.pop()
+        self.tokens.append('}' if container == '{' else ']')
+        self.after_value()
+
+    def comma(self):
+        top = self.stack[-1]
+        if top[1] == _COMMA:
+            self.tokens.append(',')
+            top[1] = _KEY if top[0] == '{' else _VALUE
+        else:
+            self.note('drop_extra_comma')
+
+    def read_string(self, i, quote):
+        """读取一个字符串，统一转成双引号，并转义控制字符和非法转义"""
+        if quote == "'":
+            self.note('single_quotes')
+        text = self.text
+        out = ['"']
+        j = i + 1
+        while j < self.n:
+            c = text[j]
+            if c == '\\':
+                nxt = text[j + 1] if j + 1 < self.n else ''
+                if quote == "'" and nxt == "'":
+                    out.append("'")
+                elif nxt in _VALID_ESCAPES and nxt:
+                    out.append(c + nxt)
+                else:
+                    self.note('invalid_escape')
+                    out.append('\\\\')
+                    j += 1
+                    continue
+                j += 2
+                continue
+            if c == quote:
+                out.append('"')
+                self.emit_key_or_value(''.join(out))
+                return j + 1
+            if c == '"':
+                out.append('\\"')
+            elif c in _CONTROL_ESCAPES:
+                self.note('escape_control_char')
+                out.append(_CONTROL_ESCAPES[c])
+            else:
+                out.append(c)
+            j += 1
+        # 字符串未闭合：输入被截断
+        return self.n
+
+    def read_bare(self, i):
+        """读取未加引号的裸词：字面量、数字、省略号或需要补引号的键/值"""
+        text = self.text
+        m = _BARE_PATTERN.match(text, i)
+        j = m.end() if m else i + 1
+        word = text[i:j].strip()
+        if not word or set(word) <= set('.…'):
+            self.note('drop_ellipsis' if word else 'drop_garbage')
+            return max(j, i + 1)
+        if word.startswith('```'):
+            self.note('strip_fence')
+            return j
+        top = self.stack[-1]
+        in_key_position = top[0] == '{' and top[1] in (_KEY, _COMMA)
+        if not in_key_position and word in _LITERALS:
+            if word != _LITERALS[word]:
+                self.note('python_literal')
+            self.emit_key_or_value(_LITERALS[word])
+        elif not in_key_position and _NUMBER_PATTERN.match(word):
+            self.emit_key_or_value(word)
+        else:
+            self.note('quote_key' if in_key_position else 'quote_value')
+            self.emit_key_or_value(json.dumps(word, ensure_ascii=False))
+        return j
+
+
+def _quick_repair(text, repairs):
+    """最常见的两种损坏（整段单引号、换行前的多余逗号）用整段替换修复，内容没有变化时返回 None"""
+    fixed = text
+    if "'" in text and '"' not in text and '\\' not in text:
+        # 整段都是单引号风格：每个单引号都是定界符，可以整体替换而不会误伤撇号
+        repairs.append('single_quotes')
+        fixed = text.replace("'", '"')
+    if ',' in fixed:
+        stripped = _TRAILING_BRACKET_PATTERN.sub(']', _TRAILING_BRACE_PATTERN.sub('}', fixed))
+        if len(stripped) != len(fixed):
+            repairs.append('trailing_comma')
+            fixed = stripped
+    return fixed if fixed is not text else None
+
+
+def _lexical_repair(text, repairs):
+    """一次正则扫描完成词法层面的修复，遇到无法在词法层面处理的内容时立即返回 None"""
+    if "'" in text and '"' not in text and '\\' not in text:
+        # 与 _quick_repair 相同，整段单引号风格可以整体替换
+        repairs.append('single_quotes')
+        text = text.replace("'", '"')
+
+    parts = []
+    for m in _LEXICAL_PATTERN.finditer(text):
+        kind = m.lastgroup
+        if kind == 'clean':
+            parts.append(m.group())
+        elif kind == 'comma':
+            repairs.append('trailing_comma')
+        elif kind == 'single':
+            repairs.append('single_quotes')
+            parts.append('"' + m.group('single').replace("\\'", "'").replace('"', '\\"') + '"')
+        elif kind == 'literal':
+            repairs.append('python_literal')
+            parts.append(_PYTHON_LITERALS[m.group()])
+        elif kind == 'key':
+            repairs.append('quote_key')
+            parts.append('"' + m.group() + '"')
+        else:
+            # 说明文字等无法在词法层面修复的内容，交给 _Repairer，不再逐字符扫描剩余部分
+            return None
+    return ''.join(parts)
+
+
+def _close_truncated(text):
+    """输出在数组元素或根对象成员之间被截断时补全括号，否则返回 None"""
+    if '\\"' in text:
+        outside = _STRING_PATTERN.sub('""', text)
+    else:
+        # 没有转义引号时按引号切分，偶数段就是字符串之外的内容，比正则逐个匹配字符串快得多
+        outside = ''.join(text.split('"')[::2])
+    # 反复消去相邻的成对括号，剩下的应当全是未闭合的左括号，循环次数等于嵌套深度
+    stack = _NON_BRACKET_PATTERN.sub('', outside)
+    while '{}' in stack or '[]' in stack:
+        stack = stack.replace('{}', '').replace('[]', '')
+    if not stack or '}' in stack or ']' in stack or (stack[-1] != '[' and len(stack) > 1):
+        return None
+    return text + ''.join('}' if c == '{' else ']' for c in reversed(stack))
+
+
+def _fast_repair(fixed, repairs):
+    """repair_json 的快速路径，返回能通过校验的结果，否则返回 None"""
+    if repairs and _loads_ok(fixed):
+        return fixed
+    quick = _quick_repair(fixed, repairs)
+    if quick is not None:
+        if _loads_ok(quick):
+            return quick
+        fixed = quick
+    # 最后一个 '}' 之后是被截断的残缺内容：先直接补全括号，仍不合法再做词法修复后补全
+    closed = _close_truncated(fixed)
+    if closed is None or not _loads_ok(closed):
+        lexical = _lexical_repair(fixed, repairs)
+        if lexical is None:
+            return None
+        if _loads_ok(lexical):
+            return lexical
+        closed = _close_truncated(lexical)
+        if closed is None or not _loads_ok(closed):
+            return None
+    if 'strip_suffix' in repairs:
+        repairs[repairs.index('strip_suffix')] = 'truncated'
+    return closed
+
+
+def _loads_ok(text):
+    try:
+        _decoder.decode(text)
+        return True
+    except json.JSONDecodeError:
+        return False
+
+
+def repair_json(text):
+    """修复 LLM 输出中的 JSON
+
+    分层处理：能直接解析的原样返回；否则截取最外层对象，依次尝试整段替换（单引号、换行前的多余逗号）、
+    补全截断的括号和一次预编译正则的词法扫描（遇到无法词法修复的内容立即放弃）；只有结构性损坏才进入
+    逐 token 的修复器。逐 token 修复器在 Python 中逐字符循环，对所有输入都直接使用它要慢数倍，因此只作为最后一层。
+    合法输入只做一次 json 解析，与旧实现相同。
+    处理：代码块标记与前后说明文字、单引号、未加引号的键和值、Python 字面量、
+    多余/缺失的逗号、缺失的冒号、括号不匹配、字符串中的控制字符与非法转义、
+    省略号占位、// 注释，以及输出被截断时回退到最后一个完整值并补全括号。
+    与旧实现不同，双引号字符串内的单引号（撇号）保持不变。
+
+    Args:
+        text (str): 模型输出的原始文本
+
+    Returns:
+        tuple: (修复后的 JSON 字符串或 None, 应用的修复名称列表)
+    """
+    if text is None:
+        return None, []
+    if _loads_ok(text):
+        return text, []
+
+    # 快速路径：截取第一个 '{' 到最后一个 '}'，去掉代码块标记和前后说明文字，
+    # 再依次尝试整段替换、补全截断的括号和词法扫描，每一层只在内容确实发生变化时才重新校验
+    start, end = text.find('{'), text.rfind('}')
+    if start >= 0 and end > start:
+        repairs = []
+        if text[:start].strip():
+            repairs.append('strip_fence' if '```' in text[:start] else 'strip_prefix')
+        if text[end + 1:].strip():
+            repairs.append('strip_suffix')
+        fixed = _fast_repair(text[start:end + 1], repairs)
+        if fixed is not None:
+            return fixed, list(dict.fromkeys(repairs))
+
+    # 结构性损坏（截断、括号不匹配、缺失逗号等）：逐 token 扫描修复
+    repairer = _Repairer(text)
+    fixed = repairer.run()
+    repairs = repairer.repairs
+    if fixed is not None and not _loads_ok(fixed):
+        fixed = None
+    return fixed, repairs
@@ -0,0 +1,336 @@
+"""知识图谱存储：把所有运行的抽取结果合并到一个 SQLite 文件中
+
+实体名、实体类型和关系谓词都做字典编码（字符串各存一份，表中只存整数 id），
+实体表和三元组表使用 WITHOUT ROWID 聚簇主键，并在实体名和谓词上建立索引，
+「所有治疗 X 的植物」这类查询只需几次索引查找，不必打开数百个 JSON 文件。
+
+用法: python kg_store.py import experments/gemini1 experments/deepseek1 [--db knowledge_graph.sqlite]
+      python kg_store.py query --predicate 治疗 --tail 风湿痹痛
+      python kg_store.py export --run gemini1 --output-dir exported
+"""
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import logger, KG_STORE_CONFIG, setup_logging
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)',
+    'CREATE TABLE IF NOT EXISTS documents (id INTEGER PRIMARY KEY, run_id INTEGER NOT NULL, name TEXT NOT NULL, '
+    'UNIQUE (run_id, name))',
+    'CREATE TABLE IF NOT EXISTS names (id INTEGER PRIMARY KEY, text TEXT NOT NULL UNIQUE)',
+    'CREATE TABLE IF NOT EXISTS types (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)',
+    'CREATE TABLE IF NOT EXISTS predicates (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)',
+    'CREATE TABLE IF NOT EXISTS entities (doc_id INTEGER NOT NULL, name_id INTEGER NOT NULL, '
+    'type_id INTEGER NOT NULL, PRIMARY KEY (doc_id, name_id, type_id)) WITHOUT ROWID',
+    'CREATE TABLE IF NOT EXISTS triples (doc_id INTEGER NOT NULL, head_id INTEGER NOT NULL, '
+    'predicate_id INTEGER NOT NULL, tail_id INTEGER NOT NULL, '
+    'PRIMARY KEY (doc_id, head_id, predicate_id, tail_id)) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS idx_entities_name ON entities (name_id, type_id)',
+    'CREATE INDEX IF NOT EXISTS idx_entities_type ON entities (type_id)',
+    'CREATE INDEX IF NOT EXISTS idx_triples_predicate_tail ON triples (predicate_id, tail_id)',
+    'CREATE INDEX IF NOT EXISTS idx_triples_head ON triples (head_id, predicate_id)',
+)
+
+# 字典表：表名 -> 文本列
+_DICTIONARIES = {'names': 'text', 'types': 'name', 'predicates': 'name'}
+
+
+class KnowledgeGraphStore:
+    """基于 SQLite 的知识图谱存储，按运行和文档追加抽取结果"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): SQLite 文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+        # 字典编码的内存缓存：表名 -> {文本: id}
+        self._ids = {table: {} for table in _DICTIONARIES}
+        self._ids['runs'] = {}
+
+    def _id(self, table, text):
+        """取得字典表中文本对应的 id，不存在时插入"""
+        cache = self._ids[table]
+        value = cache.get(text)
+        if value is None:
+            column = _DICTIONARIES.get(table, 'name')
+            self._conn.execute(f'INSERT OR IGNORE INTO {table} ({column}) VALUES (?)', (text,))
+            value = self._conn.execute(f'SELECT id FROM {table} WHERE {column} = ?', (text,)).fetchone()[0]
+            cache[text] = value
+        return value
+
+    def _lookup(self, table, text):
+        """只查询不插入，不存在时返回 None"""
+        value = self._ids[table].get(text)
+        if value is None:
+            row = self._conn.execute(f'SELECT id FROM {table} WHERE {_DICTIONARIES[table]} = ?', (text,)).fetchone()
+            value = row[0] if row else None
+        return value
+
+    def add_result(self, run, document, result, commit=True):
+        """写入一篇文档的抽取结果，同一运行中的同名文档会被覆盖（续跑时保持幂等）
+
+        Args:
+            run (str): 运行名称（如 results_<时间戳>）
+            document (str): 文档名（不含扩展名）
+            result (dict): 抽取结果，包含 entities / relationships
+            commit (bool, optional): 是否立即提交，批量导入时可以最后统一提交. Defaults to True.
+        """
+        with self._lock:
+            run_id = self._id('runs', run)
+            self._conn.execute('INSERT OR IGNORE INTO documents (run_id, name) VALUES (?, ?)', (run_id, document))
+            doc_id = self._conn.execute('SELECT id FROM documents WHERE run_id = ? AND name = ?',
+                                        (run_id, document)).fetchone()[0]
+            self._conn.execute('DELETE FROM entities WHERE doc_id = ?', (doc_id,))
+            self._conn.execute('DELETE FROM triples WHERE doc_id = ?', (doc_id,))
+
+            entities = {(doc_id, self._id('names', str(item['entity'])), self._id('types', str(item.get('type') or '')))
+                        for item in result.get('entities', []) if isinstance(item, dict) and item.get('entity')}
+            triples = {(doc_id, self._id('names', str(item['head'])), self._id('predicates', str(item['predicate'])),
+                        self._id('names', str(item['tail'])))
+                       for item in result.get('relationships', [])
+                       if isinstance(item, dict) and item.get('head') and item.get('predicate') and item.get('tail')}
+            self._conn.executemany('INSERT INTO entities VALUES (?, ?, ?)', entities)
+            self._conn.executemany('INSERT INTO triples VALUES (?, ?, ?, ?)', triples)
+            if commit:
+                self._conn.commit()
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def _run_filter(self, run):
+        if run is None:
+            return '', ()
+        return ' AND d.run_id = (SELECT id FROM runs WHERE name = ?)', (run,)
+
+    def heads(self, predicate, tail, run=None):
+        """查询满足 (?, predicate, tail) 的头实体，例如所有「治疗」某种疾病的植物
+
+        Args:
+            predicate (str): 关系谓词
+            tail (str): 尾实体
+            run (str, optional): 只查询某次运行. Defaults to None.
+
+        Returns:
+            list: 去重后的头实体，按名称排序
+        """
+        with self._lock:
+            predicate_id, tail_id = self._lookup('predicates', predicate), self._lookup('names', tail)
+            if predicate_id is None or tail_id is None:
+                return []
+            run_sql, run_args = self._run_filter(run)
+            rows = self._conn.execute(
+                'SELECT DISTINCT n.text FROM triples t JOIN names n ON n.id = t.head_id '
+                'JOIN documents d ON d.id = t.doc_id WHERE t.predicate_id = ? AND t.tail_id = ?' + run_sql,
+                (predicate_id, tail_id) + run_args).fetchall()
+        return sorted(row[0] for row in rows)
+
+    def tails(self, head, predicate=None, run=None):
+        """查询头实体的所有尾实体
+
+        Args:
+            head (str): 头实体
+            predicate (str, optional): 只查询某个谓词. Defaults to None.
+            run (str, optional): 只查询某次运行. Defaults to None.
+
+        Returns:
+            list: 去重后的 (谓词, 尾实体) 元组，排序后返回
+        """
+        with self._lock:
+            head_id = self._lookup('names', head)
+            predicate_id = self._lookup('predicates', predicate) if predicate else None
+            if head_id is None or (predicate and predicate_id is None):
+                return []
+            sql = ('SELECT DISTINCT p.name, n.text FROM triples t JOIN names n ON n.id = t.tail_id '
+                   'JOIN predicates p ON p.id = t.predicate_id JOIN documents d ON d.id = t.doc_id '
+                   'WHERE t.head_id = ?')
+            args = (head_id,)
+            if predicate_id is not None:
+                sql += ' AND t.predicate_id = ?'
+                args += (predicate_id,)
+            run_sql, run_args = self._run_filter(run)
+            rows = self._conn.execute(sql + run_sql, args + run_args).fetchall()
+        return sorted(rows)
+
+    def entity_types(self, entity, run=None):
+        """查询实体被标注过的类型及次数
+
+        Returns:
+            dict: 类型 -> 出现的文档数
+        """
+        with self._lock:
+            name_id = self._lookup('names', entity)
+            if name_id is None:
+                return {}
+            run_sql, run_args = self._run_filter(run)
+            rows = self._conn.execute(
+                'SELECT ty.name, COUNT(*) FROM entities e JOIN types ty ON ty.id = e.type_id '
+                'JOIN documents d ON d.id = e.doc_id WHERE e.name_id = ?' + run_sql + ' GROUP BY ty.name',
+                (name_id,) + run_args).fetchall()
+        return dict(rows)
+
+    def runs(self):
+        """所有运行名称"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute('SELECT name FROM runs ORDER BY name')]
+
+    def documents(self, run):
+        """某次运行中的所有文档名"""
+        with self._lock:
+            rows = self._conn.execute('SELECT d.name FROM documents d JOIN runs r ON r.id = d.run_id '
+                                      'WHERE r.name = ? ORDER BY d.name', (run,)).fetchall()
+        return [row[0] for row in rows]
+
+    def result(self, run, document):
+        """还原一篇文档的抽取结果（与 *_result.json 的格式相同，元素顺序不保证）
+
+        Returns:
+            dict: 抽取结果，文档不存在时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT d.id FROM documents d JOIN runs r ON r.id = d.run_id '
+                                     'WHERE r.name = ? AND d.name = ?', (run, document)).fetchone()
+            if row is None:
+                return None
+            entities = self._conn.execute(
+                'SELECT n.text, ty.name FROM entities e JOIN names n ON n.id = e.name_id '
+                'JOIN types ty ON ty.id = e.type_id WHERE e.doc_id = ?', (row[0],)).fetchall()
+            triples = self._conn.execute(
+                'SELECT h.text, p.name, t2.text FROM triples t JOIN names h ON h.id = t.head_id '
+                'JOIN predicates p ON p.id = t.predicate_id JOIN names t2 ON t2.id = t.tail_id '
+                'WHERE t.doc_id = ?', (row[0],)).fetchall()
+        return {
+            'entities': [{'entity': entity, 'type': entity_type} for entity, entity_type in entities],
+            'relationships': [{'head': head, 'predicate': predicate, 'tail': tail} for head, predicate, tail in triples],
+        }
+
+    def stats(self):
+        """返回各表的行数和文件大小"""
+        with self._lock:
+            counts = {table: self._conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                      for table in ('runs', 'documents', 'names', 'types', 'predicates', 'entities', 'triples')}
+        counts['bytes'] = os.path.getsize(self.path)
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_kg_store(output_dir):
+    """获取输出目录共享的知识图谱存储，KG_STORE_CONFIG['enabled'] 为 False 时返回 None
+
+    Args:
+        output_dir (str): 输出目录路径
+
+    Returns:
+        KnowledgeGraphStore: 共享的存储实例
+    """
+    if not KG_STORE_CONFIG['enabled']:
+        return None
+    path = os.path.abspath(os.path.join(output_dir, KG_STORE_CONFIG['filename']))
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = KnowledgeGraphStore(path)
+        return store
+
+
+def import_result_dir(store, result_dir, run=None):
+    """把一个目录下的 *_result.json 导入存储
+
+    Args:
+        store (KnowledgeGraphStore): 目标存储
+        result_dir (str): 结果目录
+        run (str, optional): 运行名称，默认为目录名. Defaults to None.
+
+    Returns:
+        int: 导入的文档数
+    """
+    run = run or os.path.basename(os.path.normpath(result_dir))
+    imported = 0
+    for result_file in sorted(glob.glob(os.path.join(result_dir, '*_result.json'))):
+        try:
+            with open(result_file, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            logger.error(f"读取结果文件 {result_file} 失败: {str(e)}")
+            continue
+        if not isinstance(result, dict):
+            continue
+        store.add_result(run, os.path.basename(result_file)[:-len('_result.json')], result, commit=False)
+        imported += 1
+    store.commit()
+    logger.info(f"从 {result_dir} 导入 {imported} 篇文档到运行 {run}")
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识图谱存储")
+    parser.add_argument('--db', default=KG_STORE_CONFIG['filename'], help="SQLite 文件路径")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help="导入 *_result.json 目录")
+    import_parser.add_argument('dirs', nargs='+', help="结果目录，运行名称为相对当前目录的路径")
+
+    query_parser = subparsers.add_parser('query', help="查询三元组")
+    query_parser.add_argument('--predicate', help="关系谓词")
+    query_parser.add_argument('--tail', help="尾实体，与 --predicate 一起查询头实体")
+    query_parser.add_argument('--head', help="头实体，查询其所有尾实体")
+    query_parser.add_argument('--entity', help="查询实体的类型分布")
+    query_parser.add_argument('--run', help="只查询某次运行")
+
+    export_parser = subparsers.add_parser('export', help="把一次运行导出为 *_result.json")
+    export_parser.add_argument('--run', required=True, help="运行名称")
+    export_parser.add_argument('--output-dir', required=True, help="输出目录")
+    args = parser.parse_args()
+    setup_logging()
+
+    store = KnowledgeGraphStore(args.db)
+    start = time.perf_counter()
+    if args.command == 'import':
+        for result_dir in args.dirs:
+            import_result_dir(store, result_dir, os.path.relpath(result_dir))
+        print(store.stats())
+    elif args.command == 'query':
+        if args.entity:
+            print(store.entity_types(args.entity, args.run))
+        elif args.head:
+            for predicate, tail in store.tails(args.head, args.predicate, args.run):
+                print(f"{args.head} -{predicate}-> {tail}")
+        elif args.predicate and args.tail:
+            for head in store.heads(args.predicate, args.tail, args.run):
+                print(head)
+        else:
+            parser.error("query 需要 --entity、--head 或 --predicate 加 --tail")
+    else:
+        os.makedirs(args.output_dir, exist_ok=True)
+        documents = store.documents(args.run)
+        for document in documents:
+            with open(os.path.join(args.output_dir, f"{document}_result.json"), 'w', encoding='utf-8') as f:
+                json.dump(store.result(args.run, document), f, ensure_ascii=False, indent=2)
+        print(f"导出 {len(documents)} 篇文档")
+    print(f"耗时 {(time.perf_counter() - start) * 1000:.2f} ms")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
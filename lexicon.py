@@ -0,0 +1,324 @@
+"""实体词表：把历史抽取结果中的 (实体, 类型) 编译为 Aho-Corasick 自动机，在调用 LLM 前标注新文本
+
+一次扫描即可找出文本中所有已知实体，耗时与文本长度成正比，与词表大小无关。类型取各结果文件中
+出现次数最多的类型。运行中保存的新结果可以增量加入词表：新词先放入一个小的增量自动机，
+积累到一定数量后再合并重建，加入一篇结果不需要重建整个词表。
+
+用法: python lexicon.py build experments [--min-count 2]
+      python lexicon.py annotate input_texts/一叶萩\\ Yiyeqiu.txt [...]
+"""
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+from collections import deque
+from config import logger, LEXICON_CONFIG, setup_logging
+
+RESULT_SUFFIX = '_result.json'
+
+# 增量自动机中的词数超过该值时合并到主自动机
+_DELTA_LIMIT = 1024
+# 词表只收录长度有限的实体，过长的通常是整句描述
+_MAX_LENGTH = 20
+
+
+class AhoCorasick:
+    """Aho-Corasick 多模式匹配自动机，构建后只读，可以在多个线程中同时使用"""
+
+    def __init__(self, words):
+        """
+        Args:
+            words (iterable): 模式串
+        """
+        self._goto = [{}]
+        self._fail = [0]
+        self._word = [None]  # 在该节点结束的模式串
+        self._out = [0]  # 沿失败链最近的、有模式串结束的节点，0 表示没有
+        for word in words:
+            self._insert(word)
+        self._link()
+
+    def _insert(self, word):
+        node = 0
+        for char in word:
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][char] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._word.append(None)
+                self._out.append(0)
+            node = child
+        self._word[node] = word
+
+    def _link(self):
+        """按广度优先顺序计算失败链和输出链"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[child] = fail
+                self._out[child] = fail if self._word[fail] is not None else self._out[fail]
+                queue.append(child)
+
+    def __len__(self):
+        return sum(word is not None for word in self._word)
+
+    def iter_matches(self, text):
+        """产出文本中所有模式串的出现位置 (start, end, word)，按结束位置排序"""
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            match = node if self._word[node] is not None else self._out[node]
+            while match:
+                word = self._word[match]
+                yield i + 1 - len(word), i + 1, word
+                match = self._out[match]
+
+
+class Lexicon:
+    """(实体, 类型) 词表，按结果文件计票（线程安全）"""
+
+    def __init__(self, path=None, min_count=None, min_length=None):
+        """
+        Args:
+            path (str, optional): 词表文件路径，存在时加载. Defaults to None.
+            min_count (int, optional): 参与匹配所需的最少出现次数. Defaults to LEXICON_CONFIG.
+            min_length (int, optional): 参与匹配的最短实体长度. Defaults to LEXICON_CONFIG.
+        """
+        self.path = path
+        self.min_count = LEXICON_CONFIG['min_count'] if min_count is None else min_count
+        self.min_length = LEXICON_CONFIG['min_length'] if min_length is None else min_length
+        self._counts = {}  # 实体 -> {类型: 出现次数}
+        self._lock = threading.Lock()
+        self._base = None
+        self._base_words = set()
+        self._delta = None
+        self._delta_words = set()
+        self._dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._counts = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.error(f"读取词表 {path} 失败: {str(e)}")
+        self._rebuild()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._counts)
+
+    def matchable(self):
+        """参与匹配的实体数"""
+        with self._lock:
+            return len(self._base_words) + len(self._delta_words)
+
+    def _eligible(self, entity):
+        return len(entity) >= self.min_length and sum(self._counts[entity].values()) >= self.min_count
+
+    def _rebuild(self):
+        """把所有达到阈值的实体重建为主自动机，清空增量自动机"""
+        with self._lock:
+            words = {entity for entity in self._counts if self._eligible(entity)}
+            self._base = AhoCorasick(words)
+            self._base_words = words
+            self._delta = None
+            self._delta_words = set()
+            self._dirty = False
+
+    def add_result(self, result):
+        """把一篇抽取结果加入词表，同一结果中的 (实体, 类型) 只计一次
+
+        Args:
+            result (dict): 抽取结果，包含 entities
+
+        Returns:
+            int: 新达到匹配阈值的实体数
+        """
+        pairs = set()
+        for item in result.get('entities', []):
+            if isinstance(item, dict) and isinstance(item.get('entity'), str) and item.get('type'):
+                entity = item['entity'].strip()
+                if entity and len(entity) <= _MAX_LENGTH:
+                    pairs.add((entity, str(item['type'])))
+        added = 0
+        with self._lock:
+            for entity, entity_type in pairs:
+                types = self._counts.setdefault(entity, {})
+                types[entity_type] = types.get(entity_type, 0) + 1
+                if entity not in self._base_words and entity not in self._delta_words and self._eligible(entity):
+                    self._delta_words.add(entity)
+                    self._dirty = True
+                    added += 1
+            merge = len(self._delta_words) > _DELTA_LIMIT
+        if merge:
+            self._rebuild()
+        return added
+
+    def entity_type(self, entity):
+        """返回实体出现次数最多的类型，不在词表中时返回 None"""
+        with self._lock:
+            types = self._counts.get(entity)
+            return max(types, key=types.get) if types else None
+
+    def _automata(self):
+        with self._lock:
+            if self._dirty:
+                self._delta = AhoCorasick(self._delta_words)
+                self._dirty = False
+            return [automaton for automaton in (self._base, self._delta) if automaton is not None]
+
+    def annotate(self, text):
+        """标注文本中的已知实体，重叠时取最左、最长的匹配
+
+        Args:
+            text (str): 文本
+
+        Returns:
+            list: {'entity', 'type', 'start', 'end'} 字典列表，按出现位置排序
+        """
+        matches = [match for automaton in self._automata() for match in automaton.iter_matches(text)]
+        matches.sort(key=lambda match: (match[0], match[0] - match[1]))
+        annotations = []
+        end = 0
+        for start, match_end, word in matches:
+            if start >= end:
+                annotations.append({'entity': word, 'type': self.entity_type(word), 'start': start, 'end': match_end})
+                end = match_end
+        return annotations
+
+    def save(self, path=None):
+        """保存词表（先写临时文件再替换）"""
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            counts = json.dumps(self._counts, ensure_ascii=False, sort_keys=True)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(counts)
+        os.replace(tmp_file, path)
+
+
+def coverage(text, annotations):
+    """词表对一篇文档的覆盖情况
+
+    Returns:
+        dict: 匹配到的已知实体数（去重）和被覆盖的字符比例
+    """
+    covered = sum(annotation['end'] - annotation['start'] for annotation in annotations)
+    return {'entities': len({annotation['entity'] for annotation in annotations}),
+            'chars': covered / len(text) if text else 0.0}
+
+
+def lexicon_result(annotations):
+    """把标注转换为抽取结果格式（只有实体）"""
+    seen = set()
+    entities = []
+    for annotation in annotations:
+        if annotation['entity'] not in seen:
+            seen.add(annotation['entity'])
+            entities.append({'entity': annotation['entity'], 'type': annotation['type']})
+    return {'entities': entities, 'relationships': []}
+
+
+def format_hints(annotations, max_hints=None):
+    """把标注渲染为 prompt 中的已知实体提示，如“大戟科(科)、黑面神属(属)”"""
+    max_hints = max_hints or LEXICON_CONFIG['max_hints']
+    entities = lexicon_result(annotations)['entities'][:max_hints]
+    return "、".join(f"{entity['entity']}({entity['type']})" for entity in entities)
+
+
+def build_lexicon(roots, lexicon):
+    """把实验根目录下所有 *_result.json 加入词表
+
+    Returns:
+        int: 读取的结果文件数
+    """
+    count = 0
+    for root in roots:
+        for result_file in sorted(glob.glob(os.path.join(root, '**', f'*{RESULT_SUFFIX}'), recursive=True)):
+            try:
+                with open(result_file, 'r', encoding='utf-8') as f:
+                    result = json.load(f)
+            except (OSError, json.JSONDecodeError, UnicodeDecodeError) as e:
+                logger.error(f"读取结果文件 {result_file} 失败: {str(e)}")
+                continue
+            if isinstance(result, dict):
+                lexicon.add_result(result)
+                count += 1
+    lexicon._rebuild()
+    return count
+
+
+_lexicon = None
+_lexicon_lock = threading.Lock()
+
+
+def get_lexicon():
+    """获取全局实体词表，LEXICON_CONFIG['mode'] 为 'off' 时返回 None
+
+    Returns:
+        Lexicon: 共享词表实例
+    """
+    global _lexicon
+    if LEXICON_CONFIG['mode'] == 'off':
+        return None
+    with _lexicon_lock:
+        if _lexicon is None:
+            _lexicon = Lexicon(LEXICON_CONFIG['path'])
+        return _lexicon
+
+
+def main():
+    parser = argparse.ArgumentParser(description="实体词表工具")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help="从历史结果构建词表")
+    build_parser.add_argument('roots', nargs='+', help="实验根目录（递归查找 *_result.json）")
+    build_parser.add_argument('--output', default=LEXICON_CONFIG['path'], help="词表文件路径")
+    build_parser.add_argument('--min-count', type=int, default=LEXICON_CONFIG['min_count'],
+                              help="参与匹配所需的最少出现次数")
+    annotate_parser = subparsers.add_parser('annotate', help="标注文本并报告每篇文档的词表覆盖率")
+    annotate_parser.add_argument('files', nargs='+', help="文本文件")
+    annotate_parser.add_argument('--lexicon', default=LEXICON_CONFIG['path'], help="词表文件路径")
+    annotate_parser.add_argument('--show', action='store_true', help="同时打印匹配到的实体")
+    args = parser.parse_args()
+    setup_logging()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        lexicon = Lexicon(min_count=args.min_count)
+        count = build_lexicon(args.roots, lexicon)
+        lexicon.save(args.output)
+        print(f"{count} 个结果文件, {len(lexicon)} 个实体（其中 {lexicon.matchable()} 个参与匹配）, "
+              f"耗时 {time.perf_counter() - start:.2f} 秒 -> {args.output}")
+        return
+
+    lexicon = Lexicon(args.lexicon)
+    total_chars = total_time = 0.0
+    for path in args.files:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read().strip()
+        start = time.perf_counter()
+        annotations = lexicon.annotate(text)
+        total_time += time.perf_counter() - start
+        total_chars += len(text)
+        stats = coverage(text, annotations)
+        print(f"{os.path.basename(path)}: {stats['entities']} 个已知实体, 覆盖 {stats['chars']:.1%} 字符")
+        if args.show:
+            print(f"  {format_hints(annotations, len(annotations) or 1)}")
+    print(f"\n{len(args.files)} 篇文档, {total_chars:.0f} 字符, 标注耗时 {total_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
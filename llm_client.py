@@ -0,0 +1,218 @@
+import threading
+import time
+from collections import Counter
+from config import logger, CLIENT_CONFIG
+
+
+class ClientMetrics:
+    """记录连接复用和请求延迟的统计信息（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self.http_requests = 0
+            self.new_connections = 0
+            self.reused_connections = 0
+            self.api_calls = 0
+            self.api_errors = 0
+            self.latencies = []
+            self.retries = Counter()
+            self.throttled = 0
+            self.throttle_wait = 0.0
+            self.prompt_prefixes = Counter()
+            self.usage_reports = 0
+            self.prompt_tokens = 0
+            self.cached_prompt_tokens = 0
+
+    def record_connection(self, reused):
+        with self._lock:
+            self.http_requests += 1
+            if reused:
+                self.reused_connections += 1
+            else:
+                self.new_connections += 1
+
+    def record_call(self, latency, success=True):
+        with self._lock:
+            self.api_calls += 1
+            if not success:
+                self.api_errors += 1
+            self.latencies.append(latency)
+
+    def record_retry(self, reason):
+        """记录一次重试，reason 如 'rate_limit'、'timeout'、'server_error'、'invalid_json'"""
+        with self._lock:
+            self.retries[reason] += 1
+
+    def record_throttle(self, wait):
+        """记录一次客户端限速等待"""
+        with self._lock:
+            self.throttled += 1
+            self.throttle_wait += wait
+
+    def record_prompt_prefix(self, prefix_hash):
+        """记录一次请求的 Prompt 前缀哈希，用于统计前缀复用情况"""
+        if prefix_hash is None:
+            return
+        with self._lock:
+            self.prompt_prefixes[prefix_hash] += 1
+
+    def record_usage(self, usage):
+        """记录服务端返回的 prompt token 数和前缀缓存命中的 token 数
+
+        OpenAI / vLLM 通过 usage.prompt_tokens_details.cached_tokens 返回，Deepseek 通过
+        usage.prompt_cache_hit_tokens 返回；服务端没有返回时不计入命中率。
+        """
+        if usage is None:
+            return
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached = getattr(details, 'cached_tokens', None)
+        if cached is None:
+            cached = getattr(usage, 'prompt_cache_hit_tokens', None)
+        if cached is None:
+            return
+        with self._lock:
+            self.usage_reports += 1
+            self.prompt_tokens += getattr(usage, 'prompt_tokens', 0) or 0
+            self.cached_prompt_tokens += cached
+
+    def snapshot(self):
+        """返回当前统计的字典
+
+        Returns:
+            dict: 请求数、连接复用率、延迟分位数（秒）、重试与限速次数以及 Prompt 前缀缓存统计
+        """
+        with self._lock:
+            latencies = sorted(self.latencies)
+            return {
+                'http_requests': self.http_requests,
+                'new_connections': self.new_connections,
+                'reused_connections': self.reused_connections,
+                'connection_reuse_ratio': self.reused_connections / self.http_requests if self.http_requests else 0.0,
+                'api_calls': self.api_calls,
+                'api_errors': self.api_errors,
+                'latency_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+                'latency_p50': _percentile(latencies, 0.5),
+                'latency_p95': _percentile(latencies, 0.95),
+                'retries': dict(self.retries),
+                'throttled': self.throttled,
+                'throttle_wait': self.throttle_wait,
+                'prompt_prefixes': len(self.prompt_prefixes),
+                'prefix_reuse_ratio': _reuse_ratio(self.prompt_prefixes),
+                # 服务端报告的前缀缓存命中率，服务端不提供时为 None
+                'server_cache_hit_ratio': (self.cached_prompt_tokens / self.prompt_tokens
+                                           if self.usage_reports and self.prompt_tokens else None),
+            }
+
+
+def _reuse_ratio(prefixes):
+    """与之前某个请求前缀相同的请求占比"""
+    total = sum(prefixes.values())
+    return (total - len(prefixes)) / total if total else 0.0
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)]
+
+
+metrics = ClientMetrics()
+
+
+def _make_trace():
+    """创建 httpcore trace 回调，用于判断本次请求是否新建了 TCP 连接"""
+    state = {'new_connection': False}
+
+    def trace(event_name, info):
+        if event_name == 'connection.connect_tcp.complete':
+            state['new_connection'] = True
+
+    return state, trace
+
+
+_transport_class = None
+
+
+def _metered_transport(**kwargs):
+    """创建统计连接复用情况的传输层
+
+    httpx 在第一次创建客户端时才导入，导入本模块本身不加载 httpx / openai。
+    """
+    global _transport_class
+    import httpx
+
+    if _transport_class is None:
+        class _MeteredTransport(httpx.HTTPTransport):
+            """统计连接复用情况的传输层"""
+
+            def handle_request(self, request):
+                state, trace = _make_trace()
+                request.extensions['trace'] = trace
+                response = super().handle_request(request)
+                metrics.record_connection(reused=not state['new_connection'])
+                return response
+
+        _transport_class = _MeteredTransport
+    return _transport_class(**kwargs)
+
+
+def _limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=CLIENT_CONFIG['max_connections'],
+        max_keepalive_connections=CLIENT_CONFIG['max_keepalive_connections'],
+        keepalive_expiry=CLIENT_CONFIG['keepalive_expiry'],
+    )
+
+
+def _timeout():
+    import httpx
+
+    return httpx.Timeout(CLIENT_CONFIG['read_timeout'], connect=CLIENT_CONFIG['connect_timeout'])
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key, base_url):
+    """获取共享的长连接 OpenAI 客户端，同一 (api_key, base_url) 只创建一次
+
+    Args:
+        api_key (str): API 密钥
+        base_url (str): API 地址
+
+    Returns:
+        OpenAI: 复用连接池的客户端
+    """
+    key = (api_key, base_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            import httpx
+            from openai import OpenAI
+
+            http_client = httpx.Client(transport=_metered_transport(limits=_limits()), timeout=_timeout())
+            # 重试由 retry.call_with_retry 统一处理，关闭 SDK 自带的重试以免叠加
+            client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+            _clients[key] = client
+            logger.info(f"创建共享 API 客户端: {base_url}")
+        return client
+
+
+def timed_call(func, *args, **kwargs):
+    """执行一次 API 调用并记录延迟"""
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    except Exception:
+        metrics.record_call(time.perf_counter() - start, success=False)
+        raise
+    metrics.record_call(time.perf_counter() - start)
+    return result
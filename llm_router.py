@@ -0,0 +1,208 @@
+import abc
+import threading
+import time
+from collections import deque
+from config import logger, BACKENDS, ROUTING_STRATEGY, STREAMING
+from concurrency import get_rate_limiter
+from llm_client import get_client
+from retry import complete_chat
+
+
+class Backend(abc.ABC):
+    """LLM 后端接口，具体后端实现 complete 方法"""
+
+    def __init__(self, name, model, max_concurrency=4, timeout=None, **options):
+        """
+        Args:
+            name (str): 后端名称
+            model (str): 模型名称
+            max_concurrency (int, optional): 该后端同时在途的请求数上限. Defaults to 4.
+            timeout (float, optional): 单次请求超时（秒）. Defaults to None.
+        """
+        self.name = name
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.options = options
+
+    @abc.abstractmethod
+    def complete(self, messages, temperature, max_tokens):
+        """发送一次对话补全请求
+
+        Args:
+            messages (list): 对话消息列表
+            temperature (float): 采样温度
+            max_tokens (int): 最大生成 token 数
+
+        Returns:
+            str: 模型返回的文本；流式输出无法构成合法 JSON 而提前终止时返回 None
+        """
+
+
+class OpenAIBackend(Backend):
+    """OpenAI 兼容接口的后端（OpenAI、GLM、Deepseek、本地 Ollama/vLLM 等）"""
+
+    def complete(self, messages, temperature, max_tokens):
+        base_url = self.options.get('base_url')
+        client = get_client(self.options.get('api_key') or 'EMPTY', base_url)
+        return complete_chat(client, self.model, messages, temperature, max_tokens,
+                             limiter=get_rate_limiter(base_url), streaming=STREAMING,
+                             timeout=self.timeout, description=f"后端 {self.name} 请求")
+
+
+# 后端类型注册表，新的后端类型通过 register_backend_type 接入
+BACKEND_TYPES = {
+    'openai': OpenAIBackend,
+}
+
+
+def register_backend_type(kind, backend_class):
+    """注册新的后端类型
+
+    Args:
+        kind (str): BACKENDS 配置中 'kind' 字段的取值
+        backend_class (type): Backend 的子类
+    """
+    BACKEND_TYPES[kind] = backend_class
+
+
+class _BackendState:
+    def __init__(self, backend):
+        self.backend = backend
+        self.in_flight = 0
+        self.latencies = deque(maxlen=50)
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+
+    def p50(self):
+        if not self.latencies:
+            return 0.0
+        return sorted(self.latencies)[len(self.latencies) // 2]
+
+
+class LLMRouter:
+    """按队列深度或延迟把请求分发到多个后端，出错或超时时自动切换到其他后端"""
+
+    def __init__(self, backends, strategy='queue'):
+        """
+        Args:
+            backends (list): Backend 实例列表
+            strategy (str, optional): 'queue' 选择在途请求占比最低的后端，
+                'latency' 选择 p50 延迟（按在途请求数加权）最低的后端. Defaults to 'queue'.
+        """
+        self.strategy = strategy
+        self._states = [_BackendState(backend) for backend in backends]
+        self._condition = threading.Condition()
+
+    def models(self):
+        """返回所有后端的模型名称"""
+        return [state.backend.model for state in self._states]
+
+    def _score(self, state):
+        if self.strategy == 'latency':
+            return state.p50() * (state.in_flight + 1), state.in_flight
+        return state.in_flight / state.backend.max_concurrency, state.p50()
+
+    def _acquire(self, excluded):
+        """选出一个未尝试过且有空闲并发额度的后端，全部占满时等待"""
+        with self._condition:
+            while True:
+                candidates = [s for s in self._states if s.backend.name not in excluded]
+                if not candidates:
+                    return None
+                # 最近出错的后端进入冷却期，只有其他后端都不可用时才会被选中
+                now = time.monotonic()
+                healthy = [s for s in candidates if s.cooldown_until <= now]
+                available = [s for s in healthy or candidates if s.in_flight < s.backend.max_concurrency]
+                if available:
+                    state = min(available, key=self._score)
+                    state.in_flight += 1
+                    return state
+                self._condition.wait()
+
+    def _release(self, state, latency=None, failed=False):
+        with self._condition:
+            state.in_flight -= 1
+            state.requests += 1
+            if failed:
+                state.errors += 1
+                state.consecutive_errors += 1
+                state.cooldown_until = time.monotonic() + min(60, 2 ** state.consecutive_errors)
+            else:
+                state.consecutive_errors = 0
+                state.latencies.append(latency)
+            self._condition.notify_all()
+
+    def complete(self, messages, temperature, max_tokens):
+        """分发一次请求，出错或返回 None（流式输出提前终止）时依次切换到其他后端
+
+        Returns:
+            tuple: (响应文本, 实际使用的模型名称)
+        """
+        tried = set()
+        last_error = None
+        while True:
+            state = self._acquire(tried)
+            if state is None:
+                raise RuntimeError(f"所有后端均调用失败: {last_error}")
+            backend = state.backend
+            tried.add(backend.name)
+            start = time.perf_counter()
+            try:
+                response_text = backend.complete(messages, temperature, max_tokens)
+            except Exception as e:
+                self._release(state, failed=True)
+                last_error = e
+                logger.error(f"后端 {backend.name} 调用失败，尝试其他后端: {str(e)}")
+                continue
+            if response_text is None:
+                self._release(state, failed=True)
+                last_error = "输出无法构成合法 JSON"
+                logger.error(f"后端 {backend.name} 的输出无法构成合法 JSON，尝试其他后端")
+                continue
+            self._release(state, time.perf_counter() - start)
+            return response_text, backend.model
+
+    def stats(self):
+        """返回各后端的请求数、错误数、在途请求数和 p50 延迟"""
+        with self._condition:
+            return {
+                state.backend.name: {
+                    'requests': state.requests,
+                    'errors': state.errors,
+                    'in_flight': state.in_flight,
+                    'latency_p50': state.p50(),
+                }
+                for state in self._states
+            }
+
+
+def build_backend(name, config):
+    """根据配置创建后端实例"""
+    options = dict(config)
+    kind = options.pop('kind', 'openai')
+    if kind not in BACKEND_TYPES:
+        raise ValueError(f"不支持的后端类型: {kind}")
+    return BACKEND_TYPES[kind](name, **options)
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """获取全局路由器，未配置 BACKENDS 时返回 None
+
+    Returns:
+        LLMRouter: 共享路由器
+    """
+    global _router
+    if not BACKENDS:
+        return None
+    with _router_lock:
+        if _router is None:
+            _router = LLMRouter([build_backend(name, config) for name, config in BACKENDS.items()],
+                                ROUTING_STRATEGY)
+        return _router
@@ -1,37 +1,46 @@
+import argparse
+import glob
 import os
 import json
+import threading
 from datetime import datetime
-import sys
-import os
-from sympy import false
-from config import logger
+from config import logger, MAX_WORKERS, EXCEL_OUTPUT_DIR, CHUNK_CONFIG, RULE_EXTRACTION_CONFIG, LEXICON_CONFIG, \
+    SCHEDULE_CONFIG, setup_logging
 from api import configure_api, call_openai_api
 from prompt import build_extraction_prompt, build_validation_prompt, build_simple_extraction_prompt, \
-    build_strict_extraction_prompt
-from utils import check_convergence
-from file_operations import update_type_files, save_results, save_conversation_log
+    build_strict_extraction_prompt, build_batch_extraction_prompt
+from utils import check_convergence, load_convergence_state
+from file_operations import update_type_files, flush_type_files, save_results, save_conversation_log
 from excel_utils import CSVRecorder
-
-
-def process_simple_extraction(input_dir, output_dir, start_index=None, end_index=None):
-    """简单抽取处理，不进行验证和类型更新
+from concurrency import ordered_map
+from batching import plan_batches, split_batch_response
+from chunking import split_document
+from rule_extractor import pre_extract, plant_name, has_sections
+from lexicon import get_lexicon, coverage, format_hints, lexicon_result
+from scheduler import schedule
+from fusion import fuse_results, normalize_schema, UNION
+from llm_client import metrics as client_metrics
+from response_cache import get_response_cache
+from llm_router import get_router
+from type_normalizer import get_type_normalizer, merge_validation
+from conversation_log import close_conversation_logs
+from usage_tracker import usage_tracker, usage_context
+from manifest import RunManifest, content_hash, EXTRACTED, VALIDATED, SAVED, FAILED
+
+
+def _select_files(input_dir, start_index=None, end_index=None):
+    """获取输入目录中待处理的 txt 文件列表
 
     Args:
         input_dir (str): 输入目录路径
-        output_dir (str): 输出目录路径
         start_index (int, optional): 开始处理的文件索引（从0开始）. Defaults to None.
         end_index (int, optional): 结束处理的文件索引（不包含）. Defaults to None.
-    """
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-    if not os.path.exists(input_dir):
-        logger.error(f"输入目录 {input_dir} 不存在")
-        return
 
-    os.makedirs(output_dir, exist_ok=True)
-
-    # 获取所有txt文件
-    txt_files = [f for f in os.listdir(input_dir) if f.endswith('.txt')]
+    Returns:
+        list: 文件名列表，索引范围无效时返回 None
+    """
+    # 获取所有txt文件，排序保证不同机器和多次运行的顺序一致
+    txt_files = sorted(f for f in os.listdir(input_dir) if f.endswith('.txt'))
 
     # 如果指定了范围，则只处理指定范围内的文件
     if start_index is not None or end_index is not None:
@@ -41,52 +50,447 @@ def process_simple_extraction(input_dir, output_dir, start_index=None, end_index
         # 验证索引范围
         if start_idx < 0 or end_idx > len(txt_files) or start_idx >= end_idx:
             logger.error(f"无效的文件索引范围: start_index={start_idx}, end_index={end_idx}, 总文件数={len(txt_files)}")
-            return
+            return None
 
         txt_files = txt_files[start_idx:end_idx]
         logger.info(f"将处理从第 {start_idx + 1} 到第 {end_idx} 个文件，共 {len(txt_files)} 个文件")
 
-    for filename in txt_files:
-        file_path = os.path.join(input_dir, filename)
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                text = f.read().strip()
+    return txt_files
 
-            logger.info(f"正在处理文件: {filename}")
 
-            # 使用严格模式的prompt
-            extraction_prompt = build_strict_extraction_prompt(text, CONFIG['entity_file'], CONFIG['relation_file'])
-            if not extraction_prompt:
-                continue
+def _new_document(text, extractions, extracted_json):
+    """构建在工作线程和主线程之间传递的文档处理记录
 
-            extracted_result = call_openai_api(extraction_prompt)
-            if not extracted_result:
-                logger.error(f"{filename} API调用失败或返回结果无效")
-                continue
+    Args:
+        text (str): 文档正文
+        extractions (list): 抽取对话 (prompt, 响应) 列表，分块抽取时每块一条
+        extracted_json (dict): 抽取结果
+    """
+    return {
+        'text': text,
+        'extractions': extractions,
+        'extracted_json': extracted_json,
+        'validation_prompt': None,
+        'validated_result': None,
+        'validated_json': extracted_json,
+    }
 
-            try:
-                extracted_json = json.loads(extracted_result)
-                logger.info(f"{filename} 成功解析JSON结果")
-            except json.JSONDecodeError as e:
-                logger.error(f"{filename} 的抽取结果 JSON 格式错误: {str(e)}")
-                logger.error(f"原始结果: {extracted_result}")
-                continue
+
+# 文档级和分块级线程池共享的在途请求名额，由 _iter_documents 按 max_workers 设置，None 表示不限制
+_request_slots = None
+
+
+def _call_llm(prompt):
+    """调用 LLM；在 _iter_documents 中运行时占用一个共享名额，嵌套的分块线程池不会突破 max_workers"""
+    slots = _request_slots
+    if slots is None:
+        return call_openai_api(prompt)
+    with slots:
+        return call_openai_api(prompt)
+
+
+def _extract_text(filename, text, entity_file, relation_file, strict=False):
+    """对一段文本（整篇文档或其中一块）调用抽取，词表匹配到的已知实体作为提示放进 prompt
+
+    Returns:
+        tuple: (prompt, 原始响应, 解析后的 JSON)，失败时返回 None
+    """
+    lexicon = get_lexicon()
+    hints = format_hints(lexicon.annotate(text)) if lexicon else None
+    if strict:
+        extraction_prompt = build_strict_extraction_prompt(text, entity_file, relation_file, hints)
+    else:
+        extraction_prompt = build_extraction_prompt(text, entity_file, relation_file, hints)
+    if not extraction_prompt:
+        return None
+
+    with usage_context('extraction', [filename]):
+        extracted_result = _call_llm(extraction_prompt)
+    if not extracted_result:
+        logger.error(f"{filename} API调用失败或返回结果无效")
+        return None
+
+    try:
+        extracted_json = normalize_schema(json.loads(extracted_result))
+        logger.info(f"{filename} 成功解析JSON结果")
+    except json.JSONDecodeError as e:
+        logger.error(f"{filename} 的抽取结果 JSON 格式错误: {str(e)}")
+        logger.error(f"原始结果: {extracted_result}")
+        return None
+    return extraction_prompt, extracted_result, extracted_json
+
+
+def _extract_chunks(filename, chunks, entity_file, relation_file, strict=False):
+    """并行抽取长文档的各块，按归一化的实体名和三元组去重合并为一个结果
+
+    各块的请求与其他文档共享 _iter_documents 的在途请求名额，CHUNK_CONFIG['max_workers'] 只限制同一文档的并行块数。
+    任一块失败时整篇文档视为失败，由运行清单在下次运行时重试（已成功的块命中响应缓存）。
+
+    Returns:
+        tuple: (抽取对话列表, 合并后的抽取结果)，失败时返回 None
+    """
+    logger.info(f"{filename} 分为 {len(chunks)} 块抽取")
+
+    def worker(chunk):
+        return _extract_text(filename, chunk, entity_file, relation_file, strict)
+
+    outcomes = [outcome for _, outcome in ordered_map(worker, chunks, CHUNK_CONFIG['max_workers'])]
+    if any(outcome is None for outcome in outcomes):
+        logger.error(f"{filename} 有块抽取失败")
+        return None
+    merged, _ = fuse_results([outcome[2] for outcome in outcomes], strategy=UNION)
+    return [outcome[:2] for outcome in outcomes], merged
+
+
+def _pre_extract(filename, text):
+    """规则预抽取，返回 (规则结果或 None, 留给 LLM 的文本)"""
+    if not RULE_EXTRACTION_CONFIG['enabled']:
+        return None, text
+    return pre_extract(text, plant_name(filename))
+
+
+def _rules_complete(rule_json, llm_text):
+    """规则已解析出结果且没有剩余栏目时，不需要调用 LLM"""
+    return rule_json is not None and not has_sections(llm_text)
+
+
+def _known_entities(filename, text):
+    """用词表标注全文并记录覆盖率，'accept' 模式下返回匹配到的实体（抽取结果格式），否则返回 None"""
+    lexicon = get_lexicon()
+    if not lexicon:
+        return None
+    annotations = lexicon.annotate(text)
+    stats = coverage(text, annotations)
+    logger.info(f"{filename} 词表命中 {stats['entities']} 个已知实体，覆盖 {stats['chars']:.1%} 字符")
+    return lexicon_result(annotations) if LEXICON_CONFIG['mode'] == 'accept' else None
+
+
+def _merge_results(*results):
+    """合并规则、词表和 LLM 的结果，同一实体的类型以排在前面的结果为准"""
+    results = [result for result in results if result]
+    if len(results) <= 1:
+        return results[0] if results else None
+    # 权重按 2 的幂递减：排在前面的结果得票多于其后所有结果之和，类型投票不会被后面的来源推翻
+    weights = [2.0 ** (len(results) - 1 - i) for i in range(len(results))]
+    merged, _ = fuse_results(results, weights, strategy=UNION)
+    return merged
+
+
+def _learn_result(result):
+    """把保存的结果增量加入词表"""
+    lexicon = get_lexicon()
+    if lexicon and result:
+        lexicon.add_result(result)
+
+
+def _save_lexicon():
+    lexicon = get_lexicon()
+    if lexicon:
+        lexicon.save()
+
+
+def _extract_document(file_path, entity_file, relation_file, enable_validation=True, strict=False):
+    """对单个文件执行抽取（及验证）调用，在工作线程中运行，不写任何输出文件
+
+    格式固定的栏目先由规则抽取，其余部分交给 LLM；超过 CHUNK_CONFIG['max_tokens'] 的长文档按栏目分块并行抽取后合并。
+
+    Args:
+        file_path (str): 输入文件路径
+        entity_file (str): 实体类型文件路径
+        relation_file (str): 关系类型文件路径
+        enable_validation (bool, optional): 是否启用验证步骤. Defaults to True.
+        strict (bool, optional): 是否使用严格模式的 prompt. Defaults to False.
+
+    Returns:
+        dict: 各阶段的 prompt、原始响应和解析后的 JSON，抽取失败时返回 None；
+            验证失败时 validated_json 为 None
+    """
+    filename = os.path.basename(file_path)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        text = f.read().strip()
+
+    logger.info(f"正在处理文件: {filename}")
+
+    # 抽取步骤
+    rule_json, llm_text = _pre_extract(filename, text)
+    known_json = _known_entities(filename, text)
+    chunks = split_document(llm_text, CHUNK_CONFIG['max_tokens'])
+    if _rules_complete(rule_json, llm_text):
+        # 所有栏目都已由规则抽取
+        extractions, extracted_json = [], rule_json
+    elif len(chunks) > 1:
+        outcome = _extract_chunks(filename, chunks, entity_file, relation_file, strict)
+        if outcome is None:
+            return None
+        extractions, extracted_json = outcome
+    else:
+        outcome = _extract_text(filename, llm_text, entity_file, relation_file, strict)
+        if outcome is None:
+            return None
+        extraction_prompt, extracted_result, extracted_json = outcome
+        extractions = [(extraction_prompt, extracted_result)]
+
+    document = _new_document(text, extractions, _merge_results(rule_json, known_json, extracted_json))
+    return _validate_document(document, filename, entity_file, relation_file, enable_validation)
+
+
+def _save_document_logs(document, output_dir, timestamp, filename):
+    """保存一个文档的抽取对话日志（分块时每块一条）和验证对话日志"""
+    for extraction_prompt, extracted_result in document['extractions']:
+        save_conversation_log(extraction_prompt, extracted_result, output_dir, timestamp, filename, "extraction")
+    if document['validation_prompt']:
+        save_conversation_log(document['validation_prompt'], document['validated_result'], output_dir,
+                              timestamp, filename, "validation")
+
+
+def _validate_document(document, filename, entity_file, relation_file, enable_validation=True):
+    """对抽取结果执行类型归一和验证调用，失败时仍返回抽取结果以便保存抽取对话日志
+
+    先用本地类型归一引擎把类型归并到已有词表，只有存在歧义类型时才调用 LLM 验证。
+    """
+    # 检查是否需要验证
+    if not enable_validation or check_convergence():
+        logger.info(f"跳过验证步骤: {filename}")
+        return document
+
+    normalizer = get_type_normalizer(entity_file, relation_file)
+    normalization = None
+    extracted_json = document['extracted_json']
+    if normalizer:
+        normalization = normalizer.normalize(extracted_json)
+        if any(normalization['mapping'].values()):
+            logger.info(f"{filename} 本地类型归一: {normalization['mapping']}")
+        if not any(normalization['ambiguous'].values()):
+            logger.info(f"{filename} 类型均可本地归一，跳过 LLM 验证")
+            document['validated_json'] = normalization['json']
+            return document
+        logger.info(f"{filename} 存在歧义类型，交给 LLM 验证: {normalization['ambiguous']}")
+        extracted_json = normalization['json']
+
+    # 验证步骤
+    document['validated_json'] = None
+    validation_prompt = build_validation_prompt(document['text'], extracted_json, entity_file, relation_file)
+    if not validation_prompt:
+        return document
+
+    with usage_context('validation', [filename]):
+        validated_result = _call_llm(validation_prompt)
+    if not validated_result:
+        return document
+
+    try:
+        validated_json = json.loads(validated_result)
+    except json.JSONDecodeError:
+        logger.error(f"{filename} 的验证结果 JSON 格式错误")
+        return document
+    if normalization:
+        validated_json = normalizer.apply_validation(normalization, validated_json)
+    else:
+        validated_json = merge_validation(extracted_json, validated_json)
+
+    document.update({
+        'validation_prompt': validation_prompt,
+        'validated_result': validated_result,
+        'validated_json': validated_json,
+    })
+    return document
+
+
+def _extract_batch(input_dir, filenames, entity_file, relation_file, enable_validation=True, strict=False):
+    """将多个短文档打包到一次请求中抽取，拆分回每个文件的结果
+
+    响应无法解析或缺少某个文档时，该文档自动回退为单文档抽取。
+
+    Args:
+        input_dir (str): 输入目录路径
+        filenames (list): 本批文件名
+        entity_file (str): 实体类型文件路径
+        relation_file (str): 关系类型文件路径
+        enable_validation (bool, optional): 是否启用验证步骤. Defaults to True.
+        strict (bool, optional): 是否只允许使用已有类型. Defaults to False.
+
+    Returns:
+        list: 与 filenames 一一对应的文档处理记录，失败的文件为 None
+    """
+    if len(filenames) == 1:
+        return [_extract_document(os.path.join(input_dir, filenames[0]), entity_file, relation_file,
+                                  enable_validation, strict)]
+
+    texts, rule_results, llm_texts = [], [], []
+    for filename in filenames:
+        with open(os.path.join(input_dir, filename), 'r', encoding='utf-8') as f:
+            text = f.read().strip()
+        rule_json, llm_text = _pre_extract(filename, text)
+        texts.append(text)
+        rule_results.append(rule_json)
+        llm_texts.append(llm_text)
+    doc_ids = [f"D{i + 1}" for i in range(len(filenames))]
+    # 所有栏目都已由规则抽取的文档不放进批量请求
+    requested = [(doc_id, filename, llm_text) for doc_id, filename, rule_json, llm_text
+                 in zip(doc_ids, filenames, rule_results, llm_texts) if not _rules_complete(rule_json, llm_text)]
+    batch_prompt = batch_result = None
+    if requested:
+        requested_files = [filename for _, filename, _ in requested]
+        logger.info(f"批量抽取 {len(requested)} 个文件: {requested_files}")
+        batch_prompt = build_batch_extraction_prompt([(doc_id, llm_text) for doc_id, _, llm_text in requested],
+                                                     entity_file, relation_file, strict)
+        with usage_context('batch_extraction', requested_files):
+            batch_result = _call_llm(batch_prompt) if batch_prompt else None
+    doc_results = split_batch_response(batch_result, [doc_id for doc_id, _, _ in requested]) if batch_result else {}
+
+    documents = []
+    for doc_id, filename, text, rule_json, llm_text in zip(doc_ids, filenames, texts, rule_results, llm_texts):
+        if _rules_complete(rule_json, llm_text):
+            document = _new_document(text, [], _merge_results(rule_json, _known_entities(filename, text)))
+            documents.append(_validate_document(document, filename, entity_file, relation_file, enable_validation))
+            continue
+        doc_result = doc_results.get(doc_id)
+        if doc_result is None:
+            # 回退为单文档抽取
+            documents.append(_extract_document(os.path.join(input_dir, filename), entity_file, relation_file,
+                                               enable_validation, strict))
+            continue
+        document = _new_document(text, [(batch_prompt, json.dumps(doc_result, ensure_ascii=False))],
+                                 _merge_results(rule_json, _known_entities(filename, text), doc_result))
+        documents.append(_validate_document(document, filename, entity_file, relation_file, enable_validation))
+    return documents
+
+
+def _iter_documents(input_dir, txt_files, entity_file, relation_file, enable_validation=True, strict=False,
+                    max_workers=MAX_WORKERS, batch_token_budget=None, auto_strict=False):
+    """并发抽取所有文件，并按输入顺序逐个产出 (文件名, 文档处理记录)
+
+    文档级线程池和长文档的分块线程池共享 max_workers 个在途请求名额。
+
+    Args:
+        input_dir (str): 输入目录路径
+        txt_files (list): 待处理文件名列表
+        entity_file (str): 实体类型文件路径
+        relation_file (str): 关系类型文件路径
+        enable_validation (bool, optional): 是否启用验证步骤. Defaults to True.
+        strict (bool, optional): 是否只允许使用已有类型. Defaults to False.
+        max_workers (int, optional): 同时在途的 LLM 请求数上限. Defaults to MAX_WORKERS.
+        batch_token_budget (int, optional): 批量抽取时每批文档正文的 token 预算，None 表示不批量. Defaults to None.
+        auto_strict (bool, optional): 类型收敛后，新开始的批次改用严格模式抽取. Defaults to False.
+
+    Yields:
+        tuple: (文件名, 文档处理记录或 None)
+    """
+    batches = plan_batches(input_dir, txt_files, batch_token_budget, max_doc_tokens=CHUNK_CONFIG['max_tokens'])
+
+    switched = []
+
+    def worker(batch):
+        batch_strict = strict
+        if auto_strict and not strict and check_convergence():
+            if not switched:
+                switched.append(batch[0])
+                logger.info(f"类型已收敛，从 {batch[0]} 开始改用严格模式抽取")
+            batch_strict = True
+        return _extract_batch(input_dir, batch, entity_file, relation_file, enable_validation, batch_strict)
+
+    global _request_slots
+    _request_slots = threading.BoundedSemaphore(max(max_workers or 1, 1))
+    try:
+        for batch, documents in ordered_map(worker, batches, max_workers):
+            documents = documents or [None] * len(batch)
+            for filename, document in zip(batch, documents):
+                yield filename, document
+    finally:
+        _request_slots = None
+
+
+def _log_run_stats(entity_file=None, relation_file=None):
+    """输出客户端连接、响应缓存和类型归一统计"""
+    logger.info(f"API 客户端统计: {client_metrics.snapshot()}")
+    cache = get_response_cache()
+    if cache:
+        logger.info(f"响应缓存统计: {cache.stats()}")
+    router = get_router()
+    if router:
+        logger.info(f"后端路由统计: {router.stats()}")
+    normalizer = get_type_normalizer(entity_file, relation_file) if entity_file and relation_file else None
+    if normalizer and normalizer.stats:
+        logger.info(f"类型归一统计: {dict(normalizer.stats)}")
+
+
+def process_simple_extraction(input_dir, output_dir, start_index=None, end_index=None, max_workers=MAX_WORKERS,
+                              resume=True, batch_token_budget=None, entity_file=None, relation_file=None):
+    """简单抽取处理，不进行验证和类型更新
+
+    Args:
+        input_dir (str): 输入目录路径
+        output_dir (str): 输出目录路径
+        start_index (int, optional): 开始处理的文件索引（从0开始）. Defaults to None.
+        end_index (int, optional): 结束处理的文件索引（不包含）. Defaults to None.
+        max_workers (int, optional): 同时在途的 LLM 请求数上限. Defaults to MAX_WORKERS.
+        resume (bool, optional): 是否根据运行清单跳过已完成的文件. Defaults to True.
+        batch_token_budget (int, optional): 将多个短文档打包到一次请求的 token 预算，None 表示逐个抽取.
+            Defaults to None.
+        entity_file (str, optional): 实体类型文件路径. Defaults to CONFIG['entity_file'].
+        relation_file (str, optional): 关系类型文件路径. Defaults to CONFIG['relation_file'].
+    """
+    if not os.path.exists(input_dir):
+        logger.error(f"输入目录 {input_dir} 不存在")
+        return
+
+    os.makedirs(output_dir, exist_ok=True)
+    entity_file = entity_file or CONFIG['entity_file']
+    relation_file = relation_file or CONFIG['relation_file']
+
+    txt_files = _select_files(input_dir, start_index, end_index)
+    if txt_files is None:
+        return
+
+    # 运行清单记录每个文件的状态，续跑时沿用同一个时间戳目录
+    manifest = RunManifest(os.path.join(output_dir, 'run_manifest_strict.jsonl'), resume)
+    timestamp = manifest.timestamp
+    txt_files = manifest.pending(input_dir, txt_files)
+
+    # 抽取调用并发执行，写文件按输入顺序在主线程完成
+    documents = _iter_documents(input_dir, txt_files, entity_file, relation_file,
+                                enable_validation=False, strict=True, max_workers=max_workers,
+                                batch_token_budget=batch_token_budget)
+    for filename, document in documents:
+        if document is None:
+            manifest.mark(filename, FAILED, error="抽取失败")
+            continue
+        file_path = os.path.join(input_dir, filename)
+        try:
+            digest = content_hash(document['text'])
+            manifest.mark(filename, EXTRACTED, digest)
 
             # 保存抽取对话日志
-            save_conversation_log(extraction_prompt, extracted_result, output_dir, timestamp, filename,
-                                  "extraction")
+            _save_document_logs(document, output_dir, timestamp, filename)
 
             # 保存结果
-            save_results(extracted_json, file_path, output_dir, timestamp)
+            if save_results(document['extracted_json'], file_path, output_dir, timestamp):
+                manifest.mark(filename, SAVED, digest)
+                _learn_result(document['extracted_json'])
+            else:
+                manifest.mark(filename, FAILED, digest, error="保存结果失败")
 
         except Exception as e:
             logger.error(f"处理文件 {filename} 出错: {str(e)}")
+            manifest.mark(filename, FAILED, error=str(e))
+
+    # 等待后台线程写完对话日志，保存词表
+    close_conversation_logs()
+    _save_lexicon()
+    manifest.log_summary()
+    usage_tracker.export(output_dir, timestamp)
+    _log_run_stats()
 
 
 def process_directory(input_dir, entity_file, relation_file, output_dir, start_index=None, end_index=None,
-                      enable_validation=True):
+                      enable_validation=True, max_workers=MAX_WORKERS, resume=True, batch_token_budget=None):
     """处理输入目录中的所有 txt 文件
 
+    LLM 调用在线程池中并发执行（最多 max_workers 个在途请求，长文档的分块请求也计入其中），类型文件更新、
+    CSV 记录和结果保存则按文件顺序在主线程中完成。max_workers=1 时与逐个处理完全一致。
+    每个文件的状态记录在 output_dir 下的运行清单中，重新运行时只处理未完成或失败的文件。
+    SCHEDULE_CONFIG 启用时按 scheduler.schedule 的顺序处理，类型收敛后新开始的文档改用严格模式抽取。
+
     Args:
         input_dir (str): 输入目录路径
         entity_file (str): 实体类型文件路径
@@ -95,91 +499,61 @@ def process_directory(input_dir, entity_file, relation_file, output_dir, start_i
         start_index (int, optional): 开始处理的文件索引（从0开始）. Defaults to None.
         end_index (int, optional): 结束处理的文件索引（不包含）. Defaults to None.
         enable_validation (bool, optional): 是否启用验证步骤. Defaults to True.
+        max_workers (int, optional): 同时在途的 LLM 请求数上限. Defaults to MAX_WORKERS.
+        resume (bool, optional): 是否根据运行清单跳过已完成的文件. Defaults to True.
+        batch_token_budget (int, optional): 将多个短文档打包到一次请求的 token 预算，None 表示逐个抽取.
+            Defaults to None.
     """
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-    # 初始化CSV记录器
-    csv_recorder = CSVRecorder()
-
     if not os.path.exists(input_dir):
         logger.error(f"输入目录 {input_dir} 不存在")
         return
 
     os.makedirs(output_dir, exist_ok=True)
 
-    # 获取所有txt文件
-    txt_files = [f for f in os.listdir(input_dir) if f.endswith('.txt')]
+    txt_files = _select_files(input_dir, start_index, end_index)
+    if txt_files is None:
+        return
 
-    # 如果指定了范围，则只处理指定范围内的文件
-    if start_index is not None or end_index is not None:
-        start_idx = start_index if start_index is not None else 0
-        end_idx = end_index if end_index is not None else len(txt_files)
+    # 运行清单记录每个文件的状态，续跑时沿用同一个时间戳目录
+    manifest = RunManifest(os.path.join(output_dir, 'run_manifest.jsonl'), resume)
+    timestamp = manifest.timestamp
+    txt_files = manifest.pending(input_dir, txt_files)
 
-        # 验证索引范围
-        if start_idx < 0 or end_idx > len(txt_files) or start_idx >= end_idx:
-            logger.error(f"无效的文件索引范围: start_index={start_idx}, end_index={end_idx}, 总文件数={len(txt_files)}")
-            return
+    # 恢复上次运行的 Jaccard 历史，重启后不必重新积累收敛轮数
+    load_convergence_state(entity_file)
 
-        txt_files = txt_files[start_idx:end_idx]
-        logger.info(f"将处理从第 {start_idx + 1} 到第 {end_idx} 个文件，共 {len(txt_files)} 个文件")
+    # 先处理预计能带来新类型的文档，使类型词表尽早收敛
+    if SCHEDULE_CONFIG['enabled'] and not check_convergence():
+        txt_files = schedule(input_dir, txt_files, get_lexicon())
 
-    for filename in txt_files:
+    # 初始化CSV记录器，续跑时追加到同一次运行的 CSV 文件
+    csv_recorder = CSVRecorder(os.path.join(EXCEL_OUTPUT_DIR, f'extraction_results_{timestamp}.csv'), resume=resume)
+
+    documents = _iter_documents(input_dir, txt_files, entity_file, relation_file,
+                                enable_validation=enable_validation, max_workers=max_workers,
+                                batch_token_budget=batch_token_budget, auto_strict=SCHEDULE_CONFIG['auto_strict'])
+    for filename, document in documents:
+        if document is None:
+            manifest.mark(filename, FAILED, error="抽取失败")
+            continue
         file_path = os.path.join(input_dir, filename)
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                text = f.read().strip()
+            digest = content_hash(document['text'])
+            manifest.mark(filename, EXTRACTED, digest)
 
-            logger.info(f"正在处理文件: {filename}")
+            # 保存抽取和验证对话日志
+            _save_document_logs(document, output_dir, timestamp, filename)
 
-            # 抽取步骤
-            extraction_prompt = build_extraction_prompt(text, entity_file, relation_file)
-            if not extraction_prompt:
+            validated_json = document['validated_json']
+            if validated_json is None:
+                manifest.mark(filename, FAILED, digest, error="验证失败")
                 continue
-
-            extracted_result = call_openai_api(extraction_prompt)
-            if not extracted_result:
-                logger.error(f"{filename} API调用失败或返回结果无效")
-                continue
-
-            try:
-                extracted_json = json.loads(extracted_result)
-                logger.info(f"{filename} 成功解析JSON结果")
-            except json.JSONDecodeError as e:
-                logger.error(f"{filename} 的抽取结果 JSON 格式错误: {str(e)}")
-                logger.error(f"原始结果: {extracted_result}")
-                continue
-
-            # 保存抽取对话日志
-            save_conversation_log(extraction_prompt, extracted_result, output_dir, timestamp, filename,
-                                  "extraction")
-
-            # 检查是否需要验证
-            if not enable_validation or check_convergence():
-                logger.info(f"跳过验证步骤: {filename}")
-                validated_json = extracted_json
-            else:
-                # 验证步骤
-                validation_prompt = build_validation_prompt(text, extracted_json, entity_file, relation_file)
-                if not validation_prompt:
-                    continue
-
-                validated_result = call_openai_api(validation_prompt)
-                if not validated_result:
-                    continue
-
-                try:
-                    validated_json = json.loads(validated_result)
-                except json.JSONDecodeError:
-                    logger.error(f"{filename} 的验证结果 JSON 格式错误")
-                    continue
-
-                # 保存验证对话日志
-                save_conversation_log(validation_prompt, validated_result, output_dir, timestamp, filename,
-                                      "validation")
+            manifest.mark(filename, VALIDATED, digest)
 
             # 更新实体类型和关系类型文件，并计算 Jaccard 系数
             entity_jaccard, relation_jaccard = update_type_files(validated_json, entity_file, relation_file)
             if entity_jaccard is None or relation_jaccard is None:
+                manifest.mark(filename, FAILED, digest, error="更新类型文件失败")
                 continue
 
             # 记录到CSV
@@ -190,16 +564,27 @@ def process_directory(input_dir, entity_file, relation_file, output_dir, start_i
                                       current_relation_types, relation_jaccard)
 
             # 保存结果
-            save_results(validated_json, file_path, output_dir, timestamp)
+            if save_results(validated_json, file_path, output_dir, timestamp):
+                manifest.mark(filename, SAVED, digest)
+                _learn_result(validated_json)
+            else:
+                manifest.mark(filename, FAILED, digest, error="保存结果失败")
 
         except Exception as e:
             logger.error(f"处理文件 {filename} 出错: {str(e)}")
+            manifest.mark(filename, FAILED, error=str(e))
 
-    # 保存CSV记录
+    # 保存CSV记录，把类型词表写回类型文件，并等待后台线程写完对话日志，保存实体词表
     csv_recorder.save()
+    close_conversation_logs()
+    flush_type_files(entity_file, relation_file)
+    _save_lexicon()
+    manifest.log_summary()
+    usage_tracker.export(output_dir, timestamp)
+    _log_run_stats(entity_file, relation_file)
 
 
-def process_single_file(file_path, entity_file, relation_file, output_dir):
+def process_single_file(file_path, entity_file, relation_file, output_dir, enable_validation=True):
     """处理单个文件
 
     Args:
@@ -207,6 +592,7 @@ def process_single_file(file_path, entity_file, relation_file, output_dir):
         entity_file (str): 实体类型文件路径
         relation_file (str): 关系类型文件路径
         output_dir (str): 输出目录路径
+        enable_validation (bool, optional): 是否启用验证步骤. Defaults to True.
     """
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
@@ -215,111 +601,129 @@ def process_single_file(file_path, entity_file, relation_file, output_dir):
         return
 
     os.makedirs(output_dir, exist_ok=True)
+    load_convergence_state(entity_file)
 
+    filename = os.path.basename(file_path)
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            text = f.read().strip()
-
-        filename = os.path.basename(file_path)
-        logger.info(f"正在处理文件: {filename}")
-
-        # 抽取步骤
-        extraction_prompt = build_extraction_prompt(text, entity_file, relation_file)
-        if not extraction_prompt:
+        # 抽取、类型归一与验证步骤（类型文件已收敛时跳过验证）
+        document = _extract_document(file_path, entity_file, relation_file, enable_validation)
+        if document is None:
             return
 
-        extracted_result = call_openai_api(extraction_prompt)
-        if not extracted_result:
-            logger.error(f"{filename} API调用失败或返回结果无效")
+        # 保存抽取和验证对话日志
+        _save_document_logs(document, output_dir, timestamp, filename)
+        validated_json = document['validated_json']
+        if validated_json is None:
             return
 
-        try:
-            extracted_json = json.loads(extracted_result)
-            logger.info(f"{filename} 成功解析JSON结果")
-        except json.JSONDecodeError as e:
-            logger.error(f"{filename} 的抽取结果 JSON 格式错误: {str(e)}")
-            logger.error(f"原始结果: {extracted_result}")
-            return
-
-        # 保存抽取对话日志
-        save_conversation_log(extraction_prompt, extracted_result, output_dir, timestamp, filename,
-                              "extraction")
-
-        # 检查是否需要验证
-        if check_convergence():
-            logger.info(f"类型文件已收敛，跳过验证步骤: {filename}")
-            validated_json = extracted_json
-        else:
-            # 验证步骤
-            validation_prompt = build_validation_prompt(text, extracted_json, entity_file, relation_file)
-            if not validation_prompt:
-                return
-
-            validated_result = call_openai_api(validation_prompt)
-            if not validated_result:
-                return
-
-            try:
-                validated_json = json.loads(validated_result)
-            except json.JSONDecodeError:
-                logger.error(f"{filename} 的验证结果 JSON 格式错误")
-                return
-
-            # 保存验证对话日志
-            save_conversation_log(validation_prompt, validated_result, output_dir, timestamp, filename,
-                                  "validation")
-
         # 更新实体类型和关系类型文件，并计算 Jaccard 系数
         entity_jaccard, relation_jaccard = update_type_files(validated_json, entity_file, relation_file)
         if entity_jaccard is None or relation_jaccard is None:
             return
 
         # 保存结果
-        save_results(validated_json, file_path, output_dir, timestamp)
+        if save_results(validated_json, file_path, output_dir, timestamp):
+            _learn_result(validated_json)
+            _save_lexicon()
+        flush_type_files(entity_file, relation_file)
+        close_conversation_logs()
+        usage_tracker.export(output_dir, timestamp)
 
     except Exception as e:
         logger.error(f"处理文件 {filename} 出错: {str(e)}")
 
 
-# 配置参数
+# 默认参数，可通过命令行覆盖
 CONFIG = {
     'input_dir': "Data_llm",  # 输入目录路径
     'entity_file': "entity_types.txt",  # 实体类型文件路径
     'relation_file': "relation_types.txt",  # 关系类型文件路径
     'output_dir': "output_results",  # 输出目录路径
-    'start_index': 0,  # 开始处理的文件索引（从0开始）
-    'end_index': 107,  # 结束处理的文件索引（不包含）
-    'single_file': None,  # 处理单个文件（如果指定，则忽略其他参数）
-    'mode': 'normal',  # 处理模式：'normal' 或 'strict'
-    'disable_validation': True  # 禁用验证步骤
+    'max_workers': MAX_WORKERS,  # 同时在途的 LLM 请求数上限
+    'batch_token_budget': None  # 批量抽取时每批文档正文的 token 预算（如 1500），None 表示逐个抽取
 }
 
-# 在启动前判断收敛条件，若收敛则自动切换为严格模式
-if __name__ == "__main__":
 
-    # 配置API
+def _add_run_arguments(parser, single_file=True):
+    parser.add_argument('--input-dir', default=CONFIG['input_dir'], help="输入目录路径")
+    parser.add_argument('--entity-file', default=CONFIG['entity_file'], help="实体类型文件路径")
+    parser.add_argument('--relation-file', default=CONFIG['relation_file'], help="关系类型文件路径")
+    parser.add_argument('--output-dir', default=CONFIG['output_dir'], help="输出目录路径")
+    parser.add_argument('--start', type=int, help="开始处理的文件索引（从0开始，按文件名排序）")
+    parser.add_argument('--end', type=int, help="结束处理的文件索引（不包含）")
+    if single_file:
+        parser.add_argument('--file', help="只处理单个文件（忽略 --input-dir、--start、--end）")
+    parser.add_argument('--workers', type=int, default=CONFIG['max_workers'], help="同时在途的 LLM 请求数上限")
+    parser.add_argument('--no-resume', action='store_true', help="忽略运行清单，重新处理所有文件")
+    parser.add_argument('--batch-token-budget', type=int, default=CONFIG['batch_token_budget'],
+                        help="批量抽取时每批文档正文的 token 预算，不指定时逐个抽取")
+
+
+def _run_strict(args):
+    process_simple_extraction(args.input_dir, args.output_dir, args.start, args.end, max_workers=args.workers,
+                              resume=not args.no_resume, batch_token_budget=args.batch_token_budget,
+                              entity_file=args.entity_file, relation_file=args.relation_file)
+
+
+def _report(output_dir):
+    """打印输出目录中运行清单的状态和最近一次运行的 token 用量"""
+    from usage_tracker import load_records, summarize
+
+    for name in ('run_manifest.jsonl', 'run_manifest_strict.jsonl'):
+        path = os.path.join(output_dir, name)
+        # RunManifest 会创建不存在的清单文件，报告只读取已有的清单
+        if os.path.exists(path):
+            manifest = RunManifest(path)
+            print(f"{name}（运行 {manifest.timestamp}）: {manifest.summary()}")
+            failed = manifest.failed()
+            if failed:
+                print(f"  失败的文件: {', '.join(failed)}")
+    usage_files = sorted(glob.glob(os.path.join(output_dir, 'usage_*.jsonl')))
+    if usage_files:
+        run = summarize(load_records(usage_files[-1]))['run']
+        print(f"{os.path.basename(usage_files[-1])}: {run['calls']:g} 次调用（缓存命中 {run['cache_hits']:g}）, "
+              f"输入 {run['prompt_tokens']:.0f} / 输出 {run['completion_tokens']:.0f} tokens, "
+              f"耗时 {run['latency']:.1f} 秒, JSON 修复 {dict(run['repair'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="中药植物文本的实体与关系抽取")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    _add_run_arguments(subparsers.add_parser('extract', help="抽取并更新类型文件，不做 LLM 验证"))
+    _add_run_arguments(subparsers.add_parser('validate', help="抽取后再调用 LLM 验证，并更新类型文件"))
+    _add_run_arguments(subparsers.add_parser('strict', help="严格使用已收敛的类型抽取，不验证也不更新类型文件"),
+                       single_file=False)
+    report_parser = subparsers.add_parser('report', help="查看运行清单和 token 用量")
+    report_parser.add_argument('--output-dir', default=CONFIG['output_dir'], help="输出目录路径")
+    args = parser.parse_args()
+
+    if args.command == 'report':
+        _report(args.output_dir)
+        return
+
+    setup_logging()
     configure_api()
 
-    # 检查收敛条件并设置模式
-    if check_convergence():
-        CONFIG['mode'] = 'strict'
-        CONFIG['disable_validation'] = True
+    if args.command == 'strict':
+        _run_strict(args)
+        return
+
+    # 在启动前判断收敛条件，若收敛则自动切换为严格模式
+    load_convergence_state(args.entity_file)
+    if check_convergence() and not args.file:
         print("收敛条件已满足，自动切换为严格模式（关闭验证，严格使用已收敛类型）")
+        _run_strict(args)
+        return
+    enable_validation = args.command == 'validate'
+    print("使用普通模式（包含验证步骤）" if enable_validation else "使用普通模式（不含验证步骤）")
+
+    if args.file:
+        process_single_file(args.file, args.entity_file, args.relation_file, args.output_dir, enable_validation)
     else:
-        print("使用普通模式（包含验证步骤）")
-
-    if CONFIG['single_file']:
-        if CONFIG['mode'] == 'strict':
-            process_simple_extraction(CONFIG['single_file'], CONFIG['output_dir'])
-        else:
-            process_directory(CONFIG['single_file'], CONFIG['entity_file'], CONFIG['relation_file'],
-                              CONFIG['output_dir'],
-                              enable_validation=not CONFIG['disable_validation'])
-    else:
-        if CONFIG['mode'] == 'strict':
-            process_simple_extraction(CONFIG['input_dir'], CONFIG['output_dir'], CONFIG['start_index'],
-                                      CONFIG['end_index'])
-        else:
-            process_directory(CONFIG['input_dir'], CONFIG['entity_file'], CONFIG['relation_file'], CONFIG['output_dir'],
-                              CONFIG['start_index'], CONFIG['end_index'],
-                              enable_validation=not CONFIG['disable_validation'])
\ No newline at end of file
+        process_directory(args.input_dir, args.entity_file, args.relation_file, args.output_dir, args.start,
+                          args.end, enable_validation=enable_validation, max_workers=args.workers,
+                          resume=not args.no_resume, batch_token_budget=args.batch_token_budget)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from config import logger
+
+# 文件处理状态
+PENDING = 'pending'
+EXTRACTED = 'extracted'
+VALIDATED = 'validated'
+SAVED = 'saved'
+FAILED = 'failed'
+
+
+def content_hash(text):
+    """计算文本内容的 sha256 摘要"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class RunManifest:
+    """记录每个文件处理状态的运行清单，用于断点续跑
+
+    清单以追加写入的 JSONL 日志保存，每次状态变化追加一行，加载时按顺序回放，
+    因此写入开销与文件总数无关，进程中途崩溃也只会丢失最后一行。
+    """
+
+    def __init__(self, path, resume=True):
+        """
+        Args:
+            path (str): 清单文件路径
+            resume (bool, optional): 是否沿用已有清单继续运行，False 时重新开始. Defaults to True.
+        """
+        self.path = path
+        self.timestamp = None
+        self.entries = {}
+        if resume and os.path.exists(path):
+            self._load()
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            open(path, 'w', encoding='utf-8').close()
+        if self.timestamp is None:
+            self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self._append({'run': self.timestamp})
+        else:
+            logger.info(f"继续运行 {self.timestamp}，已完成 {len(self.completed())} 个文件")
+
+    def _load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时可能留下不完整的最后一行
+                    logger.error(f"忽略清单中损坏的记录: {line}")
+                    continue
+                if 'run' in record:
+                    self.timestamp = record['run']
+                else:
+                    self.entries.setdefault(record['file'], {}).update(record)
+
+    def _append(self, record):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def mark(self, filename, status, digest=None, error=None):
+        """更新文件状态
+
+        Args:
+            filename (str): 文件名
+            status (str): 新状态
+            digest (str, optional): 文件内容摘要
+            error (str, optional): 失败原因
+        """
+        record = {'file': filename, 'status': status, 'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+        if digest is not None:
+            record['hash'] = digest
+        if status == FAILED:
+            record['error'] = error
+            record['attempts'] = self.entries.get(filename, {}).get('attempts', 0) + 1
+        self.entries.setdefault(filename, {}).update(record)
+        self._append(record)
+
+    def is_done(self, filename, digest):
+        """文件是否已成功保存且内容未变"""
+        entry = self.entries.get(filename)
+        return bool(entry) and entry.get('status') == SAVED and entry.get('hash') == digest
+
+    def completed(self):
+        return [f for f, e in self.entries.items() if e.get('status') == SAVED]
+
+    def failed(self):
+        return [f for f, e in self.entries.items() if e.get('status') == FAILED]
+
+    def pending(self, input_dir, txt_files):
+        """过滤出需要处理的文件（未完成、失败或内容已变化），保持输入顺序
+
+        Args:
+            input_dir (str): 输入目录路径
+            txt_files (list): 候选文件名列表
+
+        Returns:
+            list: 需要处理的文件名
+        """
+        todo = []
+        for filename in txt_files:
+            with open(os.path.join(input_dir, filename), 'r', encoding='utf-8') as f:
+                digest = content_hash(f.read().strip())
+            if self.is_done(filename, digest):
+                continue
+            if filename not in self.entries:
+                self.mark(filename, PENDING, digest)
+            todo.append(filename)
+        skipped = len(txt_files) - len(todo)
+        if skipped:
+            logger.info(f"跳过 {skipped} 个已完成的文件，待处理 {len(todo)} 个")
+        return todo
+
+    def summary(self):
+        """统计各状态的文件数"""
+        counts = {}
+        for entry in self.entries.values():
+            counts[entry.get('status')] = counts.get(entry.get('status'), 0) + 1
+        return counts
+
+    def log_summary(self):
+        """输出本次运行的状态统计和失败文件列表"""
+        logger.info(f"运行清单统计: {self.summary()}")
+        for filename in self.failed():
+            logger.error(f"处理失败: {filename} ({self.entries[filename].get('error')})")
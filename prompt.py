@@ -1,5 +1,119 @@
+import hashlib
 import json
 from config import logger
+from type_registry import get_type_registry
+
+# 所有 Prompt 按「静态指令 -> 类型列表 -> 文档」的顺序组织：静态指令作为独立的 system 消息，
+# 类型列表只在词表更新时变化，文档放在最后。这样同一类请求共享尽可能长的前缀，
+# vLLM / Ollama / 托管 API 的前缀缓存（KV cache）可以复用。
+
+_EXTRACTION_EXAMPLE = """{
+  "entities": [
+    {"entity": "一叶萩", "type": "药用植物"},
+    {"entity": "大戟科", "type": "科"}
+  ],
+  "relationships": [
+    {"head": "一叶萩", "predicate": "属于科", "tail": "大戟科"},
+    {"head": "一叶萩", "predicate": "属于属", "tail": "黑面神属"}
+  ]
+}"""
+
+SIMPLE_EXTRACTION_SYSTEM = f"""你是一名数据标注专家，擅长从药用植物文本中识别规范化的实体与其之间的语义关系。
+请对用户给出的文本进行处理，并只返回符合格式的JSON结果。
+重要：你必须严格按照以下示例JSON格式输出，不要添加任何其他内容，不要有任何解释性文字：
+{_EXTRACTION_EXAMPLE}"""
+
+EXTRACTION_SYSTEM = f"""你是药用植物领域和自然语言处理的专家，擅长从药用植物文本中提取实体及其关系。
+你的任务分为两个阶段，请依次执行：
+阶段1：从文本中识别出所有语义明确的实体，并标注其对应的实体类型。实体类型可参考但不限于给出的实体类型列表。
+阶段2：在阶段1提取的实体对中，识别其间存在的语义关系，关系类型可参考但不限于给出的关系类型列表。
+请对输入文本进行处理，并只返回符合格式的JSON结果。
+请严格按照以下 JSON 格式输出，不能有任何额外解释性文字：
+{_EXTRACTION_EXAMPLE}"""
+
+STRICT_EXTRACTION_SYSTEM = f"""你是一名数据标注专家，擅长从药用植物文本中识别规范化的实体与其之间的语义关系。
+你的任务分为两个阶段，请依次执行：
+阶段1：提取文本中的所有实体，实体类型仅限于给出的实体类型列表，每个实体需包含其文本内容及对应类型。
+阶段2：在阶段1提取的实体中，识别其间存在的语义关系，关系类型仅限于给出的关系类型列表。
+请对输入文本进行处理，并只返回符合格式的JSON结果。
+请严格按照以下 JSON 格式输出，不能有任何额外解释性文字：
+{_EXTRACTION_EXAMPLE}"""
+
+VALIDATION_SYSTEM = """你是一名数据标注专家，擅长校对与审阅不恰当的标注结果。
+你的任务为三个阶段，请依次执行：
+阶段1：实体类型归一—对比抽取结果中的实体类型与给出的实体类型列表，识别语义重复或粒度不一致的类型，进行归一化映射；
+阶段2：关系类型归一—对比抽取结果中的关系类型与给出的关系类型列表，识别语义重复或模糊的关系标签，进行归一化映射。
+阶段3：输出优化后的标准实体关系类型集合和被合并的实体关系类型映射。
+如果没有需要合并的实体类型或关系类型，对应的映射返回空对象 {}，仍按下面的格式输出完整的 JSON。
+请严格按照以下 JSON 格式输出，不能有任何额外解释性文字：
+{
+  "standard entity type list": ["type a", "type b", ...],
+  "standard relation type list": ["relation 1", "relation 2", ...],
+  "merged entity type mapping": {"original type 1": "standard type a", "original type 2": "standard type a", ...},
+  "merged relation mapping": {"original relation 1": "standard relation 1", "original relation 2": "standard relation 1", ...}
+}"""
+
+_BATCH_EXTRACTION_SYSTEM = """你是药用植物领域和自然语言处理的专家，擅长从药用植物文本中提取实体及其关系。
+用户会给出多篇相互独立的文本，每篇以方括号中的文档编号开头。请对每篇文本分别执行两个阶段的任务：
+阶段1：从文本中识别出所有语义明确的实体，并标注其对应的实体类型。
+阶段2：在阶段1提取的实体对中，识别其间存在的语义关系。
+{type_scope}
+请以文档编号为键，分别给出每篇文本的结果，严格按照以下 JSON 格式输出，不能有任何额外解释性文字：
+{{
+  "D1": {{
+    "entities": [
+      {{"entity": "一叶萩", "type": "药用植物"}},
+      {{"entity": "大戟科", "type": "科"}}
+    ],
+    "relationships": [
+      {{"head": "一叶萩", "predicate": "属于科", "tail": "大戟科"}}
+    ]
+  }}
+}}"""
+
+BATCH_EXTRACTION_SYSTEM = _BATCH_EXTRACTION_SYSTEM.format(
+    type_scope="实体类型和关系类型可参考但不限于给出的类型列表。")
+STRICT_BATCH_EXTRACTION_SYSTEM = _BATCH_EXTRACTION_SYSTEM.format(
+    type_scope="实体类型和关系类型仅限于给出的类型列表。")
+
+
+class Prompt(str):
+    """用户消息文本，同时携带静态的 system 消息和前缀哈希
+
+    继承 str，因此可以像原来的 prompt 字符串一样写入对话日志和批处理文件；
+    call_openai_api 会读取 system 属性，把静态指令作为独立的 system 消息发送。
+    """
+
+    def __new__(cls, system, types_section, document_section, types_version=None):
+        """
+        Args:
+            system (str): 静态指令，作为 system 消息
+            types_section (str): 类型列表部分，可以为空
+            document_section (str): 文档部分
+            types_version (int, optional): 生成类型列表时的词表版本. Defaults to None.
+        """
+        user = f"{types_section}\n\n{document_section}" if types_section else document_section
+        prompt = super().__new__(cls, user)
+        prompt.system = system
+        prompt.types_version = types_version
+        # 前缀 = system 消息 + 类型列表，同一前缀的请求可以复用服务端的 KV 缓存
+        prompt.prefix_hash = hashlib.sha256(f"{system}\0{types_section}".encode('utf-8')).hexdigest()[:16]
+        return prompt
+
+
+def _types_section(registry):
+    """渲染类型列表；新类型追加在列表末尾，尽量保持已有前缀不变"""
+    entity_type_str = "、".join(registry.entity_types())
+    relation_type_str = "、".join(registry.relation_types())
+    return f"实体类型列表：{entity_type_str}\n关系类型列表：{relation_type_str}"
+
+
+def _document_section(text, hints=None):
+    """渲染文档部分；词表提示放在文档之后，不影响可复用的前缀"""
+    section = f"输入文本：\n{text}"
+    if hints:
+        section += f"\n\n已知实体（来自历史抽取结果，仅供参考，请以文本为准）：{hints}"
+    return section
 
 
 def build_simple_extraction_prompt(text):
@@ -9,27 +123,12 @@ def build_simple_extraction_prompt(text):
         text (str): 需要处理的文本
 
     Returns:
-        str: 构建的 prompt
+        Prompt: 构建的 prompt
     """
-    prompt = f"""你是一名数据标注专家，擅长从药用植物文本中识别规范化的实体与其之间的语义关系。
-请对以下文本进行处理，并只返回符合上述格式的JSON结果：
-{text}
-
-重要：你必须严格按照以下示例JSON格式输出，不要添加任何其他内容，不要有任何解释性文字：
-{{
-  "entities": [
-    {{"entity": "一叶萩", "type": "药用植物"}},
-    {{"entity": "大戟科", "type": "科"}}
-  ],
-  "relationships": [
-    {{"head": "一叶萩", "predicate": "属于科", "tail": "大戟科"}},
-    {{"head": "一叶萩", "predicate": "属于属", "tail": "黑面神属"}}
-  ]
-}}"""
-    return prompt
+    return Prompt(SIMPLE_EXTRACTION_SYSTEM, "", f"输入文本：\n{text}")
 
 
-def build_extraction_prompt(text, entity_file, relation_file):
+def build_extraction_prompt(text, entity_file, relation_file, hints=None):
     """
     构建实体和关系抽取的 Prompt，包含类型更新
 
@@ -37,39 +136,14 @@ def build_extraction_prompt(text, entity_file, relation_file):
         text (str): 需要处理的文本
         entity_file (str): 实体类型文件路径
         relation_file (str): 关系类型文件路径
+        hints (str, optional): 词表在文本中匹配到的已知实体. Defaults to None.
 
     Returns:
-        str: 构建的 prompt
+        Prompt: 构建的 prompt
     """
     try:
-        with open(entity_file, 'r', encoding='utf-8') as f:
-            entity_types = [line.strip() for line in f if line.strip()]
-        with open(relation_file, 'r', encoding='utf-8') as f:
-            relation_types = [line.strip() for line in f if line.strip()]
-
-        entity_type_str = "、".join(entity_types)
-        relation_type_str = "、".join(relation_types)
-
-        prompt = f"""你是药用植物领域和自然语言处理的专家，擅长从药用植物文本中提取实体及其关系。
-你的任务分为两个阶段，请依次执行：
-阶段1：从文本中识别出所有语义明确的实体，并标注其对应的实体类型。实体类型可参考但不限于以下列表：{entity_type_str}。
-阶段2：在阶段1提取的实体对中，识别其间存在的语义关系，关系类型可参考但不限于以下列表：{relation_type_str}。
-请对以下文本进行处理，并只返回符合上述格式的JSON结果：
-请严格按照以下 JSON 格式输出，不能有任何额外解释性文字：
-{{
-  "entities": [
-    {{"entity": "一叶萩", "type": "药用植物"}},
-    {{"entity": "大戟科", "type": "科"}}
-  ],
-  "relationships": [
-    {{"head": "一叶萩", "predicate": "属于科", "tail": "大戟科"}},
-    {{"head": "一叶萩", "predicate": "属于属", "tail": "黑面神属"}}
-  ]
-}}
-
-输入文本：
-{text}"""
-        return prompt
+        registry = get_type_registry(entity_file, relation_file)
+        return Prompt(EXTRACTION_SYSTEM, _types_section(registry), _document_section(text, hints), registry.version)
     except Exception as e:
         logger.error(f"构建抽取 Prompt 失败: {str(e)}")
         return None
@@ -84,77 +158,57 @@ def build_validation_prompt(text, extracted_json, entity_file, relation_file):
         relation_file (str): 关系类型文件路径
 
     Returns:
-        str: 构建的 prompt
+        Prompt: 构建的 prompt
     """
     try:
-        with open(entity_file, 'r', encoding='utf-8') as f:
-            entity_types = [line.strip() for line in f if line.strip()]
-        with open(relation_file, 'r', encoding='utf-8') as f:
-            relation_types = [line.strip() for line in f if line.strip()]
-
-        entity_type_str = "、".join(entity_types)
-        relation_type_str = "、".join(relation_types)
-
-        prompt = f"""你是一名数据标注专家，擅长校对与审阅不恰当的标注结果。
-你的任务为三个阶段，请依次执行：阶段1：实体类型归一—对比抽取结果中的实体类型与提供的 {entity_type_str}，识别语义重复或粒度不一致的类型，进行归一化映射；
-阶段2：关系类型归—对比抽取结果中的关系类型与提供的 {relation_type_str}，识别语义重复或模糊的关系标签，进行归一化映射。
-阶段3：输出优化后的标准实体关系类型集合和被合并的实体关系类型映射。
-如果没有要消歧的实体关系，则返回空字符串。
-请严格按照以下 JSON 格式输出，不能有任何额外解释性文字：
-{{
-  "standard entity type list": ["type a", "type b", ...],
-  "standard relation type list": ["relation 1", "relation 2", ...],
-  "merged entity type mapping": {"original type 1": "standard type a", "original type 2": "standard type a", ... },
-  "merged relation mapping": {"original relation 1": "standard relation 1", "original relation 2": "standard relation 1", ... }
-}}
-当前抽取结果：
-{json.dumps(extracted_json, ensure_ascii=False, indent=2)}
-"""
-        return prompt
+        registry = get_type_registry(entity_file, relation_file)
+        return Prompt(VALIDATION_SYSTEM, _types_section(registry),
+                      f"当前抽取结果：\n{json.dumps(extracted_json, ensure_ascii=False, indent=2)}",
+                      registry.version)
     except Exception as e:
         logger.error(f"构建验证 Prompt 失败: {str(e)}")
         return None
 
 
-def build_strict_extraction_prompt(text, entity_file, relation_file):
+def build_strict_extraction_prompt(text, entity_file, relation_file, hints=None):
     """构建严格模式下的抽取 Prompt，只允许使用已收敛的实体和关系类型
 
     Args:
         text (str): 需要处理的文本
         entity_file (str): 实体类型文件路径
         relation_file (str): 关系类型文件路径
+        hints (str, optional): 词表在文本中匹配到的已知实体. Defaults to None.
 
     Returns:
-        str: 构建的 prompt
+        Prompt: 构建的 prompt
     """
     try:
-        with open(entity_file, 'r', encoding='utf-8') as f:
-            entity_types = [line.strip() for line in f if line.strip()]
-        with open(relation_file, 'r', encoding='utf-8') as f:
-            relation_types = [line.strip() for line in f if line.strip()]
-
-        entity_type_str = "、".join(entity_types)
-        relation_type_str = "、".join(relation_types)
-
-        prompt = f"""你是一名数据标注专家，擅长从药用植物文本中识别规范化的实体与其之间的语义关系。
-你的分为两个阶段，请依次执行：阶段1：提取文本中的所有实体，实体类型仅限于以下列表：
-分为两个阶段，请依次执行：阶段1：提取文本中的所有实体，实体类型仅限于以下列表：{entity_type_str},每个实体需包含其文本内容及对应类型。
-阶段2：在阶段一提取的实体中，识别其间存在的语义关系，关系类型仅限于以下列表：{relation_type_str}。
-请对以下文本进行处理，并只返回符合上述格式的JSON结果：
-请严格按照以下 JSON 格式输出，不能有任何额外解释性文字：{{
-  "entities": [
-    {"entity": "XXX", "type": "XXX" },
-    ...
-  ],
-  "relations": [
-    {"head": "XXX", "relation": "XXX" ,"tail": "XXX", },
-    ...
-  ]
-}}
-输入文本：
-{text}
-"""
-        return prompt
+        registry = get_type_registry(entity_file, relation_file)
+        return Prompt(STRICT_EXTRACTION_SYSTEM, _types_section(registry), _document_section(text, hints),
+                      registry.version)
     except Exception as e:
         logger.error(f"构建严格模式 Prompt 失败: {str(e)}")
-        return None 
\ No newline at end of file
+        return None
+
+
+def build_batch_extraction_prompt(documents, entity_file, relation_file, strict=False):
+    """构建多文档批量抽取的 Prompt，多个短文档共用一份指令和类型列表
+
+    Args:
+        documents (list): (文档编号, 文本) 元组列表
+        entity_file (str): 实体类型文件路径
+        relation_file (str): 关系类型文件路径
+        strict (bool, optional): 是否只允许使用已有类型. Defaults to False.
+
+    Returns:
+        Prompt: 构建的 prompt
+    """
+    try:
+        registry = get_type_registry(entity_file, relation_file)
+        system = STRICT_BATCH_EXTRACTION_SYSTEM if strict else BATCH_EXTRACTION_SYSTEM
+        document_str = "\n\n".join(f"[{doc_id}]\n{text}" for doc_id, text in documents)
+        return Prompt(system, _types_section(registry), f"输入文本（共 {len(documents)} 篇）：\n{document_str}",
+                      registry.version)
+    except Exception as e:
+        logger.error(f"构建批量抽取 Prompt 失败: {str(e)}")
+        return None
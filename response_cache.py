@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import logger, CACHE_CONFIG, setup_logging
+
+
+def make_cache_key(model, messages, temperature, max_tokens):
+    """根据模型、消息和采样参数计算缓存键
+
+    Args:
+        model (str): 模型名称
+        messages (list): 对话消息列表
+        temperature (float): 采样温度
+        max_tokens (int): 最大生成 token 数
+
+    Returns:
+        str: sha256 十六进制摘要
+    """
+    payload = json.dumps(
+        {'model': model, 'messages': messages, 'temperature': temperature, 'max_tokens': max_tokens},
+        ensure_ascii=False, sort_keys=True, separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """基于 SQLite 的 LLM 响应缓存，按总大小做 LRU 淘汰
+
+    缓存键包含完整的消息列表，而类型列表和词表提示都是 prompt 的一部分，
+    因此回放只能复现从相同类型文件和实体词表开始的运行。
+    """
+
+    def __init__(self, path, max_bytes=None, read_only=False):
+        """
+        Args:
+            path (str): SQLite 文件路径
+            max_bytes (int, optional): 缓存响应总字节数上限，None 表示不限制
+            read_only (bool, optional): 回放模式，只读缓存、不写入. Defaults to False.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, '
+            'created REAL NOT NULL, last_access REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)')
+        self._conn.commit()
+        # 条目数和总字节数只在打开时统计一次，之后由 put/_evict 增量维护
+        self._entries, self._bytes = self._totals()
+
+    def _totals(self):
+        return self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+
+    def get(self, key):
+        """查询缓存，命中时刷新访问时间
+
+        Args:
+            key (str): 缓存键
+
+        Returns:
+            str: 缓存的响应文本，未命中返回 None
+        """
+        return self.get_any([key])
+
+    def get_any(self, keys):
+        """依次查询多个候选键（如多个后端模型），按一次查询计入命中统计
+
+        Args:
+            keys (list): 候选缓存键
+
+        Returns:
+            str: 第一个命中的响应文本，全部未命中返回 None
+        """
+        with self._lock:
+            for key in keys:
+                row = self._conn.execute('SELECT response FROM responses WHERE key = ?', (key,)).fetchone()
+                if row is None:
+                    continue
+                self.hits += 1
+                if not self.read_only:
+                    self._conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (time.time(), key))
+                    self._conn.commit()
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key, response):
+        """写入缓存，超出容量时淘汰最久未访问的条目
+
+        Args:
+            key (str): 缓存键
+            response (str): 响应文本
+        """
+        if self.read_only:
+            return
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        with self._lock:
+            row = self._conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, response, size, created, last_access) VALUES (?, ?, ?, ?, ?)',
+                (key, response, size, now, now)
+            )
+            if row is None:
+                self._entries += 1
+            else:
+                self._bytes -= row[0]
+            self._bytes += size
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if not self.max_bytes or self._bytes <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY last_access'):
+            if self._bytes <= self.max_bytes:
+                break
+            evicted.append((key,))
+            self._bytes -= size
+        self._entries -= len(evicted)
+        self._conn.executemany('DELETE FROM responses WHERE key = ?', evicted)
+        logger.info(f"缓存超出容量，淘汰 {len(evicted)} 条记录")
+
+    def stats(self):
+        """返回命中统计，条目数和总字节数重新扫描表得到，并校正增量维护的计数
+
+        Returns:
+            dict: 命中数、未命中数、命中率、条目数和总字节数
+        """
+        with self._lock:
+            self._entries, self._bytes = self._totals()
+            entries, size = self._entries, self._bytes
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'entries': entries,
+            'bytes': size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """获取全局响应缓存，CACHE_CONFIG['mode'] 为 'off' 时返回 None
+
+    Returns:
+        ResponseCache: 共享缓存实例
+    """
+    global _cache
+    if CACHE_CONFIG['mode'] == 'off':
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(CACHE_CONFIG['path'], CACHE_CONFIG['max_bytes'],
+                                   read_only=CACHE_CONFIG['mode'] == 'replay')
+        return _cache
+
+
+if __name__ == "__main__":
+    # 用法: python response_cache.py，打印缓存的条目数和大小
+    setup_logging()
+    cache = get_response_cache()
+    print(cache.stats() if cache else "缓存未启用")
@@ -0,0 +1,168 @@
+import random
+import time
+from config import logger, RETRY_CONFIG
+from llm_client import metrics, timed_call
+from usage_tracker import usage_tracker
+from batching import estimate_tokens
+from stream_parser import collect_stream
+
+# 可重试的 HTTP 状态码：超时、冲突、限速和服务端错误
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+def retry_reason(error):
+    """判断异常是否值得重试
+
+    Args:
+        error (Exception): API 调用抛出的异常
+
+    Returns:
+        str: 重试原因（'rate_limit'、'timeout'、'connection'、'server_error'、'conflict'），不可重试时返回 None
+    """
+    # 只在出错时才需要 openai 的异常类型，延迟导入以免拖慢启动
+    from openai import APIConnectionError, APIStatusError, APITimeoutError
+
+    if isinstance(error, APITimeoutError):
+        return 'timeout'
+    if isinstance(error, APIConnectionError):
+        return 'connection'
+    if isinstance(error, APIStatusError):
+        status = error.status_code
+        if status == 429:
+            return 'rate_limit'
+        if status >= 500:
+            return 'server_error'
+        if status in RETRYABLE_STATUS:
+            return 'timeout' if status == 408 else 'conflict'
+    return None
+
+
+def retry_after(error):
+    """读取响应头中的 Retry-After（秒数或 HTTP 日期），没有时返回 None"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    import email.utils
+
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt):
+    """第 attempt 次重试前的等待时间：指数退避加全抖动"""
+    ceiling = min(RETRY_CONFIG['max_delay'], RETRY_CONFIG['base_delay'] * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+
+def estimate_request_tokens(messages, max_tokens):
+    """估计一次请求占用的 token 配额：prompt 估计值加上最大生成长度"""
+    return sum(estimate_tokens(message['content']) for message in messages) + max_tokens
+
+
+def call_with_retry(send, limiter=None, tokens=0, description='API 请求'):
+    """发送请求，遇到可重试的错误时按指数退避重试
+
+    每次尝试前先向限速器申请配额；收到 429 时按 Retry-After（没有时按退避时间）
+    暂停整个端点，避免其他线程继续触发限速。
+
+    Args:
+        send (callable): 无参数的请求函数
+        limiter (RateLimiter, optional): 端点限速器. Defaults to None.
+        tokens (int, optional): 每次尝试预计消耗的 token 数. Defaults to 0.
+        description (str, optional): 日志中的请求描述. Defaults to 'API 请求'.
+
+    Returns:
+        请求函数的返回值；重试次数用尽或遇到不可重试的错误时抛出最后一个异常
+    """
+    max_attempts = max(1, RETRY_CONFIG['max_attempts'])
+    for attempt in range(max_attempts):
+        if limiter:
+            waited = limiter.acquire(tokens)
+            if waited:
+                metrics.record_throttle(waited)
+        try:
+            return send()
+        except Exception as e:
+            reason = retry_reason(e)
+            if reason is None or attempt + 1 >= max_attempts:
+                raise
+            delay = retry_after(e)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            else:
+                delay = min(delay, RETRY_CONFIG['max_delay']) + random.uniform(0, RETRY_CONFIG['base_delay'])
+            if reason == 'rate_limit' and limiter:
+                limiter.pause(delay)
+            metrics.record_retry(reason)
+            logger.warning(f"{description} 失败（{reason}），{delay:.1f} 秒后第 {attempt + 1} 次重试: {str(e)}")
+            time.sleep(delay)
+
+
+def complete_chat(client, model, messages, temperature, max_tokens, limiter=None, streaming=False,
+                  timeout=None, description='API 请求'):
+    """发送一次带重试和限速的对话补全请求
+
+    按 prompt 估计值加 max_tokens 预留 token 配额，拿到响应后按实际用量退还多预留的部分，
+    以便在不超过 tokens_per_minute 的前提下尽量用满配额。
+
+    Args:
+        client (OpenAI): API 客户端
+        model (str): 模型名称
+        messages (list): 对话消息列表
+        temperature (float): 采样温度
+        max_tokens (int): 最大生成 token 数
+        limiter (RateLimiter, optional): 端点限速器. Defaults to None.
+        streaming (bool, optional): 是否流式读取. Defaults to False.
+        timeout (float, optional): 单次请求超时（秒），None 时使用客户端默认超时
+        description (str, optional): 日志中的请求描述. Defaults to 'API 请求'.
+
+    Returns:
+        str: 模型返回的文本，流式输出提前终止时返回 None
+    """
+    options = {'model': model, 'messages': messages, 'temperature': temperature, 'max_tokens': max_tokens}
+    if timeout is not None:
+        options['timeout'] = timeout
+    reserved = estimate_request_tokens(messages, max_tokens)
+
+    def send():
+        if streaming:
+            # 流式读取，顶层 JSON 对象闭合后立即停止
+            text = timed_call(lambda: collect_stream(client.chat.completions.create(stream=True, **options)))
+            usage = None
+        else:
+            response = timed_call(client.chat.completions.create, stream=False, **options)
+            text = response.choices[0].message.content.strip()
+            usage = getattr(response, 'usage', None)
+            metrics.record_usage(usage)
+        prompt_tokens = getattr(usage, 'prompt_tokens', None)
+        completion_tokens = getattr(usage, 'completion_tokens', None)
+        used = getattr(usage, 'total_tokens', None)
+        if prompt_tokens is None or completion_tokens is None:
+            # 服务端没有返回用量（如流式输出）时使用本地估计值
+            usage_tracker.record_completion(model, estimate_request_tokens(messages, 0),
+                                            estimate_tokens(text) if text else 0, estimated=True)
+        else:
+            usage_tracker.record_completion(model, prompt_tokens, completion_tokens)
+        if limiter:
+            if not used:
+                used = estimate_request_tokens(messages, 0) + (estimate_tokens(text) if text else 0)
+            limiter.adjust(reserved - used)
+        return text
+
+    return call_with_retry(send, limiter, reserved, description)
@@ -0,0 +1,181 @@
+"""规则预抽取：从格式固定的【科属归类】【药用部位】栏目直接抽取科、属、药用部位和药材
+
+语料中这两个栏目几乎总是同一格式，例如：
+    一叶萩【科属归类】大戟科黑面神属【药用部位】以嫩枝叶或根入药。中药名:一叶萩。
+    栝楼【药用部位】以根、成熟果实入药。中药名:根:天花粉。成熟果实:瓜蒌。
+栏目完全符合格式时直接生成实体和 属于科 / 属于属 / 药用部位 / 药材 关系，并从发送给 LLM 的文本中去掉；
+不完全符合的栏目原样留给 LLM，规则不做任何猜测。
+"""
+import os
+import re
+from chunking import split_sections
+
+PLANT_TYPE = '药用植物'
+FAMILY_TYPE = '科'
+GENUS_TYPE = '属'
+PART_TYPE = '药用部位'
+MATERIAL_TYPE = '药材'
+
+_TAXONOMY_HEADING = '【科属归类】'
+_PARTS_HEADING = '【药用部位】'
+_HEADING_PATTERN = re.compile(r'【[^】\n]{1,20}】')
+
+# 名称只允许汉字，长度有限，排除“樟树的根、干、枝、叶经蒸馏精制而成的颗粒状物”这类描述
+_NAME = r'[一-鿿]{1,12}'
+_NAME_PATTERN = re.compile(_NAME)
+_ALIAS_PATTERN = re.compile(r'[(（][^)）]*[)）]')
+_TAXONOMY_PATTERN = re.compile(rf'({_NAME}?科)({_NAME}?属)[。，,\s]*')
+# 一个栏目可能包含多段“以……入药。中药名:……”
+_BLOCK_START = re.compile(r'(?=以[^。]{1,60}?入药)')
+_BLOCK_PATTERN = re.compile(r'以([^。]+?)入药[。，,；;]?\s*(?:(?:中药名|药材名)[:：])?(.*)', re.S)
+_PART_SEPARATORS = re.compile(r'[、，,]|或|及|和|与|以及')
+_NAME_SEPARATORS = re.compile(r'[、，,]')
+_ITEM_SEPARATORS = re.compile(r'[。；;]')
+_LABEL_SEPARATOR = re.compile(r'[:：]')
+_LABELED_NAME = re.compile(rf'({_NAME})[(（]([^)）]+)[)）]')
+
+
+def _names(text, separators=_PART_SEPARATORS):
+    """把用分隔符连接的名称拆开，有任何一个不是简单名称时返回 None"""
+    names = [name.strip() for name in separators.split(text) if name.strip()]
+    if not names or not all(_NAME_PATTERN.fullmatch(name) for name in names):
+        return None
+    return names
+
+
+def _is_label(label, parts):
+    """标注的部位（可以是“根、根皮”这样的组合）都在药用部位列表中"""
+    names = _names(label)
+    return names is not None and all(name in parts for name in names)
+
+
+def parse_taxonomy(body):
+    """解析【科属归类】栏目正文，如“大戟科黑面神属”，括号中的别名忽略
+
+    Returns:
+        tuple: (科, 属)，格式不符时返回 None
+    """
+    match = _TAXONOMY_PATTERN.fullmatch(_ALIAS_PATTERN.sub('', body.strip()))
+    return (match.group(1), match.group(2)) if match else None
+
+
+def _parse_materials(text, parts):
+    """解析“中药名:”之后的药材列表，返回 [(部位或 None, 药材名)]，格式不符时返回 None"""
+    materials = []
+    for item in _ITEM_SEPARATORS.split(text):
+        item = item.strip()
+        if not item:
+            continue
+        fields = _LABEL_SEPARATOR.split(item)
+        if len(fields) == 2 and _is_label(fields[0].strip(), parts):
+            # 部位:药材
+            names = _names(fields[1], _NAME_SEPARATORS)
+            if names is None:
+                return None
+            materials.extend((fields[0].strip(), name) for name in names)
+        elif len(fields) == 1:
+            # 药材 或 药材(部位)，多个之间用逗号分隔
+            for name in _NAME_SEPARATORS.split(item):
+                name = name.strip()
+                labeled = _LABELED_NAME.fullmatch(name)
+                if labeled and _is_label(labeled.group(2), parts):
+                    materials.append((labeled.group(2), labeled.group(1)))
+                elif _NAME_PATTERN.fullmatch(name):
+                    materials.append((None, name))
+                else:
+                    return None
+        else:
+            return None
+    return materials
+
+
+def parse_medicinal_parts(body):
+    """解析【药用部位】栏目正文
+
+    支持“以A、B或C入药。中药名:X。”、按部位分列的“中药名:A:X。B:Y。”、“中药名:X(A)，Y(B)。”
+    以及多段“以……入药。中药名:……”连写。
+
+    Returns:
+        tuple: (药用部位列表, [(部位或 None, 药材名)])，格式不符时返回 None
+    """
+    parts, materials = [], []
+    for block in _BLOCK_START.split(body.strip()):
+        if not block.strip():
+            continue
+        match = _BLOCK_PATTERN.fullmatch(block.strip())
+        if not match:
+            return None
+        block_parts = _names(match.group(1))
+        if block_parts is None:
+            return None
+        block_materials = _parse_materials(match.group(2), block_parts)
+        if block_materials is None:
+            return None
+        parts.extend(part for part in block_parts if part not in parts)
+        materials.extend(material for material in block_materials if material not in materials)
+    if not parts:
+        return None
+    return parts, materials
+
+
+def plant_name(filename):
+    """从“三七 Sanqi.txt”这样的文件名取出中文植物名"""
+    return os.path.splitext(os.path.basename(filename))[0].split()[0] if filename else None
+
+
+def pre_extract(text, plant=None):
+    """对文档做规则预抽取
+
+    Args:
+        text (str): 文档正文，开头通常是植物名，后接各【...】栏目
+        plant (str, optional): 正文开头没有植物名时使用的植物名，一般由 plant_name 从文件名得到. Defaults to None.
+
+    Returns:
+        tuple: (抽取结果字典，没有可解析的栏目时为 None, 去掉已解析栏目后留给 LLM 的文本)
+    """
+    header, sections = split_sections(text)
+    plant = header.strip() or plant
+    if not plant or not _NAME_PATTERN.fullmatch(plant):
+        return None, text
+
+    entities = [{'entity': plant, 'type': PLANT_TYPE}]
+    relationships = []
+    remaining = []
+    for section in sections:
+        if section.startswith(_TAXONOMY_HEADING):
+            taxonomy = parse_taxonomy(section[len(_TAXONOMY_HEADING):])
+            if taxonomy:
+                family, genus = taxonomy
+                entities += [{'entity': family, 'type': FAMILY_TYPE}, {'entity': genus, 'type': GENUS_TYPE}]
+                relationships += [{'head': plant, 'predicate': '属于科', 'tail': family},
+                                  {'head': plant, 'predicate': '属于属', 'tail': genus}]
+                continue
+        elif section.startswith(_PARTS_HEADING):
+            parsed = parse_medicinal_parts(section[len(_PARTS_HEADING):])
+            if parsed:
+                parts, materials = parsed
+                entities += [{'entity': part, 'type': PART_TYPE} for part in parts]
+                relationships += [{'head': plant, 'predicate': '药用部位', 'tail': part} for part in parts]
+                # 药材与植物同名时不再输出同名实体，否则合并结果时会按实体名把植物并成药材，只保留“药材”关系
+                entities += [{'entity': name, 'type': MATERIAL_TYPE} for _, name in materials if name != plant]
+                relationships += [{'head': plant, 'predicate': '药材', 'tail': name} for _, name in materials]
+                continue
+        remaining.append(section)
+
+    if not relationships:
+        return None, text
+    return {'entities': entities, 'relationships': relationships}, header + ''.join(remaining)
+
+
+def has_sections(text):
+    """判断文本中是否还有正文非空的【...】栏目
+
+    pre_extract 返回的剩余文本由标题（植物名）和未解析的栏目组成，所有栏目都已解析时只剩标题，
+    不需要再调用 LLM。没有栏目标记的文本返回 False，调用方需结合 pre_extract 是否有结果判断。
+    """
+    _, sections = split_sections(text)
+    for section in sections:
+        match = _HEADING_PATTERN.match(section)
+        if match and section[match.end():].strip():
+            return True
+    return False
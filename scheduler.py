@@ -0,0 +1,254 @@
+"""收敛感知的文档调度：先处理预计能带来新类型的文档，让类型词表尽早收敛
+
+收敛判断（utils.check_convergence）要求连续若干篇文档的类型集合与累计词表的 Jaccard 系数都达到阈值，
+收敛后不再调用 LLM 验证，新开始的文档改用严格模式抽取。按文件名顺序处理时，
+新类型分散在整个语料中，累计词表一直在变，收敛来得很晚；或者开头几篇恰好相似而过早收敛，
+之后出现的类型只能被塞进已有类型。
+
+调度只用本地信号估计每篇文档会带来哪些类型：文档中的【...】栏目标记，以及实体词表（lexicon.py）
+在文中标注出的已知实体的类型。排序分两段：
+    1. 探索：贪心集合覆盖，每次选覆盖最多未见特征的文档，直到所有特征都出现过；
+    2. 收敛：其余文档按特征集合与已见特征的 Jaccard 从高到低排列，相同时特征多的在前。
+这样新类型集中在运行开头由验证步骤处理，之后的文档与累计词表相似，连续达到阈值的轮数很快攒满。
+
+simulate 子命令用历史结果回放收敛过程，比较文件名顺序、随机顺序和调度顺序在收敛前
+需要处理（即需要验证调用）的文档数，以及切换时已发现的类型占全部类型的比例。
+
+用法: python scheduler.py simulate experments/deepseek1 experments/gemini2 [--threshold 0.6] [--window 10]
+      python scheduler.py order input_texts
+"""
+import argparse
+import os
+import random
+import re
+import time
+from config import logger, JACCARD_THRESHOLD, CONVERGENCE_ROUNDS, setup_logging
+from analytics import TypeVocabulary, ENTITY, RELATION, jaccard_bits, load_result_run, _popcount, _read_types
+from chunking import split_sections
+from lexicon import Lexicon, build_lexicon, get_lexicon
+
+_HEADING_PATTERN = re.compile(r'【([^】\n]{1,20})】')
+
+
+def document_features(text, lexicon=None):
+    """提取一篇文档的本地特征：栏目标记和词表标注出的实体类型
+
+    Args:
+        text (str): 文档正文
+        lexicon (Lexicon, optional): 实体词表，None 时只用栏目标记. Defaults to None.
+
+    Returns:
+        set: 特征字符串集合，栏目为“§栏目名”，实体类型为“#类型”
+    """
+    _, sections = split_sections(text)
+    features = set()
+    for section in sections:
+        match = _HEADING_PATTERN.match(section)
+        if match:
+            features.add(f"§{match.group(1)}")
+    if lexicon is not None:
+        features.update(f"#{annotation['type']}" for annotation in lexicon.annotate(text) if annotation['type'])
+    return features
+
+
+def plan_order(feature_bits):
+    """按特征位集排出处理顺序：先贪心覆盖所有特征，再按与已见特征的相似度从高到低
+
+    Args:
+        feature_bits (list): 每篇文档的特征位集
+
+    Returns:
+        tuple: (文档下标列表, 探索阶段的文档数)
+    """
+    remaining = set(range(len(feature_bits)))
+    order = []
+    seen = 0
+    while remaining:
+        best = max(remaining, key=lambda i: (_popcount(feature_bits[i] & ~seen), _popcount(feature_bits[i]), -i))
+        if not feature_bits[best] & ~seen:
+            break
+        order.append(best)
+        seen |= feature_bits[best]
+        remaining.discard(best)
+    explored = len(order)
+    while remaining:
+        best = max(remaining, key=lambda i: (jaccard_bits(feature_bits[i], seen), _popcount(feature_bits[i]), -i))
+        order.append(best)
+        seen |= feature_bits[best]
+        remaining.discard(best)
+    return order, explored
+
+
+def _read_text(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except (OSError, UnicodeDecodeError) as e:
+        logger.error(f"读取文件 {path} 失败: {str(e)}")
+        return ''
+
+
+def schedule(input_dir, filenames, lexicon=None):
+    """把待处理文件重新排序，使类型词表尽早收敛
+
+    Args:
+        input_dir (str): 输入目录路径
+        filenames (list): 待处理文件名
+        lexicon (Lexicon, optional): 实体词表. Defaults to None.
+
+    Returns:
+        list: 重新排序后的文件名
+    """
+    if len(filenames) < 2:
+        return list(filenames)
+    start = time.perf_counter()
+    vocab = TypeVocabulary()
+    feature_bits = [vocab.encode(document_features(_read_text(os.path.join(input_dir, filename)), lexicon))
+                    for filename in filenames]
+    order, explored = plan_order(feature_bits)
+    logger.info(f"文档调度: {len(filenames)} 个文件, {len(vocab.names)} 个特征, 前 {explored} 个用于探索新类型, "
+                f"耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+    return [filenames[i] for i in order]
+
+
+def replay(run, order, seed_entity=0, seed_relation=0, threshold=JACCARD_THRESHOLD, window=CONVERGENCE_ROUNDS):
+    """按给定顺序回放一次运行的收敛过程，判断方式与 update_type_files / check_convergence 一致
+
+    Args:
+        run (ExperimentRun): 历史运行记录
+        order (list): 文档下标的处理顺序
+        seed_entity (int, optional): 运行开始时实体类型文件中的类型位集. Defaults to 0.
+        seed_relation (int, optional): 运行开始时关系类型文件中的类型位集. Defaults to 0.
+        threshold (float, optional): Jaccard 阈值. Defaults to JACCARD_THRESHOLD.
+        window (int, optional): 连续收敛轮数. Defaults to CONVERGENCE_ROUNDS.
+
+    Returns:
+        tuple: (收敛前处理的文档数，未收敛时为全部文档数, 收敛时已发现的类型占运行全部类型的比例, 是否收敛)
+    """
+    seen_entity, seen_relation = seed_entity, seed_relation
+    total = run.vocabulary(ENTITY) | run.vocabulary(RELATION)
+    streak = 0
+    for count, i in enumerate(order, 1):
+        entity_bits, relation_bits = run.bits[ENTITY][i], run.bits[RELATION][i]
+        converged = (jaccard_bits(entity_bits, seen_entity) >= threshold
+                     and jaccard_bits(relation_bits, seen_relation) >= threshold)
+        seen_entity |= entity_bits
+        seen_relation |= relation_bits
+        streak = streak + 1 if converged else 0
+        if streak >= window:
+            found = (seen_entity | seen_relation) & total
+            return count, _popcount(found) / max(_popcount(total), 1), True
+    return len(order), 1.0, False
+
+
+def _find_text(input_dirs, filename):
+    for input_dir in input_dirs:
+        path = os.path.join(input_dir, filename)
+        if os.path.exists(path):
+            return _read_text(path)
+    return ''
+
+
+def simulate(result_dir, input_dirs, vocab, seeds=(0, 0), threshold=JACCARD_THRESHOLD, window=CONVERGENCE_ROUNDS,
+             lexicon=None, random_runs=20):
+    """用一次历史运行的结果比较三种处理顺序
+
+    Args:
+        result_dir (str): 历史结果目录（*_result.json）
+        input_dirs (list): 查找原文的目录
+        vocab (TypeVocabulary): 类型词表
+        seeds (tuple, optional): 运行开始时的 (实体类型位集, 关系类型位集). Defaults to (0, 0).
+        threshold (float, optional): Jaccard 阈值. Defaults to JACCARD_THRESHOLD.
+        window (int, optional): 连续收敛轮数. Defaults to CONVERGENCE_ROUNDS.
+        lexicon (Lexicon, optional): 调度使用的实体词表. Defaults to None.
+        random_runs (int, optional): 随机顺序的重复次数. Defaults to 20.
+
+    Returns:
+        dict: 各顺序的 (收敛前文档数, 类型发现比例, 是否收敛)，随机顺序为平均值；运行为空时返回 None
+    """
+    run = load_result_run(result_dir, vocab)
+    if not len(run):
+        return None
+    indices = list(range(len(run)))
+    features = TypeVocabulary()
+    feature_bits = [features.encode(document_features(_find_text(input_dirs, filename), lexicon))
+                    for filename in run.filenames]
+    order, _ = plan_order(feature_bits)
+    shuffled = [replay(run, random.Random(seed).sample(indices, len(indices)), *seeds, threshold, window)
+                for seed in range(random_runs)]
+    return {
+        'documents': len(run),
+        'name': replay(run, indices, *seeds, threshold, window),
+        'random': tuple(sum(outcome[k] for outcome in shuffled) / random_runs for k in range(3)),
+        'scheduled': replay(run, order, *seeds, threshold, window),
+    }
+
+
+def _format_outcome(outcome):
+    calls, found, converged = outcome
+    if not converged:
+        return "未收敛"
+    return f"{calls:g} 篇（已发现 {found:.0%} 类型）" if isinstance(converged, bool) else \
+        f"{calls:.1f} 篇（已发现 {found:.0%} 类型, 收敛概率 {converged:.0%}）"
+
+
+def main():
+    root = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="收敛感知的文档调度")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    simulate_parser = subparsers.add_parser('simulate', help="用历史结果回放收敛过程，比较不同处理顺序的验证调用数")
+    simulate_parser.add_argument('result_dirs', nargs='+', help="历史结果目录（*_result.json）")
+    simulate_parser.add_argument('--input-dir', nargs='+', default=[os.path.join(root, 'input_texts'),
+                                                                    os.path.join(root, 'data')],
+                                 help="查找原文的目录")
+    simulate_parser.add_argument('--entity-file', default=os.path.join(root, 'entity_types.txt'),
+                                 help="运行开始时的实体类型文件")
+    simulate_parser.add_argument('--relation-file', default=os.path.join(root, 'relation_types.txt'),
+                                 help="运行开始时的关系类型文件")
+    simulate_parser.add_argument('--threshold', type=float, default=JACCARD_THRESHOLD, help="收敛的 Jaccard 阈值")
+    simulate_parser.add_argument('--window', type=int, default=CONVERGENCE_ROUNDS, help="连续收敛轮数")
+    simulate_parser.add_argument('--random-runs', type=int, default=20, help="随机顺序的重复次数")
+    simulate_parser.add_argument('--lexicon-roots', nargs='*', default=[os.path.join(root, 'experments')],
+                                 help="构建词表的实验根目录，被回放的目录本身不计入；不指定时只用栏目标记")
+    order_parser = subparsers.add_parser('order', help="打印目录中文件的调度顺序")
+    order_parser.add_argument('input_dir', help="输入目录")
+    args = parser.parse_args()
+    setup_logging()
+
+    if args.command == 'order':
+        filenames = sorted(f for f in os.listdir(args.input_dir) if f.endswith('.txt'))
+        for filename in schedule(args.input_dir, filenames, get_lexicon()):
+            print(filename)
+        return
+
+    vocab = TypeVocabulary()
+    seeds = (vocab.encode(_read_types(args.entity_file)), vocab.encode(_read_types(args.relation_file)))
+    saved = 0
+    for result_dir in args.result_dirs:
+        start = time.perf_counter()
+        lexicon = None
+        if args.lexicon_roots:
+            # 词表不包含被回放的运行自身的结果，避免把答案泄露给调度
+            lexicon = Lexicon()
+            excluded = os.path.abspath(result_dir)
+            for lexicon_root in args.lexicon_roots:
+                for entry in sorted(os.listdir(lexicon_root)):
+                    path = os.path.join(lexicon_root, entry)
+                    if os.path.isdir(path) and os.path.abspath(path) != excluded:
+                        build_lexicon([path], lexicon)
+        outcome = simulate(result_dir, args.input_dir, vocab, seeds, args.threshold, args.window, lexicon,
+                           args.random_runs)
+        if outcome is None:
+            print(f"{result_dir}: 没有结果文件")
+            continue
+        print(f"{result_dir}: {outcome['documents']} 篇, 耗时 {time.perf_counter() - start:.1f} 秒")
+        print(f"  文件名顺序  {_format_outcome(outcome['name'])}")
+        print(f"  随机顺序    {_format_outcome(outcome['random'])}")
+        print(f"  调度顺序    {_format_outcome(outcome['scheduled'])}")
+        if outcome['name'][2] or outcome['scheduled'][2]:
+            saved += outcome['name'][0] - outcome['scheduled'][0]
+    print(f"\n阈值 {args.threshold}, 连续 {args.window} 轮: 调度顺序比文件名顺序共少 {saved:g} 次验证调用")
+
+
+if __name__ == "__main__":
+    main()
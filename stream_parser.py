@@ -0,0 +1,127 @@
+from config import logger
+
+# 字符串外出现非 ASCII 字符（如中文说明文字）时，输出已不可能修复为合法 JSON；
+# ASCII 字母仍允许出现，以兼容 true/false/null 和 fix_json_format 能修复的无引号键
+_WHITESPACE = set(' \t\r\n')
+
+
+class IncrementalJSONParser:
+    """增量 JSON 解析器：逐块接收流式输出，跟踪括号与字符串状态
+
+    - 顶层对象闭合后 done 为 True，调用方可立即停止流；
+    - 出现不可能构成合法 JSON 的内容（括号不匹配、对象外出现非法字符）时 failed 为 True。
+    第一个 '{' 之前的内容（如 ```json 代码块标记或说明文字）会被跳过。
+    """
+
+    def __init__(self, max_preamble=200):
+        """
+        Args:
+            max_preamble (int, optional): 第一个 '{' 之前允许的最多字符数. Defaults to 200.
+        """
+        self.max_preamble = max_preamble
+        self.text = ''
+        self.start = None
+        self.end = None
+        self.done = False
+        self.failed = False
+        self.error = None
+        self._pos = 0
+        self._stack = []  # 未闭合容器的左括号
+        self._quote = None
+        self._escape = False
+
+    def feed(self, chunk):
+        """接收一段输出
+
+        Args:
+            chunk (str): 流式返回的文本片段
+
+        Returns:
+            bool: 是否应该停止接收（已完成或已失败）
+        """
+        if self.done or self.failed:
+            return True
+        self.text += chunk
+        text = self.text
+        while self._pos < len(text):
+            self._step(text[self._pos])
+            self._pos += 1
+            if self.done or self.failed:
+                break
+        return self.done or self.failed
+
+    def _fail(self, reason):
+        self.failed = True
+        self.error = reason
+
+    def _step(self, c):
+        pos = self._pos
+        if self.start is None:
+            if c == '{':
+                self.start = pos
+                self._stack.append(c)
+            elif pos >= self.max_preamble:
+                self._fail("输出开头没有 JSON 对象")
+            return
+
+        if self._quote:
+            if self._escape:
+                self._escape = False
+            elif c == '\\':
+                self._escape = True
+            elif c == self._quote:
+                self._quote = None
+            return
+
+        if c == '"' or c == "'":
+            # 单引号字符串由 fix_json_format 修复，这里同样按字符串处理
+            self._quote = c
+        elif c == '{' or c == '[':
+            self._stack.append(c)
+        elif c == '}' or c == ']':
+            if self._stack[-1] != ('{' if c == '}' else '['):
+                self._fail(f"括号不匹配: {c}")
+                return
+            self._stack.pop()
+            if not self._stack:
+                self.end = pos + 1
+                self.done = True
+        elif c == ':':
+            if self._stack[-1] != '{':
+                self._fail("数组中出现冒号")
+        elif c not in _WHITESPACE and not c.isascii():
+            self._fail(f"字符串外出现非法字符: {c}")
+
+    def result(self):
+        """返回目前为止的完整 JSON 文本（仅在 done 时有意义）"""
+        if self.done:
+            return self.text[self.start:self.end]
+        return self.text
+
+
+def collect_stream(stream):
+    """读取流式对话补全，顶层对象闭合后立即关闭流，内容无法构成合法 JSON 时提前终止
+
+    Args:
+        stream: client.chat.completions.create(stream=True) 的返回值
+
+    Returns:
+        str: 截取到顶层对象结尾的文本；提前终止时返回 None
+    """
+    parser = IncrementalJSONParser()
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta and parser.feed(delta):
+                break
+    finally:
+        close = getattr(stream, 'close', None)
+        if close:
+            close()
+
+    if parser.failed:
+        logger.error(f"流式输出无法构成合法JSON，已提前终止: {parser.error}")
+        return None
+    return parser.result().strip()
@@ -0,0 +1,5 @@
+"""测试共用配置：模块都放在仓库根目录，把根目录加入导入路径"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
@@ -0,0 +1,45 @@
+"""收敛分析的测试"""
+import json
+
+from analytics import (TypeVocabulary, ENTITY, ExperimentRun, convergence_curve, jaccard_bits, load_result_run,
+                       summarize, type_drift)
+from utils import calculate_jaccard
+
+
+def test_bitset_jaccard_matches_sets():
+    vocab = TypeVocabulary()
+    a, b = vocab.encode(['科', '属']), vocab.encode(['属', '疾病'])
+    assert jaccard_bits(a, b) == calculate_jaccard({'科', '属'}, {'属', '疾病'})
+    assert jaccard_bits(0, 0) == 1.0
+    assert sorted(vocab.decode(a | b)) == sorted(['科', '属', '疾病'])
+
+
+def test_convergence_curve_starts_from_seed():
+    vocab = TypeVocabulary()
+    run = ExperimentRun('run', 'source')
+    for types in (['科', '属'], ['科', '属'], ['科', '属', '疾病'], ['科', '属']):
+        run.add('x.txt', vocab.encode(types), 0)
+
+    curve, converged_at = convergence_curve(run, ENTITY, window=2, threshold=0.6)
+    assert curve == [0.0, 1.0, 2 / 3, 2 / 3]
+    assert converged_at == 3
+
+    # 类型文件中已有这些类型时，第一篇就与词表一致
+    seed = vocab.encode(['科', '属', '疾病'])
+    curve, converged_at = convergence_curve(run, ENTITY, window=2, threshold=0.6, seed=seed)
+    assert curve == [2 / 3, 2 / 3, 1.0, 2 / 3]
+    assert converged_at == 2
+    assert summarize([run], vocab, 2, 0.6, {ENTITY: seed})[0]['entity_converged_at'] == 2
+    assert type_drift(run, ENTITY, window=2) == [2, 1]
+
+
+def test_load_result_run_in_filename_order(tmp_path):
+    for name, entity_type in (('b', '属'), ('a', '科')):
+        (tmp_path / f'{name}_result.json').write_text(json.dumps(
+            {'entities': [{'entity': name, 'type': entity_type}], 'relationships': []}, ensure_ascii=False),
+            encoding='utf-8')
+    (tmp_path / 'c_result.json').write_text('not json', encoding='utf-8')
+    vocab = TypeVocabulary()
+    run = load_result_run(str(tmp_path), vocab)
+    assert run.filenames == ['a.txt', 'b.txt']
+    assert [vocab.decode(bits) for bits in run.bits[ENTITY]] == [['科'], ['属']]
@@ -0,0 +1,67 @@
+"""批处理离线流水线的测试"""
+import json
+
+import pytest
+
+import batch_pipeline
+from config import NORMALIZATION_CONFIG, entity_jaccard_history
+from kg_store import get_kg_store
+from prompt import VALIDATION_SYSTEM
+
+EXTRACTED = {
+    'entities': [{'entity': '一叶萩', 'type': '药用植物'}, {'entity': '风湿', 'type': '病症'}],
+    'relationships': [{'head': '一叶萩', 'predicate': '治疗', 'tail': '风湿'}],
+}
+MAPPING = {'merged entity type mapping': {'病症': '疾病'}, 'merged relation mapping': {}}
+
+
+def _responder(body):
+    if body['messages'][0]['content'] == VALIDATION_SYSTEM:
+        return json.dumps(MAPPING, ensure_ascii=False)
+    return json.dumps(EXTRACTED, ensure_ascii=False)
+
+
+@pytest.mark.parametrize('normalize', [False, True])
+def test_two_stage_batch_keeps_entities(tmp_path, monkeypatch, normalize):
+    monkeypatch.setitem(NORMALIZATION_CONFIG, 'enabled', normalize)
+    input_dir, output_dir = tmp_path / 'input', tmp_path / 'output'
+    input_dir.mkdir()
+    for name in ('a', 'b'):
+        (input_dir / f'{name}.txt').write_text('一叶萩【功效主治】祛风活血，治风湿。', encoding='utf-8')
+    entity_file, relation_file = str(tmp_path / 'entity_types.txt'), str(tmp_path / 'relation_types.txt')
+    (tmp_path / 'entity_types.txt').write_text('药用植物\n疾病\n', encoding='utf-8')
+    (tmp_path / 'relation_types.txt').write_text('治疗\n', encoding='utf-8')
+    files = {name: str(tmp_path / f'{name}.jsonl') for name in
+             ('extraction_requests', 'extraction_results', 'validation_requests', 'validation_results')}
+
+    batch_pipeline.render_extraction_requests(str(input_dir), entity_file, relation_file,
+                                              files['extraction_requests'])
+    batch_pipeline.run_local_batch(files['extraction_requests'], files['extraction_results'], _responder)
+    batch_pipeline.ingest_batch_results(files['extraction_requests'], files['extraction_results'], str(input_dir),
+                                        entity_file, relation_file, str(output_dir), 'batch', finalize=False)
+    extracted = batch_pipeline.load_batch_results(files['extraction_results'], 'extraction')
+    batch_pipeline.render_validation_requests(str(input_dir), extracted, entity_file, relation_file,
+                                              files['validation_requests'])
+    batch_pipeline.run_local_batch(files['validation_requests'], files['validation_results'], _responder)
+    results = batch_pipeline.ingest_batch_results(files['validation_requests'], files['validation_results'],
+                                                  str(input_dir), entity_file, relation_file, str(output_dir),
+                                                  'batch', stage='validation',
+                                                  extraction_file=files['extraction_results'])
+
+    assert sorted(results) == ['a.txt', 'b.txt']
+    store = get_kg_store(str(output_dir))
+    for document in ('a', 'b'):
+        saved = store.result('results_batch', document)
+        assert {entity['entity'] for entity in saved['entities']} == {'一叶萩', '风湿'}
+        assert saved['relationships'] == EXTRACTED['relationships']
+        if not normalize:
+            # 每篇文档都发出了验证请求，映射已应用到抽取结果
+            assert {entity['type'] for entity in saved['entities']} == {'药用植物', '疾病'}
+    # 收敛历史记录的是合并后的类型集合，而不是映射字典中的空集合
+    assert list(entity_jaccard_history)[-1] > 0
+
+
+def test_validation_ingest_requires_extraction_results(tmp_path):
+    with pytest.raises(ValueError):
+        batch_pipeline.ingest_batch_results('requests.jsonl', 'results.jsonl', str(tmp_path), 'entity_types.txt',
+                                            'relation_types.txt', str(tmp_path), 'batch', stage='validation')
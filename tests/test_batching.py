@@ -0,0 +1,27 @@
+"""短文档批量抽取的测试"""
+import json
+from batching import estimate_tokens, plan_batches, split_batch_response
+
+
+def test_estimate_tokens():
+    assert estimate_tokens('一叶萩') == 3
+    assert estimate_tokens('abcdefgh') == 2
+    assert estimate_tokens('一叶萩 abc') == 4
+
+
+def test_plan_batches_respects_budget_and_order(tmp_path):
+    sizes = {'a.txt': 30, 'b.txt': 30, 'c.txt': 50, 'd.txt': 200, 'e.txt': 10, 'f.txt': 10, 'g.txt': 10}
+    for name, size in sizes.items():
+        (tmp_path / name).write_text('萩' * size, encoding='utf-8')
+    names = list(sizes)
+    # 超过 max_doc_tokens 的文档单独成组，其余按预算和文档数上限分组
+    assert plan_batches(str(tmp_path), names, 80, max_docs=2, max_doc_tokens=100) == [
+        ['a.txt', 'b.txt'], ['c.txt'], ['d.txt'], ['e.txt', 'f.txt'], ['g.txt']]
+    assert plan_batches(str(tmp_path), names, 0) == [[name] for name in names]
+
+
+def test_split_batch_response_drops_missing_documents():
+    response = json.dumps({'doc1': {'entities': [], 'relationships': []}, 'doc2': {'relationships': []}})
+    assert split_batch_response(response, ['doc1', 'doc2', 'doc3']) == {'doc1': {'entities': [], 'relationships': []}}
+    assert split_batch_response('不是 JSON', ['doc1']) == {}
+    assert split_batch_response('[]', ['doc1']) == {}
@@ -0,0 +1,71 @@
+"""长文档分块抽取的测试"""
+import json
+import threading
+import time
+
+import main
+from batching import estimate_tokens
+from chunking import split_document, split_sections
+from config import CHUNK_CONFIG
+
+HEADER = "一叶萩"
+SECTIONS = ["【科属归类】大戟科黑面神属。", "【形态特征】灌木。" + "叶互生，椭圆形。" * 20, "【功效主治】祛风活血，治风湿。"]
+TEXT = HEADER + ''.join(SECTIONS)
+
+
+def test_split_sections():
+    assert split_sections(TEXT) == (HEADER, SECTIONS)
+    assert split_sections("没有栏目") == ('', ["没有栏目"])
+
+
+def test_split_document_keeps_header_and_heading():
+    assert split_document(TEXT, None) == [TEXT]
+    chunks = split_document(TEXT, 60)
+    assert len(chunks) > 2
+    assert all(chunk.startswith(HEADER) for chunk in chunks)
+    assert all(estimate_tokens(chunk) <= 60 + estimate_tokens(HEADER) for chunk in chunks)
+    # 过长的栏目按句子切开，后续块重复栏目标记，拼接后不丢内容
+    continued = [chunk for chunk in chunks if '叶互生' in chunk]
+    assert len(continued) > 1 and all('【形态特征】' in chunk for chunk in continued)
+    body = ''.join(chunk[len(HEADER):] for chunk in chunks)
+    assert body.replace('【形态特征】', '') == ''.join(SECTIONS).replace('【形态特征】', '')
+
+
+def test_chunks_merge_and_share_request_slots(tmp_path, monkeypatch):
+    monkeypatch.setitem(CHUNK_CONFIG, 'max_tokens', 60)
+    monkeypatch.setitem(CHUNK_CONFIG, 'max_workers', 4)
+    filenames = []
+    for i in range(4):
+        filename = f'{HEADER}{i}.txt'
+        (tmp_path / filename).write_text(TEXT, encoding='utf-8')
+        filenames.append(filename)
+
+    lock = threading.Lock()
+    in_flight, peak = [0], [0]
+
+    def fake_api(prompt, **kwargs):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+        chunk = prompt.split('输入文本：\n')[1]
+        # 每块都抽到植物本身，治风湿只出现在最后一块
+        entities = [{'entity': HEADER, 'type': '药用植物'}]
+        relationships = []
+        if '风湿' in chunk:
+            entities.append({'entity': '风湿', 'type': '疾病'})
+            relationships.append({'head': HEADER, 'predicate': '治疗', 'tail': '风湿'})
+        return json.dumps({'entities': entities, 'relationships': relationships}, ensure_ascii=False)
+
+    monkeypatch.setattr(main, 'call_openai_api', fake_api)
+    documents = list(main._iter_documents(str(tmp_path), filenames, 'entity_types.txt', 'relation_types.txt',
+                                          enable_validation=False, max_workers=2))
+    assert peak[0] <= 2
+    for _, document in documents:
+        assert len(document['extractions']) > 1
+        result = document['extracted_json']
+        assert [entity['entity'] for entity in result['entities']].count(HEADER) == 1
+        assert {'head': HEADER, 'predicate': '治疗', 'tail': '风湿'} in result['relationships']
+    assert main._request_slots is None
@@ -0,0 +1,8 @@
+"""并发工具的测试"""
+from concurrency import ordered_map
+
+
+def test_ordered_map_keeps_none_items():
+    items = [1, None, 2, None, 3]
+    for max_workers in (1, 2, 4):
+        assert list(ordered_map(lambda item: item, items, max_workers)) == [(item, item) for item in items]
@@ -0,0 +1,47 @@
+"""对话日志的测试"""
+import glob
+import json
+import os
+from conversation_log import ConversationLog, read_conversations, find_conversation, convert_log_dir, TEMPLATE_FILE
+
+TEMPLATE = '请从文本中抽取实体和关系。\n实体类型列表：药用植物、疾病\n'
+
+
+def _prompt(name):
+    return f'{TEMPLATE}输入文本：\n{name}，祛风除湿。'
+
+
+def test_round_trip_stores_each_template_once(tmp_path):
+    log_dir = str(tmp_path / 'conversation_logs_1')
+    log = ConversationLog(log_dir, max_segment_bytes=1, batch_size=1)
+    for name in ('一叶萩', '白饭树', '叶底珠'):
+        log.write(_prompt(name), f'{{"entities": [{{"entity": "{name}"}}]}}', f'{name}.txt', 'extraction',
+                  system='你是一名数据标注专家')
+    log.write('当前抽取结果：{}', '{}', '一叶萩.txt', 'validation')
+    log.close()
+
+    conversations = list(read_conversations(log_dir))
+    assert [conversation['prompt'] for conversation in conversations[:3]] == [
+        _prompt(name) for name in ('一叶萩', '白饭树', '叶底珠')]
+    assert conversations[0]['system'] == '你是一名数据标注专家'
+    assert conversations[3]['system'] is None and conversations[3]['stage'] == 'validation'
+    # system 消息和模板各存一次，分段超过上限后换新文件
+    with open(os.path.join(log_dir, TEMPLATE_FILE), 'r', encoding='utf-8') as f:
+        assert len(f.readlines()) == 2
+    assert len(glob.glob(os.path.join(log_dir, 'conversations_*.jsonl.gz'))) > 1
+    assert find_conversation(log_dir, '一叶萩')['stage'] == 'validation'
+    assert find_conversation(log_dir, '一叶萩', 'extraction')['prompt'] == _prompt('一叶萩')
+    assert find_conversation(log_dir, '不存在') is None
+
+
+def test_convert_legacy_log_dir(tmp_path):
+    log_dir = tmp_path / 'conversation_logs_2'
+    log_dir.mkdir()
+    legacy = {'timestamp': '2025-01-01 00:00:00', 'input_file': '一叶萩.txt', 'stage': 'extraction',
+              'system': None, 'prompt': _prompt('一叶萩'), 'response': '{}'}
+    (log_dir / '一叶萩_conversation.json').write_text(json.dumps(legacy, ensure_ascii=False), encoding='utf-8')
+    assert list(read_conversations(str(log_dir))) == [legacy]
+    assert convert_log_dir(str(log_dir), remove=True) == 1
+    assert not list(log_dir.glob('*_conversation.json'))
+    assert list(read_conversations(str(log_dir))) == [legacy]
+    assert convert_log_dir(str(log_dir)) == 0
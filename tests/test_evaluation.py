@@ -0,0 +1,37 @@
+"""抽取结果评测的测试"""
+import json
+import os
+import pytest
+from evaluation import evaluate, prf
+
+
+def _write(path, entities, triples):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    result = {'entities': [{'entity': entity, 'type': entity_type} for entity, entity_type in entities],
+              'relationships': [{'head': head, 'predicate': predicate, 'tail': tail} for head, predicate, tail in triples]}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False)
+
+
+def test_prf_handles_empty_denominators():
+    assert prf(0, 0, 0) == (0.0, 0.0, 0.0)
+    assert prf(1, 2, 4) == pytest.approx((0.5, 0.25, 1 / 3))
+
+
+def test_exact_and_fuzzy_scores(tmp_path):
+    gold_dir = tmp_path / 'gold'
+    _write(str(gold_dir / '一叶萩_result.json'), [('一叶萩', '药用植物'), ('叶底珠', '别名')],
+           [('一叶萩', '别名', '叶底珠')])
+    _write(str(gold_dir / '白饭树_result.json'), [('白饭树', '药用植物')], [])
+    _write(str(tmp_path / 'runs' / 'model' / '一叶萩_result.json'),
+           [('一叶萩', '植物'), ('叶底珠', '别名'), ('白饭树', '药用植物')], [(' 一叶萩', '别名', '叶底珠 ')])
+
+    rows = evaluate(str(gold_dir), [str(tmp_path / 'runs')], max_workers=1)
+    assert len(rows) == 1
+    row = rows[0]
+    # 只统计运行中产出的金标准文档
+    assert (row['run'], row['documents'], row['coverage']) == (os.path.join('runs', 'model'), 1, 0.5)
+    # exact 要求类型一致，fuzzy 只比较实体名
+    assert (row['entity_exact_p'], row['entity_exact_r']) == pytest.approx((1 / 3, 1 / 2))
+    assert (row['entity_fuzzy_p'], row['entity_fuzzy_r']) == pytest.approx((2 / 3, 1.0))
+    assert row['relation_exact_f1'] == row['relation_fuzzy_f1'] == 1.0
@@ -0,0 +1,55 @@
+"""多模型结果融合的测试"""
+import json
+from fusion import fuse_results, fuse_directories, MAJORITY, WEIGHTED, UNION
+
+
+def _result(entities, triples=()):
+    return {'entities': [{'entity': entity, 'type': entity_type} for entity, entity_type in entities],
+            'relationships': [{'head': head, 'predicate': predicate, 'tail': tail} for head, predicate, tail in triples]}
+
+
+RESULTS = [
+    _result([('一叶萩', '药用植物'), ('叶底珠', '别名')], [('一叶萩', '别名', '叶底珠')]),
+    _result([('一叶萩 ', '植物'), ('一叶萩碱', '化合物')], [('一叶萩', '别名', ' 叶底珠')]),
+    _result([('一叶萩', '药用植物')], [('一叶萩', '含有', '一叶萩碱')]),
+]
+
+
+def test_majority_vote_on_normalized_keys():
+    fused, voters = fuse_results(RESULTS, strategy=MAJORITY)
+    assert voters == 3
+    # 空白不同的写法归为同一个键，类型取得票最多者
+    assert fused['entities'] == [{'entity': '一叶萩', 'type': '药用植物'}]
+    assert fused['relationships'] == [{'head': '一叶萩', 'predicate': '别名', 'tail': '叶底珠'}]
+
+
+def test_weights_and_missing_models():
+    fused, voters = fuse_results([RESULTS[0], None, RESULTS[2]], weights=[1, 5, 3], strategy=WEIGHTED,
+                                 min_support=0.5)
+    assert voters == 2
+    assert {item['entity'] for item in fused['entities']} == {'一叶萩'}
+    assert [item['predicate'] for item in fused['relationships']] == ['含有']
+    fused, _ = fuse_results(RESULTS, strategy=UNION)
+    assert len(fused['entities']) == 3 and len(fused['relationships']) == 2
+
+
+def test_old_relations_schema_is_accepted():
+    old = {'entities': [], 'relations': [{'head': '一叶萩', 'relation': '别名', 'tail': '叶底珠'}]}
+    # 旧格式的关系也计票，与第一个模型一起构成多数
+    fused, _ = fuse_results([old, RESULTS[0], RESULTS[2]], strategy=MAJORITY)
+    assert fused['relationships'] == [{'head': '一叶萩', 'predicate': '别名', 'tail': '叶底珠'}]
+
+
+def test_fuse_directories(tmp_path):
+    inputs = []
+    for index, result in enumerate(RESULTS):
+        input_dir = tmp_path / f'model{index}'
+        input_dir.mkdir()
+        (input_dir / '一叶萩_result.json').write_text(json.dumps(result, ensure_ascii=False), encoding='utf-8')
+        inputs.append(str(input_dir))
+    (tmp_path / 'model0' / '白饭树_result.json').write_text(json.dumps(_result([('白饭树', '药用植物')])),
+                                                          encoding='utf-8')
+    summary = fuse_directories(inputs, str(tmp_path / 'fused'), max_workers=1)
+    assert summary == {'plants': 2, 'entities': 2, 'relationships': 1}
+    fused = json.loads((tmp_path / 'fused' / '一叶萩_result.json').read_text(encoding='utf-8'))
+    assert fused == fuse_results(RESULTS)[0]
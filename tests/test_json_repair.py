@@ -0,0 +1,78 @@
+"""JSON 修复的测试"""
+import json
+
+from json_repair import repair_json
+
+RESULT = {'entities': [{'entity': '一叶萩', 'type': '药用植物'}, {'entity': '风湿', 'type': '疾病'}],
+          'relationships': [{'head': '一叶萩', 'predicate': '治疗', 'tail': '风湿'}]}
+PRETTY = json.dumps(RESULT, ensure_ascii=False, indent=2)
+
+
+def _repair(text):
+    fixed, repairs = repair_json(text)
+    assert fixed is not None, repairs
+    return json.loads(fixed), repairs
+
+
+def test_valid_json_is_returned_unchanged():
+    assert repair_json(PRETTY) == (PRETTY, [])
+    assert repair_json(None) == (None, [])
+
+
+def test_code_fence_and_prose():
+    assert _repair(f"```json\n{PRETTY}\n```") == (RESULT, ['strip_fence', 'strip_suffix'])
+    assert _repair(f"以下是抽取结果：\n{PRETTY}\n希望对你有帮助。") == (RESULT, ['strip_prefix', 'strip_suffix'])
+
+
+def test_truncated_output_keeps_complete_items():
+    text = PRETTY[:PRETTY.index('{', PRETTY.index('风湿'))]
+    result, repairs = _repair(text)
+    assert result['entities'] == RESULT['entities']
+    assert 'truncated' in repairs
+
+    # 截断在实体对象内部时丢弃这个不完整的对象
+    result, repairs = _repair(PRETTY[:PRETTY.index('疾病')])
+    assert result['entities'] == RESULT['entities'][:1]
+    assert 'truncated' in repairs
+
+
+def test_single_quotes_keep_apostrophes():
+    assert _repair(PRETTY.replace('"', "'")) == (RESULT, ['single_quotes'])
+    result, repairs = _repair("{'entities': [{'entity': \"St John's wort\", 'type': '药用植物'}]}")
+    assert result['entities'][0]['entity'] == "St John's wort"
+    assert 'single_quotes' in repairs
+
+
+def test_trailing_commas_outside_strings_only():
+    text = PRETTY.replace('"药用植物"\n', '"药用植物",\n').replace('}\n  ]', '},\n  ]')
+    assert _repair(text) == (RESULT, ['trailing_comma'])
+    result, _ = _repair('{"entities": [{"entity": "a, }", "type": "b",}], }')
+    assert result == {'entities': [{'entity': 'a, }', 'type': 'b'}]}
+
+
+def test_missing_commas_and_colons():
+    result, repairs = _repair('{"entities": [{"entity": "一叶萩" "type": "药用植物"} {"entity": "风湿", "type" "疾病"}]}')
+    assert result == {'entities': RESULT['entities']}
+    assert {'missing_comma', 'missing_colon'} <= set(repairs)
+
+
+def test_mismatched_brackets():
+    result, repairs = _repair('{"entities": [{"entity": "一叶萩", "type": "药用植物"}}')
+    assert result == {'entities': RESULT['entities'][:1]}
+    assert 'balance_brackets' in repairs
+
+
+def test_comments_and_python_literals():
+    result, repairs = _repair('{\n  // 抽取结果\n  "entities": [],\n  "done": True\n}')
+    assert result == {'entities': [], 'done': True}
+    assert {'strip_comment', 'python_literal'} <= set(repairs)
+
+
+def test_dangling_key_and_unquoted_key():
+    result, repairs = _repair('{"entities": [{"entity": "一叶萩", "type": }], relationships: []}')
+    assert result == {'entities': [{'entity': '一叶萩'}], 'relationships': []}
+    assert {'drop_dangling_key', 'quote_key'} <= set(repairs)
+
+
+def test_prose_without_json_fails():
+    assert repair_json("抱歉，这段文本中没有可以抽取的实体。")[0] is None
@@ -0,0 +1,61 @@
+"""知识图谱存储的测试"""
+import json
+from kg_store import KnowledgeGraphStore, import_result_dir
+
+YIYEQIU = {
+    'entities': [{'entity': '一叶萩', 'type': '药用植物'}, {'entity': '风湿痹痛', 'type': '疾病'}],
+    'relationships': [{'head': '一叶萩', 'predicate': '治疗', 'tail': '风湿痹痛'},
+                      {'head': '一叶萩', 'predicate': '别名', 'tail': '叶底珠'}],
+}
+BAIFANSHU = {
+    'entities': [{'entity': '白饭树', 'type': '药用植物'}, {'entity': '风湿痹痛', 'type': '症状'}],
+    'relationships': [{'head': '白饭树', 'predicate': '治疗', 'tail': '风湿痹痛'}],
+}
+
+
+def _sorted(result):
+    return {key: sorted(items, key=lambda item: json.dumps(item, ensure_ascii=False)) for key, items in result.items()}
+
+
+def test_round_trip_and_queries(tmp_path):
+    store = KnowledgeGraphStore(str(tmp_path / 'kg.sqlite'))
+    store.add_result('gemini1', '一叶萩', YIYEQIU)
+    store.add_result('gemini1', '白饭树', BAIFANSHU)
+    store.add_result('deepseek1', '白饭树', {'entities': [], 'relationships': []})
+
+    assert _sorted(store.result('gemini1', '一叶萩')) == _sorted(YIYEQIU)
+    assert store.result('gemini1', '叶底珠') is None
+    assert store.runs() == ['deepseek1', 'gemini1']
+    assert store.documents('gemini1') == ['一叶萩', '白饭树']
+    assert store.heads('治疗', '风湿痹痛') == ['一叶萩', '白饭树']
+    assert store.heads('治疗', '风湿痹痛', run='deepseek1') == []
+    assert store.heads('治疗', '不存在') == []
+    assert store.tails('一叶萩') == [('别名', '叶底珠'), ('治疗', '风湿痹痛')]
+    assert store.tails('一叶萩', predicate='别名') == [('别名', '叶底珠')]
+    assert store.entity_types('风湿痹痛') == {'疾病': 1, '症状': 1}
+    store.close()
+
+
+def test_rewriting_a_document_replaces_it(tmp_path):
+    path = str(tmp_path / 'kg.sqlite')
+    store = KnowledgeGraphStore(path)
+    store.add_result('gemini1', '一叶萩', YIYEQIU)
+    store.add_result('gemini1', '一叶萩', BAIFANSHU)
+    assert _sorted(store.result('gemini1', '一叶萩')) == _sorted(BAIFANSHU)
+    assert store.stats()['triples'] == 1
+    store.close()
+    # 重新打开后数据仍在
+    store = KnowledgeGraphStore(path)
+    assert store.heads('治疗', '风湿痹痛') == ['白饭树']
+    store.close()
+
+
+def test_import_result_dir(tmp_path):
+    result_dir = tmp_path / 'gemini1'
+    result_dir.mkdir()
+    (result_dir / '一叶萩_result.json').write_text(json.dumps(YIYEQIU, ensure_ascii=False), encoding='utf-8')
+    (result_dir / '坏文件_result.json').write_text('{"entities": [', encoding='utf-8')
+    store = KnowledgeGraphStore(str(tmp_path / 'kg.sqlite'))
+    assert import_result_dir(store, str(result_dir)) == 1
+    assert store.documents('gemini1') == ['一叶萩']
+    store.close()
@@ -0,0 +1,47 @@
+"""实体词表与 Aho-Corasick 自动机的测试"""
+import lexicon
+from lexicon import AhoCorasick, Lexicon
+
+
+def test_overlapping_matches_follow_failure_links():
+    automaton = AhoCorasick(['he', 'she', 'his', 'hers'])
+    assert len(automaton) == 4
+    # "she" 结束处经输出链同时报告 "he"，"hers" 需要从 "she" 沿失败链转到 "he" 再继续
+    assert list(automaton.iter_matches('ushers')) == [(1, 4, 'she'), (2, 4, 'he'), (2, 6, 'hers')]
+    assert list(automaton.iter_matches('ahishe')) == [(1, 4, 'his'), (3, 6, 'she'), (4, 6, 'he')]
+    assert list(automaton.iter_matches('xyz')) == []
+
+
+def test_annotate_prefers_leftmost_longest():
+    words = Lexicon(min_count=1, min_length=1)
+    words.add_result({'entities': [{'entity': '一叶萩', 'type': '药用植物'}, {'entity': '叶萩碱', 'type': '化合物'},
+                                   {'entity': '一叶萩碱', 'type': '化合物'}]})
+    annotations = words.annotate('含一叶萩碱。')
+    assert [(item['entity'], item['type'], item['start'], item['end']) for item in annotations] == [
+        ('一叶萩碱', '化合物', 1, 5)]
+
+
+def test_zero_thresholds_are_not_replaced_by_defaults(monkeypatch):
+    monkeypatch.setitem(lexicon.LEXICON_CONFIG, 'min_count', 3)
+    monkeypatch.setitem(lexicon.LEXICON_CONFIG, 'min_length', 2)
+    words = Lexicon(min_count=0, min_length=0)
+    assert (words.min_count, words.min_length) == (0, 0)
+    assert (Lexicon().min_count, Lexicon().min_length) == (3, 2)
+
+
+def test_delta_words_are_promoted_to_base(monkeypatch):
+    monkeypatch.setattr(lexicon, '_DELTA_LIMIT', 2)
+    words = Lexicon(min_count=2, min_length=2)
+    result = {'entities': [{'entity': '一叶萩', 'type': '药用植物'}, {'entity': '白饭树', 'type': '药用植物'}]}
+    assert words.add_result(result) == 0
+    assert words.add_result(result) == 2
+    # 新词先进入增量自动机，主自动机不变
+    assert words._base_words == set() and words._delta_words == {'一叶萩', '白饭树'}
+    assert [item['entity'] for item in words.annotate('一叶萩与白饭树')] == ['一叶萩', '白饭树']
+    more = {'entities': [{'entity': '叶底珠', 'type': '药用植物'}]}
+    words.add_result(more)
+    assert words.add_result(more) == 1
+    # 增量词数超过上限后合并重建到主自动机
+    assert words._base_words == {'一叶萩', '白饭树', '叶底珠'} and words._delta_words == set()
+    assert words.matchable() == 3
+    assert [item['entity'] for item in words.annotate('叶底珠即一叶萩')] == ['叶底珠', '一叶萩']
@@ -0,0 +1,70 @@
+"""多后端路由的测试"""
+import threading
+import time
+
+import pytest
+
+from llm_router import Backend, LLMRouter
+
+
+class FakeBackend(Backend):
+    def __init__(self, name, responses=None, max_concurrency=4, delay=0.0):
+        super().__init__(name, f'{name}-model', max_concurrency)
+        self.responses = list(responses or [])
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def complete(self, messages, temperature, max_tokens):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            response = self.responses.pop(0) if self.responses else '{}'
+            if isinstance(response, Exception):
+                raise response
+            return response
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        Backend('base', 'model')
+
+
+def test_failover_on_error_and_aborted_stream():
+    for failure in (RuntimeError('timeout'), None):
+        broken, healthy = FakeBackend('broken', [failure]), FakeBackend('healthy', ['{"entities": []}'])
+        router = LLMRouter([broken, healthy])
+        assert router.complete([], 0.0, 100) == ('{"entities": []}', 'healthy-model')
+        assert broken.calls == 1
+        stats = router.stats()
+        assert stats['broken']['errors'] == 1 and stats['healthy']['errors'] == 0
+        # 出错的后端进入冷却期，下一次请求优先选其他后端
+        router.complete([], 0.0, 100)
+        assert broken.calls == 1 and healthy.calls == 2
+
+
+def test_all_backends_failing_raises():
+    router = LLMRouter([FakeBackend('a', [None]), FakeBackend('b', [RuntimeError('down')])])
+    with pytest.raises(RuntimeError):
+        router.complete([], 0.0, 100)
+
+
+def test_concurrency_cap_per_backend():
+    backends = [FakeBackend('a', max_concurrency=1, delay=0.02), FakeBackend('b', max_concurrency=2, delay=0.02)]
+    router = LLMRouter(backends)
+    threads = [threading.Thread(target=router.complete, args=([], 0.0, 100)) for _ in range(9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert backends[0].peak <= 1 and backends[1].peak <= 2
+    assert sum(backend.calls for backend in backends) == 9
+    assert all(state['in_flight'] == 0 for state in router.stats().values())
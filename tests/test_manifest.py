@@ -0,0 +1,39 @@
+"""运行清单的测试"""
+from manifest import RunManifest, content_hash, PENDING, SAVED, FAILED
+
+
+def test_resume_skips_saved_files_with_unchanged_content(tmp_path):
+    input_dir = tmp_path / 'input'
+    input_dir.mkdir()
+    for name in ('一叶萩.txt', '白饭树.txt', '叶底珠.txt'):
+        (input_dir / name).write_text(f'{name} 祛风除湿\n', encoding='utf-8')
+    files = sorted(path.name for path in input_dir.iterdir())
+    path = str(tmp_path / 'manifest.jsonl')
+
+    manifest = RunManifest(path)
+    assert manifest.pending(str(input_dir), files) == files
+    assert manifest.summary() == {PENDING: 3}
+    manifest.mark('一叶萩.txt', SAVED, content_hash('一叶萩.txt 祛风除湿'))
+    manifest.mark('白饭树.txt', SAVED, content_hash('白饭树.txt 祛风除湿'))
+    manifest.mark('叶底珠.txt', FAILED, error='超时')
+    # 模拟崩溃时留下的半行
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"file": "叶底')
+
+    (input_dir / '白饭树.txt').write_text('白饭树 已修改', encoding='utf-8')
+    resumed = RunManifest(path)
+    assert resumed.timestamp == manifest.timestamp
+    assert resumed.completed() == ['一叶萩.txt', '白饭树.txt']
+    assert resumed.failed() == ['叶底珠.txt']
+    # 已保存但内容变化的文件和失败的文件都需要重跑
+    assert resumed.pending(str(input_dir), files) == ['叶底珠.txt', '白饭树.txt']
+    resumed.mark('叶底珠.txt', FAILED, error='超时')
+    assert resumed.entries['叶底珠.txt']['attempts'] == 2
+
+
+def test_fresh_run_discards_old_manifest(tmp_path):
+    path = str(tmp_path / 'manifest.jsonl')
+    manifest = RunManifest(path)
+    manifest.mark('一叶萩.txt', SAVED, 'digest')
+    fresh = RunManifest(path, resume=False)
+    assert fresh.entries == {} and fresh.completed() == []
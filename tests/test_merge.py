@@ -0,0 +1,52 @@
+"""规则结果与 LLM 结果合并的测试"""
+from fusion import fuse_results, normalize_schema, UNION
+from main import _merge_results
+from prompt import STRICT_EXTRACTION_SYSTEM
+from rule_extractor import pre_extract
+
+TEXT = "一叶萩【科属归类】大戟科黑面神属【药用部位】以嫩枝叶或根入药。中药名:叶底珠。【功效主治】祛风活血。"
+
+# 旧版严格模式 prompt 的输出格式
+LEGACY_STRICT = {
+    'entities': [{'entity': '一叶萩', 'type': '药用植物'}, {'entity': '风湿', 'type': '疾病'}],
+    'relations': [{'head': '一叶萩', 'relation': '治疗', 'tail': '风湿'}],
+}
+
+STRICT = {
+    'entities': [{'entity': '一叶萩', 'type': '药用植物'}, {'entity': '风湿', 'type': '疾病'}],
+    'relationships': [{'head': '一叶萩', 'predicate': '治疗', 'tail': '风湿'}],
+}
+
+
+def test_strict_prompt_uses_shared_schema():
+    assert '"relationships"' in STRICT_EXTRACTION_SYSTEM
+    assert '"predicate"' in STRICT_EXTRACTION_SYSTEM
+    assert '"relations"' not in STRICT_EXTRACTION_SYSTEM
+
+
+def test_normalize_schema():
+    result = normalize_schema(LEGACY_STRICT)
+    assert 'relations' not in result
+    assert result['relationships'] == [{'head': '一叶萩', 'relation': '治疗', 'predicate': '治疗', 'tail': '风湿'}]
+    assert normalize_schema(STRICT) is STRICT
+
+
+def test_merge_keeps_strict_relations():
+    rule_json, _ = pre_extract(TEXT)
+    for strict_json in (STRICT, LEGACY_STRICT):
+        merged = _merge_results(rule_json, None, strict_json)
+        triples = {(r['head'], r['predicate'], r['tail']) for r in merged['relationships']}
+        assert ('一叶萩', '治疗', '风湿') in triples
+        assert ('一叶萩', '属于科', '大戟科') in triples
+        fused, voters = fuse_results([rule_json, None, strict_json], strategy=UNION)
+        assert voters == 2
+        assert ('一叶萩', '治疗', '风湿') in {(r['head'], r['predicate'], r['tail']) for r in fused['relationships']}
+
+
+def test_earlier_result_type_wins():
+    rule_json = {'entities': [{'entity': '黑面神属', 'type': '属'}], 'relationships': []}
+    later = {'entities': [{'entity': '黑面神属', 'type': '药用植物'}], 'relationships': []}
+    merged = _merge_results(rule_json, later, dict(later))
+    assert merged['entities'] == [{'entity': '黑面神属', 'type': '属'}]
+    merged = _merge_results(None, later, {'entities': [{'entity': '黑面神属', 'type': '科'}]})
+    assert merged['entities'] == [{'entity': '黑面神属', 'type': '药用植物'}]
@@ -0,0 +1,47 @@
+"""LLM 响应缓存的测试"""
+from response_cache import ResponseCache, make_cache_key
+
+
+def _key(text):
+    return make_cache_key('model', [{'role': 'user', 'content': text}], 0.0, 100)
+
+
+def test_hit_and_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    assert cache.get(_key('a')) is None
+    cache.put(_key('a'), '{"entities": []}')
+    assert cache.get(_key('a')) == '{"entities": []}'
+    assert cache.get_any([_key('b'), _key('a')]) == '{"entities": []}'
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 1, 1)
+    assert _key('a') != make_cache_key('model', [{'role': 'user', 'content': 'a'}], 0.7, 100)
+
+
+def test_lru_eviction_keeps_running_totals(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), max_bytes=25)
+    for name in ('a', 'b'):
+        cache.put(_key(name), name * 10)
+    # 让 b 成为最久未访问的条目，避免依赖时钟精度
+    cache._conn.execute('UPDATE responses SET last_access = 0 WHERE key = ?', (_key('b'),))
+    cache.put(_key('a'), 'a' * 10)
+    cache.put(_key('c'), 'c' * 10)
+    assert cache.get(_key('b')) is None
+    assert cache.get(_key('a')) == 'a' * 10
+    assert cache.get(_key('c')) == 'c' * 10
+    assert (cache._entries, cache._bytes) == (2, 20)
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes']) == (2, 20)
+
+    # 重新打开时从表中恢复计数
+    reopened = ResponseCache(str(tmp_path / 'cache.sqlite'), max_bytes=25)
+    assert (reopened._entries, reopened._bytes) == (2, 20)
+
+
+def test_replay_is_read_only(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    ResponseCache(path).put(_key('a'), 'cached')
+    replay = ResponseCache(path, read_only=True)
+    replay.put(_key('b'), 'new')
+    assert replay.get(_key('a')) == 'cached'
+    assert replay.get(_key('b')) is None
+    assert replay.stats()['entries'] == 1
@@ -0,0 +1,70 @@
+"""重试与退避的测试"""
+import types
+import pytest
+import retry
+from retry import backoff_delay, retry_after, call_with_retry
+
+
+class FakeLimiter:
+    def __init__(self):
+        self.acquired = []
+        self.paused = []
+
+    def acquire(self, tokens):
+        self.acquired.append(tokens)
+        return 0
+
+    def pause(self, seconds):
+        self.paused.append(seconds)
+
+
+def _sender(outcomes):
+    """依次返回或抛出 outcomes 中的元素"""
+    def send():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    return send
+
+
+def _error(headers):
+    return types.SimpleNamespace(response=types.SimpleNamespace(headers=headers))
+
+
+def test_retry_after_and_backoff(monkeypatch):
+    assert retry_after(_error({'retry-after-ms': '1500'})) == 1.5
+    assert retry_after(_error({'retry-after': '3'})) == 3.0
+    assert retry_after(_error({'retry-after': 'Thu, 01 Jan 1970 00:00:00 GMT'})) == 0.0
+    assert retry_after(_error({})) is None
+    assert retry_after(ValueError()) is None
+    monkeypatch.setattr(retry.random, 'uniform', lambda low, high: high)
+    monkeypatch.setitem(retry.RETRY_CONFIG, 'base_delay', 1.0)
+    monkeypatch.setitem(retry.RETRY_CONFIG, 'max_delay', 10.0)
+    assert [backoff_delay(attempt) for attempt in range(5)] == [1.0, 2.0, 4.0, 8.0, 10.0]
+
+
+def test_retries_transient_errors_and_pauses_on_rate_limit(monkeypatch):
+    openai = pytest.importorskip('openai')
+    httpx = pytest.importorskip('httpx')
+    request = httpx.Request('POST', 'https://example.invalid/v1/chat/completions')
+    rate_limited = openai.RateLimitError(
+        'rate limited', response=httpx.Response(429, request=request, headers={'retry-after': '2'}), body=None)
+    bad_request = openai.BadRequestError('bad request', response=httpx.Response(400, request=request), body=None)
+    sleeps = []
+    monkeypatch.setattr(retry.time, 'sleep', sleeps.append)
+    monkeypatch.setitem(retry.RETRY_CONFIG, 'max_attempts', 3)
+
+    limiter = FakeLimiter()
+    assert call_with_retry(_sender([rate_limited, openai.APITimeoutError(request), 'ok']), limiter, tokens=100) == 'ok'
+    assert limiter.acquired == [100, 100, 100]
+    # 429 按 Retry-After 暂停整个端点
+    assert len(limiter.paused) == 1 and 2 <= limiter.paused[0] <= 2 + retry.RETRY_CONFIG['base_delay']
+    assert len(sleeps) == 2
+
+    # 不可重试的错误和用尽次数的错误直接抛出
+    with pytest.raises(openai.BadRequestError):
+        call_with_retry(_sender([bad_request]))
+    with pytest.raises(openai.APITimeoutError):
+        call_with_retry(_sender([openai.APITimeoutError(request)] * 3))
+    assert len(sleeps) == 4
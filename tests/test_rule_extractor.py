@@ -0,0 +1,38 @@
+"""规则预抽取的测试"""
+import main
+from rule_extractor import has_sections, pre_extract
+
+CONSUMED = "一叶萩【科属归类】大戟科黑面神属【药用部位】以嫩枝叶或根入药。中药名:一叶萩。"
+
+
+def test_has_sections():
+    assert not has_sections('')
+    assert not has_sections('abc')
+    assert not has_sections('一叶萩')
+    assert not has_sections('一叶萩【功效主治】  ')
+    assert has_sections('一叶萩【功效主治】祛风活血。')
+
+
+def test_material_named_after_plant_keeps_plant_type():
+    result, remainder = pre_extract(CONSUMED)
+    assert remainder == '一叶萩'
+    assert [item['type'] for item in result['entities'] if item['entity'] == '一叶萩'] == ['药用植物']
+    assert {'head': '一叶萩', 'predicate': '药材', 'tail': '一叶萩'} in result['relationships']
+
+
+def test_fully_consumed_document_skips_llm(tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("所有栏目都已由规则抽取，不应调用 LLM")
+
+    monkeypatch.setattr(main, 'call_openai_api', fail)
+    for name in ('一叶萩 Yiyeqiu.txt', '一品红 Yipinhong.txt'):
+        (tmp_path / name).write_text(CONSUMED.replace('一叶萩', name.split()[0]), encoding='utf-8')
+
+    document = main._extract_document(str(tmp_path / '一叶萩 Yiyeqiu.txt'), 'entity_types.txt',
+                                      'relation_types.txt', enable_validation=False)
+    assert document['extractions'] == []
+    assert {'head': '一叶萩', 'predicate': '属于科', 'tail': '大戟科'} in document['extracted_json']['relationships']
+
+    documents = main._extract_batch(str(tmp_path), ['一叶萩 Yiyeqiu.txt', '一品红 Yipinhong.txt'],
+                                    'entity_types.txt', 'relation_types.txt', enable_validation=False)
+    assert [document['extractions'] for document in documents] == [[], []]
@@ -0,0 +1,71 @@
+"""收敛感知调度和收敛后自动切换严格模式的测试"""
+import json
+import main
+from config import entity_jaccard_history, relation_jaccard_history, CONVERGENCE_ROUNDS
+from file_operations import update_type_files
+from prompt import STRICT_EXTRACTION_SYSTEM
+from scheduler import plan_order
+from utils import check_convergence
+
+# 与测试文档产生的类型完全一致，收敛后每篇文档的 Jaccard 都应保持 1.0
+ENTITY_TYPES = ['药用植物', '科', '属', '疾病']
+RELATION_TYPES = ['属于科', '属于属', '治疗']
+
+
+def test_plan_order_explores_new_features_first():
+    order, explored = plan_order([0b001, 0b011, 0b111, 0b001])
+    assert order[0] == 2
+    assert explored == 1
+    assert sorted(order) == [0, 1, 2, 3]
+
+
+def test_auto_strict_keeps_llm_relations(tmp_path, monkeypatch):
+    entity_file, relation_file = tmp_path / 'entity_types.txt', tmp_path / 'relation_types.txt'
+    entity_file.write_text('\n'.join(ENTITY_TYPES), encoding='utf-8')
+    relation_file.write_text('\n'.join(RELATION_TYPES), encoding='utf-8')
+    filenames = []
+    for name, family, genus in (('一叶萩', '大戟科', '黑面神属'), ('一品红', '大戟科', '大戟属'),
+                                ('丁香', '桃金娘科', '蒲桃属')):
+        filename = f'{name}.txt'
+        (tmp_path / filename).write_text(f"{name}【科属归类】{family}{genus}【功效主治】治风湿。", encoding='utf-8')
+        filenames.append(filename)
+
+    strict_calls = []
+
+    def fake_api(prompt, **kwargs):
+        strict_calls.append(prompt.system == STRICT_EXTRACTION_SYSTEM)
+        plant = prompt.split('输入文本：\n')[1].split('【')[0]
+        # 模型按 system 消息中的示例格式输出
+        relation = {'head': plant, 'predicate': '治疗', 'tail': '风湿'}
+        result = {'entities': [{'entity': plant, 'type': '药用植物'}, {'entity': '风湿', 'type': '疾病'}]}
+        if '"relations"' in prompt.system:
+            result['relations'] = [{'head': plant, 'relation': '治疗', 'tail': '风湿'}]
+        else:
+            result['relationships'] = [relation]
+        return json.dumps(result, ensure_ascii=False)
+
+    monkeypatch.setattr(main, 'call_openai_api', fake_api)
+    saved_history = list(entity_jaccard_history), list(relation_jaccard_history)
+    try:
+        # 已经收敛：连续 CONVERGENCE_ROUNDS 轮的 Jaccard 都是 1.0
+        for history in (entity_jaccard_history, relation_jaccard_history):
+            history.clear()
+            history.extend([1.0] * CONVERGENCE_ROUNDS)
+        assert check_convergence()
+
+        documents = main._iter_documents(str(tmp_path), filenames, str(entity_file), str(relation_file),
+                                         enable_validation=False, auto_strict=True)
+        for filename, document in documents:
+            result = document['validated_json']
+            triples = {(r['head'], r['predicate'], r['tail']) for r in result['relationships']}
+            plant = filename[:-len('.txt')]
+            assert (plant, '治疗', '风湿') in triples
+            assert (plant, '属于科') in {(head, predicate) for head, predicate, _ in triples}
+            entity_jaccard, relation_jaccard = update_type_files(result, str(entity_file), str(relation_file))
+            assert (entity_jaccard, relation_jaccard) == (1.0, 1.0)
+            assert check_convergence()
+        assert strict_calls == [True] * len(filenames)
+    finally:
+        for history, values in zip((entity_jaccard_history, relation_jaccard_history), saved_history):
+            history.clear()
+            history.extend(values)
@@ -0,0 +1,59 @@
+"""流式 JSON 解析的测试"""
+from types import SimpleNamespace
+
+from stream_parser import IncrementalJSONParser, collect_stream
+
+# 字符串中包含括号、转义引号和以反斜杠结尾的内容，括号计数必须跳过它们
+DOCUMENT = ('{"entities": [{"entity": "一叶萩 {别名] \\"叶底珠\\"", "type": "药用植物\\\\"}],'
+            ' "relationships": [[], {"head": "a", "predicate": "b", "tail": "c"}]}')
+
+
+def _feed(chunks):
+    parser = IncrementalJSONParser()
+    for chunk in chunks:
+        if parser.feed(chunk):
+            break
+    return parser
+
+
+def test_every_split_point():
+    text = "```json\n" + DOCUMENT + "\n```"
+    for i in range(len(text) + 1):
+        parser = _feed([text[:i], text[i:]])
+        assert parser.done and not parser.failed, i
+        assert parser.result() == DOCUMENT
+
+
+def test_one_character_chunks():
+    parser = _feed(list(DOCUMENT + '\n多余的说明'))
+    assert parser.done
+    assert parser.result() == DOCUMENT
+
+
+def test_incomplete_and_invalid_streams():
+    parser = _feed([DOCUMENT[:-1]])
+    assert not parser.done and not parser.failed
+
+    parser = _feed(['{"entities": [}'])
+    assert parser.failed and '括号不匹配' in parser.error
+
+    parser = _feed(['{"a": 1,', ' 说明'])
+    assert parser.failed
+
+    parser = _feed(['抱歉' * 200])
+    assert parser.failed
+
+
+def test_collect_stream_stops_and_closes():
+    closed = []
+
+    class Stream:
+        def __iter__(self):
+            for piece in (DOCUMENT[:10], DOCUMENT[10:], '\n以上是结果', 'never read'):
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+        def close(self):
+            closed.append(True)
+
+    assert collect_stream(Stream()) == DOCUMENT
+    assert closed == [True]
@@ -0,0 +1,41 @@
+"""本地类型归一的测试"""
+import json
+import threading
+from api import fix_json_format
+from prompt import VALIDATION_SYSTEM
+from type_normalizer import TypeNormalizer, KNOWN, merge_validation
+from type_registry import TypeRegistry
+
+
+def test_stats_are_not_lost_across_threads(tmp_path):
+    entity_file, relation_file = tmp_path / 'entity_types.txt', tmp_path / 'relation_types.txt'
+    entity_file.write_text('药用植物\n疾病\n', encoding='utf-8')
+    relation_file.write_text('治疗\n', encoding='utf-8')
+    normalizer = TypeNormalizer(TypeRegistry(str(entity_file), str(relation_file)), str(tmp_path / 'aliases.json'))
+    result = {'entities': [{'entity': '一叶萩', 'type': '药用植物'}, {'entity': '风湿', 'type': '疾病'}],
+              'relationships': [{'head': '一叶萩', 'predicate': '治疗', 'tail': '风湿'}]}
+
+    def worker():
+        for _ in range(200):
+            normalizer.normalize(result)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert normalizer.stats['documents'] == 1600
+    assert normalizer.stats[KNOWN] == 1600 * 3
+
+
+def test_empty_validation_mapping_keeps_result(tmp_path):
+    assert '空字符串' not in VALIDATION_SYSTEM
+    entity_file, relation_file = tmp_path / 'entity_types.txt', tmp_path / 'relation_types.txt'
+    entity_file.write_text('药用植物\n', encoding='utf-8')
+    relation_file.write_text('治疗\n', encoding='utf-8')
+    normalizer = TypeNormalizer(TypeRegistry(str(entity_file), str(relation_file)), str(tmp_path / 'aliases.json'))
+    extracted = {'entities': [{'entity': '一叶萩', 'type': '药用植物'}], 'relationships': []}
+    # 没有需要合并的类型时，验证结果是空映射而不是空字符串
+    validated = json.loads(fix_json_format('{"merged entity type mapping": {}, "merged relation mapping": {}}'))
+    assert normalizer.apply_validation(normalizer.normalize(extracted), validated) == extracted
+    assert merge_validation(extracted, validated) == extracted
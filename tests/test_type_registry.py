@@ -0,0 +1,22 @@
+"""类型词表的测试"""
+from type_registry import TypeRegistry
+
+
+def test_snapshot_merges_types_from_other_processes(tmp_path):
+    entity_file, relation_file = tmp_path / 'entity_types.txt', tmp_path / 'relation_types.txt'
+    entity_file.write_text('科\n', encoding='utf-8')
+    relation_file.write_text('属于科\n', encoding='utf-8')
+
+    # 两个实例模拟两个进程共享同一对类型文件
+    first = TypeRegistry(str(entity_file), str(relation_file))
+    second = TypeRegistry(str(entity_file), str(relation_file))
+    first.add({'疾病'}, {'治疗'})
+    second.add({'药材'}, set())
+    first.snapshot()
+    second.add({'化学成分'}, {'含有'})
+    second.snapshot()
+
+    assert entity_file.read_text(encoding='utf-8').split() == sorted(['科', '疾病', '药材', '化学成分'])
+    assert relation_file.read_text(encoding='utf-8').split() == sorted(['属于科', '治疗', '含有'])
+    assert set(second.entity_types()) == {'科', '疾病', '药材', '化学成分'}
+    assert TypeRegistry(str(entity_file), str(relation_file)).relation_types() == sorted(['属于科', '治疗', '含有'])
@@ -0,0 +1,22 @@
+"""用量统计导出的测试"""
+from usage_tracker import UsageTracker, load_records
+
+
+def _record(filename):
+    return {'stage': 'extraction', 'files': [filename], 'model': 'test', 'completions': 1, 'cached': False,
+            'prompt_tokens': 10, 'completion_tokens': 5, 'latency': 0.1, 'cost': None, 'repair': None}
+
+
+def test_resumed_run_appends_usage(tmp_path):
+    tracker = UsageTracker()
+    tracker.records.append(_record('a.txt'))
+    assert tracker.export(str(tmp_path), '20250101_000000')['calls'] == 1
+
+    # 续跑沿用同一个时间戳
+    tracker.records.append(_record('b.txt'))
+    assert tracker.export(str(tmp_path), '20250101_000000')['calls'] == 2
+
+    records = load_records(str(tmp_path / 'usage_20250101_000000.jsonl'))
+    assert [record['files'] for record in records] == [['a.txt'], ['b.txt']]
+    prom = (tmp_path / 'usage_20250101_000000.prom').read_text(encoding='utf-8')
+    assert 'llm_calls_total{run="20250101_000000",stage="extraction"} 2' in prom
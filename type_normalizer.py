@@ -0,0 +1,309 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from config import logger, NORMALIZATION_CONFIG
+from type_registry import get_type_registry, ENTITY, RELATION
+
+# 类型名中与语义无关的字符（空白、标点）
+_NOISE_PATTERN = re.compile(r'[\s,，、;；:：.。()（）\[\]【】"\'“”‘’]+')
+
+# (类型种类, 抽取结果中的数组键, 类型字段)
+_SECTIONS = ((ENTITY, 'entities', 'type'), (RELATION, 'relationships', 'predicate'))
+
+# 判定结果
+KNOWN, ALIAS, MERGE, NEW, AMBIGUOUS = 'known', 'alias', 'merge', 'new', 'ambiguous'
+
+
+def clean_type_name(name):
+    """去掉类型名中的空白和标点"""
+    return _NOISE_PATTERN.sub('', str(name))
+
+
+def char_ngrams(text, max_n=3):
+    """字符 1~max_n gram 计数向量"""
+    grams = Counter()
+    for n in range(1, max_n + 1):
+        for i in range(len(text) - n + 1):
+            grams[text[i:i + n]] += 1
+    return grams
+
+
+class NgramIndex:
+    """字符 n-gram 向量的最近邻索引：倒排表召回候选，再按余弦相似度排序"""
+
+    def __init__(self, names, max_n=3):
+        """
+        Args:
+            names (list): 被索引的类型名
+            max_n (int, optional): 最大 n-gram 长度. Defaults to 3.
+        """
+        self.max_n = max_n
+        self._vectors = {}
+        self._norms = {}
+        self._postings = {}
+        for name in names:
+            vector = char_ngrams(name, max_n)
+            self._vectors[name] = vector
+            self._norms[name] = math.sqrt(sum(v * v for v in vector.values()))
+            for gram in vector:
+                self._postings.setdefault(gram, []).append(name)
+
+    def __contains__(self, name):
+        return name in self._vectors
+
+    def nearest(self, name, k=2):
+        """返回与 name 最相似的 k 个类型
+
+        Args:
+            name (str): 查询的类型名
+            k (int, optional): 返回的候选数. Defaults to 2.
+
+        Returns:
+            list: (相似度, 类型名) 元组列表，按相似度降序，相似度相同时按类型名排序
+        """
+        query = char_ngrams(name, self.max_n)
+        query_norm = math.sqrt(sum(v * v for v in query.values()))
+        if not query_norm:
+            return []
+        dots = Counter()
+        for gram, weight in query.items():
+            for candidate in self._postings.get(gram, ()):
+                dots[candidate] += weight * self._vectors[candidate][gram]
+        scored = [(dot / (query_norm * self._norms[candidate]), candidate) for candidate, dot in dots.items()]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return scored[:k]
+
+
+class TypeNormalizer:
+    """本地类型归一引擎，代替验证阶段逐文档的 LLM 调用
+
+    对抽取结果中的每个实体类型/关系类型：
+    - 已在词表或别名表中：直接使用；
+    - 与词表中最近的类型足够相似且明显优于次近邻：确定性地合并到该类型；
+    - 与所有类型都不相似：作为新类型保留；
+    - 介于两者之间：判为歧义，交给 LLM 验证，LLM 的决定写入别名表，之后不再询问。
+    相同的词表和别名表总是得到相同的结果，类型收敛过程可复现。
+    """
+
+    def __init__(self, registry, alias_file, merge_threshold=0.7, new_type_threshold=0.4, margin=0.15):
+        """
+        Args:
+            registry (TypeRegistry): 类型词表
+            alias_file (str): 别名表 JSON 文件路径
+            merge_threshold (float, optional): 自动合并所需的最低相似度. Defaults to 0.7.
+            new_type_threshold (float, optional): 低于该相似度视为新类型. Defaults to 0.4.
+            margin (float, optional): 自动合并时最近邻需领先次近邻的相似度. Defaults to 0.15.
+        """
+        self.registry = registry
+        self.alias_file = alias_file
+        self.merge_threshold = merge_threshold
+        self.new_type_threshold = new_type_threshold
+        self.margin = margin
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._index_version = None
+        self._aliases = {ENTITY: {}, RELATION: {}}
+        if os.path.exists(alias_file):
+            with open(alias_file, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            for kind in self._aliases:
+                self._aliases[kind].update(stored.get(kind, {}))
+
+    def _vocabulary(self, kind):
+        return self.registry.entity_types() if kind == ENTITY else self.registry.relation_types()
+
+    def _index(self, kind):
+        """词表版本变化时重建索引"""
+        if self._index_version != self.registry.version:
+            self._indexes = {k: NgramIndex(self._vocabulary(k)) for k in (ENTITY, RELATION)}
+            self._index_version = self.registry.version
+        return self._indexes[kind]
+
+    def resolve(self, kind, type_name):
+        """判定单个类型的归一结果
+
+        Args:
+            kind (str): 'entity' 或 'relation'
+            type_name (str): 抽取结果中的类型名
+
+        Returns:
+            tuple: (判定结果, 归一后的类型名, 候选列表)；歧义时归一后的类型名为原类型名
+        """
+        with self._lock:
+            cleaned = clean_type_name(type_name) or type_name
+            alias = self._aliases[kind].get(cleaned)
+            if alias is not None:
+                return ALIAS, alias, []
+            index = self._index(kind)
+            if cleaned in index:
+                return KNOWN, cleaned, []
+            candidates = index.nearest(cleaned)
+            best_score, best = candidates[0] if candidates else (0.0, None)
+            second_score = candidates[1][0] if len(candidates) > 1 else 0.0
+            if best_score >= self.merge_threshold and best_score - second_score >= self.margin:
+                return MERGE, best, candidates
+            if best_score < self.new_type_threshold:
+                return NEW, cleaned, candidates
+            return AMBIGUOUS, cleaned, candidates
+
+    def normalize(self, extracted_json):
+        """归一抽取结果中的实体类型和关系类型
+
+        Args:
+            extracted_json (dict): 抽取结果，包含 entities / relationships
+
+        Returns:
+            dict: {'json': 归一后的抽取结果,
+                   'mapping': {'entity': {原类型: 新类型}, 'relation': {...}},
+                   'ambiguous': {'entity': {类型: 候选列表}, 'relation': {...}}}
+        """
+        mapping = {ENTITY: {}, RELATION: {}}
+        ambiguous = {ENTITY: {}, RELATION: {}}
+        stats = Counter()
+        for kind, key, field in _SECTIONS:
+            names = {item[field] for item in extracted_json.get(key, [])
+                     if isinstance(item, dict) and isinstance(item.get(field), str) and item[field]}
+            for name in sorted(names):
+                decision, target, candidates = self.resolve(kind, name)
+                stats[decision] += 1
+                if decision == AMBIGUOUS:
+                    ambiguous[kind][target] = [candidate for _, candidate in candidates]
+                if target != name:
+                    mapping[kind][name] = target
+
+        normalized = apply_type_mapping(extracted_json, mapping)
+        stats['documents'] += 1
+        if any(ambiguous.values()):
+            stats['llm_fallbacks'] += 1
+        # normalize 在多个工作线程中同时调用，统计在锁内合并
+        with self._lock:
+            self.stats.update(stats)
+        return {'json': normalized, 'mapping': mapping, 'ambiguous': ambiguous}
+
+    def learn(self, kind, mapping):
+        """把 LLM 对歧义类型的判定写入别名表，之后同样的类型直接按别名处理
+
+        Args:
+            kind (str): 'entity' 或 'relation'
+            mapping (dict): 类型名 -> 归一后的类型名（保持原样也要记录）
+        """
+        if not mapping:
+            return
+        with self._lock:
+            for name, target in mapping.items():
+                self._aliases[kind][clean_type_name(name) or name] = target
+            tmp_file = f"{self.alias_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._aliases, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_file, self.alias_file)
+        logger.info(f"记录 {len(mapping)} 个{'实体' if kind == ENTITY else '关系'}类型别名: {mapping}")
+
+    def apply_validation(self, normalization, validated_json):
+        """合并 LLM 验证结果，并把歧义类型的判定写入别名表
+
+        验证结果可以是类型映射格式（merged entity type mapping / merged relation mapping），
+        也可以是修正后的完整抽取结果（entities / relationships）。
+
+        Args:
+            normalization (dict): normalize 的返回值
+            validated_json (dict): LLM 验证结果
+
+        Returns:
+            dict: 最终的抽取结果
+        """
+        if 'entities' in validated_json or 'relationships' in validated_json:
+            return validated_json
+        llm_mapping = validation_mapping(validated_json)
+        for kind in (ENTITY, RELATION):
+            # LLM 没有合并的歧义类型按新类型记录，同样不再重复询问
+            decisions = {name: llm_mapping[kind].get(name, name) for name in normalization['ambiguous'][kind]}
+            self.learn(kind, decisions)
+        return apply_type_mapping(normalization['json'], llm_mapping)
+
+
+def validation_mapping(validated_json):
+    """从类型映射格式的验证结果中取出类型映射
+
+    Args:
+        validated_json (dict): LLM 验证结果（merged entity type mapping / merged relation mapping）
+
+    Returns:
+        dict: {'entity': {原类型: 新类型}, 'relation': {...}}，缺失或格式无效的部分为空字典
+    """
+    mapping = {
+        ENTITY: validated_json.get('merged entity type mapping') or {},
+        RELATION: validated_json.get('merged relation mapping') or {},
+    }
+    return {kind: kind_mapping if isinstance(kind_mapping, dict) else {} for kind, kind_mapping in mapping.items()}
+
+
+def merge_validation(extracted_json, validated_json):
+    """不经过类型归一引擎时，把验证结果合并到抽取结果
+
+    Args:
+        extracted_json (dict): 抽取结果
+        validated_json (dict): LLM 验证结果，类型映射或修正后的完整抽取结果
+
+    Returns:
+        dict: 最终的抽取结果
+    """
+    if 'entities' in validated_json or 'relationships' in validated_json:
+        return validated_json
+    return apply_type_mapping(extracted_json, validation_mapping(validated_json))
+
+
+def apply_type_mapping(extracted_json, mapping):
+    """按类型映射改写抽取结果，返回新的字典
+
+    Args:
+        extracted_json (dict): 抽取结果
+        mapping (dict): {'entity': {原类型: 新类型}, 'relation': {...}}
+
+    Returns:
+        dict: 改写后的抽取结果
+    """
+    result = dict(extracted_json)
+    for kind, key, field in _SECTIONS:
+        kind_mapping = mapping.get(kind) or {}
+        if key not in result or not kind_mapping:
+            continue
+        result[key] = [
+            {**item, field: kind_mapping.get(item.get(field), item.get(field))} if isinstance(item, dict) else item
+            for item in result[key]
+        ]
+    return result
+
+
+_normalizers = {}
+_normalizers_lock = threading.Lock()
+
+
+def get_type_normalizer(entity_file, relation_file):
+    """获取某对类型文件共享的类型归一引擎，NORMALIZATION_CONFIG['enabled'] 为 False 时返回 None
+
+    Args:
+        entity_file (str): 实体类型文件路径
+        relation_file (str): 关系类型文件路径
+
+    Returns:
+        TypeNormalizer: 共享的类型归一引擎
+    """
+    if not NORMALIZATION_CONFIG['enabled']:
+        return None
+    key = (os.path.abspath(entity_file), os.path.abspath(relation_file))
+    with _normalizers_lock:
+        normalizer = _normalizers.get(key)
+        if normalizer is None:
+            normalizer = TypeNormalizer(
+                get_type_registry(entity_file, relation_file),
+                f"{entity_file}.aliases.json",
+                merge_threshold=NORMALIZATION_CONFIG['merge_threshold'],
+                new_type_threshold=NORMALIZATION_CONFIG['new_type_threshold'],
+                margin=NORMALIZATION_CONFIG['margin'],
+            )
+            _normalizers[key] = normalizer
+        return normalizer
@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from config import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+ENTITY = 'entity'
+RELATION = 'relation'
+
+
+class TypeRegistry:
+    """内存中的实体类型/关系类型词表
+
+    新增类型先追加写入日志文件（<entity_file>.journal），每累计 snapshot_every 次新增
+    再以原子替换的方式把完整词表写回 entity_types.txt / relation_types.txt。
+    启动时读取 txt 文件并回放日志，因此两次快照之间崩溃也不会丢失类型。
+    所有方法都是线程安全的，可在多个工作线程之间共享。多个进程使用同一对类型文件时，
+    日志追加和快照都在文件锁（<entity_file>.lock）内进行，快照先合并磁盘上的类型文件和日志中
+    其他进程新增的类型再写回，不会丢失彼此的类型；但每个进程内存中的类型列表只在快照时才会看到其他进程的新类型。
+    """
+
+    def __init__(self, entity_file, relation_file, snapshot_every=20):
+        """
+        Args:
+            entity_file (str): 实体类型文件路径
+            relation_file (str): 关系类型文件路径
+            snapshot_every (int, optional): 每新增多少个类型写一次快照. Defaults to 20.
+        """
+        self.entity_file = entity_file
+        self.relation_file = relation_file
+        self.journal_file = f"{entity_file}.journal"
+        self.lock_file = f"{entity_file}.lock"
+        self.snapshot_every = snapshot_every
+        self.version = 0
+        self._pending = 0
+        self._lock = threading.RLock()
+        self._types = {
+            ENTITY: _read_type_file(entity_file),
+            RELATION: _read_type_file(relation_file),
+        }
+        self._replay_journal()
+
+    def _replay_journal(self):
+        with _file_lock(self.lock_file):
+            replayed = self._merge(_read_journal(self.journal_file))
+        if replayed:
+            logger.info(f"从类型日志恢复 {replayed} 个未写入快照的类型")
+            self._pending = replayed
+            self.snapshot()
+
+    def _merge(self, records):
+        """把 (类型种类, 类型名) 中内存词表没有的类型追加在末尾，返回新增数"""
+        merged = 0
+        for kind, type_name in records:
+            if type_name not in self._types[kind]:
+                self._types[kind].append(type_name)
+                merged += 1
+        return merged
+
+    def entity_types(self):
+        """返回当前实体类型列表（副本）"""
+        with self._lock:
+            return list(self._types[ENTITY])
+
+    def relation_types(self):
+        """返回当前关系类型列表（副本）"""
+        with self._lock:
+            return list(self._types[RELATION])
+
+    def add(self, entity_types, relation_types):
+        """合并新类型，返回合并前的类型集合
+
+        Args:
+            entity_types (set): 新的实体类型
+            relation_types (set): 新的关系类型
+
+        Returns:
+            tuple: (合并前的实体类型集合, 合并前的关系类型集合)
+        """
+        with self._lock:
+            existing_entity_types = set(self._types[ENTITY])
+            existing_relation_types = set(self._types[RELATION])
+            records = [{'kind': ENTITY, 'type': t} for t in sorted(entity_types - existing_entity_types)]
+            records += [{'kind': RELATION, 'type': t} for t in sorted(relation_types - existing_relation_types)]
+            if records:
+                with _file_lock(self.lock_file), open(self.journal_file, 'a', encoding='utf-8') as f:
+                    for record in records:
+                        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                # 新类型追加在末尾而不是重新排序，Prompt 中已有的类型列表前缀保持不变
+                for record in records:
+                    self._types[record['kind']].append(record['type'])
+                self.version += 1
+                self._pending += len(records)
+                if self._pending >= self.snapshot_every:
+                    self.snapshot()
+            return existing_entity_types, existing_relation_types
+
+    def snapshot(self):
+        """在文件锁内合并磁盘上的类型（其他进程的快照和日志），再将完整词表原子写回类型文件并清空日志"""
+        with self._lock:
+            if not self._pending:
+                return
+            with _file_lock(self.lock_file):
+                on_disk = [(ENTITY, t) for t in _read_type_file(self.entity_file)]
+                on_disk += [(RELATION, t) for t in _read_type_file(self.relation_file)]
+                merged = self._merge(on_disk + _read_journal(self.journal_file))
+                if merged:
+                    self.version += 1
+                    logger.info(f"合并其他进程新增的 {merged} 个类型")
+                _write_types_atomic(self.entity_file, self._types[ENTITY])
+                _write_types_atomic(self.relation_file, self._types[RELATION])
+                open(self.journal_file, 'w', encoding='utf-8').close()
+            self._pending = 0
+            logger.info(f"类型快照已写入: {self.entity_file}, {self.relation_file}")
+
+
+def _read_type_file(type_file):
+    if not os.path.exists(type_file):
+        return []
+    with open(type_file, 'r', encoding='utf-8') as f:
+        return sorted({line.strip() for line in f if line.strip()})
+
+
+def _read_journal(journal_file):
+    """读取类型日志，返回 [(类型种类, 类型名)]，跳过写了一半的行"""
+    if not os.path.exists(journal_file):
+        return []
+    records = []
+    with open(journal_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records.append((record['kind'], record['type']))
+    return records
+
+
+@contextmanager
+def _file_lock(lock_file):
+    """进程间互斥锁，保护类型日志和类型文件的读-合并-写"""
+    with open(lock_file, 'a+') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _write_types_atomic(type_file, types):
+    """先写临时文件再替换，避免其他进程读到写了一半的类型文件"""
+    tmp_file = f"{type_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        for type_name in sorted(types):
+            f.write(f"{type_name}\n")
+    os.replace(tmp_file, type_file)
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_type_registry(entity_file, relation_file):
+    """获取某对类型文件共享的类型词表，同一进程内只加载一次
+
+    Args:
+        entity_file (str): 实体类型文件路径
+        relation_file (str): 关系类型文件路径
+
+    Returns:
+        TypeRegistry: 共享的类型词表
+    """
+    key = (os.path.abspath(entity_file), os.path.abspath(relation_file))
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = TypeRegistry(entity_file, relation_file)
+            _registries[key] = registry
+        return registry
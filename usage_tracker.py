@@ -0,0 +1,279 @@
+"""Token 用量与耗时统计：按调用记录 token、延迟和 JSON 修复结果，并按文件、阶段和运行汇总
+
+调用方用 usage_context 标注当前线程正在处理的阶段和文件，call_openai_api 的每次调用记录一条：
+token 数取自响应的 usage，服务端没有返回（如流式输出）时用本地估计值代替。
+运行结束时导出逐调用的 JSONL 和 Prometheus 文本格式的指标。
+
+用法: python usage_tracker.py report output_results/usage_<时间戳>.jsonl [--top 10]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from config import logger, TOKEN_PRICES
+
+_local = threading.local()
+
+
+@contextmanager
+def usage_context(stage, files):
+    """标注当前线程中的 API 调用属于哪个阶段和哪些文件
+
+    Args:
+        stage (str): 处理阶段（extraction / validation / batch_extraction）
+        files (list): 文件名列表，批量抽取时包含本批所有文件
+    """
+    previous = getattr(_local, 'context', None)
+    _local.context = (stage, list(files))
+    try:
+        yield
+    finally:
+        _local.context = previous
+
+
+def call_cost(model, prompt_tokens, completion_tokens):
+    """按 TOKEN_PRICES 计算一次调用的费用，没有配置价格时返回 None"""
+    prices = TOKEN_PRICES.get(model)
+    if not prices:
+        return None
+    return (prompt_tokens * prices.get('prompt', 0) + completion_tokens * prices.get('completion', 0)) / 1_000_000
+
+
+class UsageTracker:
+    """逐调用记录 token 用量（线程安全）
+
+    一次 call_openai_api 调用可能包含多次补全请求（JSON 无效时重新请求），
+    begin_call 和 end_call 之间的所有补全累加到同一条记录。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空记录"""
+        with self._lock:
+            self.records = []
+
+    def begin_call(self):
+        _local.call = {'model': None, 'prompt_tokens': 0, 'completion_tokens': 0, 'estimated': False,
+                       'completions': 0, 'repair': None, 'cached': False, 'start': time.perf_counter()}
+
+    def record_completion(self, model, prompt_tokens, completion_tokens, estimated=False):
+        """记录一次补全请求的 token 数
+
+        Args:
+            model (str): 模型名称
+            prompt_tokens (int): 输入 token 数
+            completion_tokens (int): 输出 token 数
+            estimated (bool, optional): 是否为本地估计值. Defaults to False.
+        """
+        call = getattr(_local, 'call', None)
+        if call is None:
+            return
+        call['model'] = model
+        call['prompt_tokens'] += prompt_tokens or 0
+        call['completion_tokens'] += completion_tokens or 0
+        call['estimated'] = call['estimated'] or estimated
+        call['completions'] += 1
+
+    def record_repair(self, outcome):
+        """记录 JSON 修复结果：'clean'（无需修复）、'repaired' 或 'failed'，多次请求时保留最后一次"""
+        call = getattr(_local, 'call', None)
+        if call is not None:
+            call['repair'] = outcome
+
+    def record_cache_hit(self):
+        """记录本次调用由响应缓存返回"""
+        call = getattr(_local, 'call', None)
+        if call is not None:
+            call['cached'] = True
+
+    def end_call(self):
+        """结束当前调用并保存记录"""
+        call = getattr(_local, 'call', None)
+        if call is None:
+            return
+        _local.call = None
+        stage, files = getattr(_local, 'context', None) or ('unknown', [])
+        record = {
+            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'stage': stage,
+            'files': files,
+            'model': call['model'],
+            'prompt_tokens': call['prompt_tokens'],
+            'completion_tokens': call['completion_tokens'],
+            'estimated': call['estimated'],
+            'completions': call['completions'],
+            'cached': call['cached'],
+            'repair': call['repair'],
+            'latency': time.perf_counter() - call['start'],
+            'cost': call_cost(call['model'], call['prompt_tokens'], call['completion_tokens']),
+        }
+        with self._lock:
+            self.records.append(record)
+
+    def summary(self):
+        """汇总当前记录，见 summarize"""
+        with self._lock:
+            records = list(self.records)
+        return summarize(records)
+
+    def export(self, output_dir, timestamp):
+        """导出逐调用记录（usage_<时间戳>.jsonl）和 Prometheus 指标（usage_<时间戳>.prom），导出后清空记录
+
+        续跑沿用同一个时间戳，因此逐调用记录追加到已有的 JSONL，指标按文件中全部记录（包括之前各次运行）重新生成。
+
+        Args:
+            output_dir (str): 输出目录路径
+            timestamp (str): 运行时间戳
+
+        Returns:
+            dict: 整个运行（包括续跑之前的记录）的汇总
+        """
+        with self._lock:
+            records, self.records = self.records, []
+        usage_file = os.path.join(output_dir, f"usage_{timestamp}.jsonl")
+        run_records = records
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            with open(usage_file, 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+            run_records = load_records(usage_file)
+            summary = summarize(run_records)
+            with open(os.path.join(output_dir, f"usage_{timestamp}.prom"), 'w', encoding='utf-8') as f:
+                f.write(prometheus_text(summary, timestamp))
+        except Exception as e:
+            logger.error(f"导出用量统计失败: {str(e)}")
+            summary = summarize(run_records)
+        logger.info(f"Token 用量统计: 本次 {summarize(records)['run']}, 运行累计 {summary['run']}")
+        return summary['run']
+
+
+def _empty_totals():
+    return {'calls': 0, 'completions': 0, 'cache_hits': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+            'latency': 0.0, 'cost': None, 'repair': Counter()}
+
+
+def _add(totals, record, share=1.0):
+    totals['calls'] += share
+    totals['completions'] += record['completions'] * share
+    totals['cache_hits'] += share if record['cached'] else 0
+    totals['prompt_tokens'] += record['prompt_tokens'] * share
+    totals['completion_tokens'] += record['completion_tokens'] * share
+    totals['latency'] += record['latency'] * share
+    if record.get('cost') is not None:
+        totals['cost'] = (totals['cost'] or 0.0) + record['cost'] * share
+    if record.get('repair'):
+        totals['repair'][record['repair']] += share
+
+
+def summarize(records):
+    """按运行、阶段和文件汇总调用记录；批量调用的用量按文件数平均分摊到每个文件
+
+    Args:
+        records (list): 调用记录
+
+    Returns:
+        dict: {'run': 总计, 'stages': {阶段: 总计}, 'files': {文件名: 总计}}
+    """
+    run = _empty_totals()
+    stages = {}
+    files = {}
+    for record in records:
+        _add(run, record)
+        _add(stages.setdefault(record['stage'], _empty_totals()), record)
+        share = 1.0 / len(record['files']) if record['files'] else 0.0
+        for filename in record['files']:
+            _add(files.setdefault(filename, _empty_totals()), record, share)
+    return {'run': run, 'stages': stages, 'files': files}
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text(summary, run):
+    """把汇总转换为 Prometheus 文本格式（按阶段分标签）
+
+    Args:
+        summary (dict): summarize 的返回值
+        run (str): 运行标识，作为 run 标签
+
+    Returns:
+        str: 指标文本
+    """
+    metrics = (
+        ('llm_calls_total', 'counter', 'API calls per stage', 'calls'),
+        ('llm_completions_total', 'counter', 'Completion requests including invalid-JSON retries', 'completions'),
+        ('llm_cache_hits_total', 'counter', 'Calls answered from the response cache', 'cache_hits'),
+        ('llm_prompt_tokens_total', 'counter', 'Prompt tokens', 'prompt_tokens'),
+        ('llm_completion_tokens_total', 'counter', 'Completion tokens', 'completion_tokens'),
+        ('llm_call_latency_seconds_sum', 'counter', 'Total call latency in seconds', 'latency'),
+        ('llm_cost_total', 'counter', 'Cost computed from TOKEN_PRICES', 'cost'),
+    )
+    lines = []
+    for name, metric_type, help_text, field in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for stage, totals in sorted(summary['stages'].items()):
+            if totals[field] is not None:
+                lines.append(f'{name}{{run="{_label(run)}",stage="{_label(stage)}"}} {totals[field]:g}')
+    lines.append("# HELP llm_json_repair_total JSON repair outcomes")
+    lines.append("# TYPE llm_json_repair_total counter")
+    for stage, totals in sorted(summary['stages'].items()):
+        for outcome, count in sorted(totals['repair'].items()):
+            lines.append(f'llm_json_repair_total{{run="{_label(run)}",stage="{_label(stage)}",'
+                         f'outcome="{_label(outcome)}"}} {count:g}')
+    return '\n'.join(lines) + '\n'
+
+
+usage_tracker = UsageTracker()
+
+
+def load_records(usage_file):
+    """读取 export 导出的逐调用 JSONL"""
+    records = []
+    with open(usage_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token 用量报告")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    report_parser = subparsers.add_parser('report', help="按阶段汇总并列出最耗费的文档")
+    report_parser.add_argument('usage_files', nargs='+', help="usage_<时间戳>.jsonl")
+    report_parser.add_argument('--top', type=int, default=10, help="列出的文档数")
+    args = parser.parse_args()
+
+    records = [record for usage_file in args.usage_files for record in load_records(usage_file)]
+    summary = summarize(records)
+
+    def describe(totals):
+        cost = f", 费用 {totals['cost']:.4f}" if totals['cost'] is not None else ""
+        return (f"{totals['calls']:g} 次调用（缓存命中 {totals['cache_hits']:g}）, "
+                f"输入 {totals['prompt_tokens']:.0f} / 输出 {totals['completion_tokens']:.0f} tokens, "
+                f"耗时 {totals['latency']:.1f} 秒{cost}, JSON 修复 {dict(totals['repair'])}")
+
+    print(f"运行总计: {describe(summary['run'])}")
+    for stage, totals in sorted(summary['stages'].items()):
+        print(f"  {stage}: {describe(totals)}")
+    # 配置了价格时按费用排序，否则按总 token 数排序
+    ranked = sorted(summary['files'].items(),
+                    key=lambda item: (item[1]['cost'] or 0.0, item[1]['prompt_tokens'] + item[1]['completion_tokens']),
+                    reverse=True)
+    print(f"\n最耗费的 {min(args.top, len(ranked))} 个文档:")
+    for filename, totals in ranked[:args.top]:
+        print(f"  {filename}: {describe(totals)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import json
+import os
 from config import logger, entity_jaccard_history, relation_jaccard_history, JACCARD_THRESHOLD, CONVERGENCE_ROUNDS
 
 def calculate_jaccard(set1, set2):
@@ -9,8 +11,44 @@ def calculate_jaccard(set1, set2):
     return intersection / union if union > 0 else 0.0
 
 def check_convergence():
-    """检查 Jaccard 系数是否连续 X 轮达到阈值"""
-    if len(entity_jaccard_history) < CONVERGENCE_ROUNDS or len(relation_jaccard_history) < CONVERGENCE_ROUNDS:
+    """检查 Jaccard 系数是否连续 X 轮达到阈值（工作线程也会调用，先复制历史再判断）"""
+    entity_history, relation_history = list(entity_jaccard_history), list(relation_jaccard_history)
+    if len(entity_history) < CONVERGENCE_ROUNDS or len(relation_history) < CONVERGENCE_ROUNDS:
         return False
-    return all(j >= JACCARD_THRESHOLD for j in entity_jaccard_history) and \
-        all(j >= JACCARD_THRESHOLD for j in relation_jaccard_history) 
\ No newline at end of file
+    return all(j >= JACCARD_THRESHOLD for j in entity_history) and \
+        all(j >= JACCARD_THRESHOLD for j in relation_history)
+
+def _convergence_state_file(entity_file):
+    return f"{entity_file}.convergence.json"
+
+
+def save_convergence_state(entity_file):
+    """把 Jaccard 历史写入 <entity_file>.convergence.json，进程重启后可以恢复收敛状态"""
+    state_file = _convergence_state_file(entity_file)
+    tmp_file = f"{state_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump({'entity': list(entity_jaccard_history), 'relation': list(relation_jaccard_history)}, f)
+    os.replace(tmp_file, state_file)
+
+
+def load_convergence_state(entity_file):
+    """从 <entity_file>.convergence.json 恢复 Jaccard 历史
+
+    Returns:
+        bool: 是否恢复了历史
+    """
+    state_file = _convergence_state_file(entity_file)
+    if not os.path.exists(state_file):
+        return False
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        logger.error(f"读取收敛状态失败: {str(e)}")
+        return False
+    entity_jaccard_history.clear()
+    entity_jaccard_history.extend(state.get('entity', []))
+    relation_jaccard_history.clear()
+    relation_jaccard_history.extend(state.get('relation', []))
+    logger.info(f"已恢复收敛状态: 最近 {len(entity_jaccard_history)} 轮，已收敛={check_convergence()}")
+    return True